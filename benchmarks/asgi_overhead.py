@@ -0,0 +1,83 @@
+"""Per-request overhead of `Throtty.wrap(app)` against the `install(app)` middleware.
+
+Drives a no-op ASGI app through each integration with the in-memory backend, so the
+numbers are the cost Throtty adds on top of the decision: rule matching, key
+extraction and building the response. Allowed, rejected and unmatched requests are
+measured separately.
+
+    PYTHONPATH=. python benchmarks/asgi_overhead.py --requests 200000
+"""
+
+import argparse
+import asyncio
+import time
+
+from core import Throtty, ThrottyMiddleware
+
+
+async def noop_app(scope, receive, send) -> None:
+    pass
+
+
+async def receive() -> dict:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message) -> None:
+    pass
+
+
+def make_scope(path: str) -> dict:
+    return {
+        "type": "http",
+        "path": path,
+        "client": ("10.0.0.1", 51234),
+        "headers": [
+            (b"host", b"api.example.com"),
+            (b"user-agent", b"bench/1.0"),
+            (b"accept", b"application/json"),
+        ],
+    }
+
+
+async def drive(app, scope: dict, requests: int) -> None:
+    for _ in range(requests):
+        await app(scope, receive, send)
+
+
+async def measure(app, scope: dict, requests: int) -> float:
+    await drive(app, scope, min(requests, 1000))
+    started = time.perf_counter()
+    await drive(app, scope, requests)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+async def run(args) -> None:
+    throtty = Throtty()
+    throtty.add_rule("/allowed", limit=10**9, window=60)
+    throtty.add_rule("/denied", limit=0, window=60)
+
+    integrations = {
+        "bare app": noop_app,
+        "install": ThrottyMiddleware(noop_app, throtty),
+        "wrap": throtty.wrap(noop_app),
+    }
+    print(f"requests: {args.requests:,}  (us/request)")
+    for case in ("allowed", "denied", "unmatched"):
+        scope = make_scope(f"/{case}")
+        row = []
+        for name, app in integrations.items():
+            us = await measure(app, scope, args.requests)
+            row.append(f"{name} {us:>6.2f}")
+        print(f"{case:<10} " + "  ".join(row))
+    await throtty.engine.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200_000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
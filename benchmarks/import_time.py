@@ -0,0 +1,77 @@
+"""Cold start cost of `import core`, measured with `python -X importtime`.
+
+Imports the package in fresh interpreters and reports the median cumulative import
+time, the heaviest modules it pulled in, and whether optional dependencies (the
+Redis client, sortedcontainers) were loaded although nothing selected them. Exits
+non-zero when a lazily loaded module shows up or `--budget-ms` is exceeded, so it can
+guard CI against import time regressions.
+
+    PYTHONPATH=. python benchmarks/import_time.py --runs 9 --budget-ms 150
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+LAZY_MODULES = ("redis", "sortedcontainers")
+
+
+def import_profile(statement: str) -> tuple[int, dict[str, int]]:
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total, cumulative = 0, {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:") :].split("|")
+        # nested imports are indented, the top level ones add up to the total
+        if not name.startswith("  "):
+            total += int(cumulative_us)
+        cumulative[name.strip()] = int(cumulative_us)
+    return total, cumulative
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=9)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    parser.add_argument("--statement", default="import core")
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument(
+        "--forbid",
+        nargs="*",
+        default=list(LAZY_MODULES),
+        help="packages the statement must not import",
+    )
+    args = parser.parse_args()
+
+    profiles = [import_profile(args.statement) for _ in range(args.runs)]
+    total = statistics.median(total for total, _ in profiles) / 1000
+    print(f"{args.statement!r}: {total:.1f} ms (median of {args.runs} runs)")
+
+    _, last = profiles[-1]
+    heaviest = sorted(
+        ((us, name) for name, us in last.items() if name.count(".") <= 1),
+        reverse=True,
+    )
+    for us, name in heaviest[: args.top]:
+        print(f"  {name:<40} {us / 1000:>7.1f} ms")
+
+    loaded = sorted({name.split(".")[0] for name in last} & set(args.forbid))
+    failed = False
+    if loaded:
+        print(f"imported lazily loaded packages: {', '.join(loaded)}")
+        failed = True
+    if args.budget_ms is not None and total > args.budget_ms:
+        print(f"over budget: {total:.1f} ms > {args.budget_ms:.1f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Size and count of the client IP keys an attacker rotating addresses produces.
+
+Generates requests from `--clients` random IPv6 addresses spread over `--networks`
+/64 networks, as a client rotating addresses within its allocation would, and keys
+them as `"ip:<address>"` text, as packed `Key.ip(packed=True)` keys and as packed
+keys aggregated to their /64. Reports the distinct counters each keying creates, the
+memory of their key strings, the bytes of the Redis window key of one decision and the
+time taken per request. Every address is new, so every request misses the key cache.
+
+    PYTHONPATH=. python benchmarks/ip_keys.py --clients 200000 --networks 100
+"""
+
+import argparse
+import random
+import sys
+import time
+from ipaddress import IPv6Address
+
+from core import Key
+from core._internals.infrastructure.storage.redis.keys import window_key
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=200_000)
+    parser.add_argument("--networks", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    networks = [
+        0x2001_0DB8_0000_0000 | rng.getrandbits(24) for _ in range(args.networks)
+    ]
+    hosts = [
+        str(IPv6Address(rng.choice(networks) << 64 | rng.getrandbits(64)))
+        for _ in range(args.clients)
+    ]
+
+    keyings = {
+        "text": lambda host, headers: "ip:" + host,
+        "packed": Key.ip(packed=True).compile(),
+        "packed /64": Key.ip(ipv6_prefix=64, packed=True).compile(),
+    }
+    print(f"clients: {args.clients:,}  networks: {args.networks:,}")
+    for name, extract in keyings.items():
+        started = time.perf_counter()
+        keys = {extract(host, {}) for host in hosts}
+        elapsed = time.perf_counter() - started
+        size = sum(sys.getsizeof(key) for key in keys)
+        redis_bytes = sum(len(window_key(key, 0).encode()) for key in keys) / len(keys)
+        print(
+            f"{name:<11} counters {len(keys):>9,}  key memory {size / 2**20:6.2f} MiB"
+            f"  redis key {redis_bytes:5.1f} B  {elapsed / len(hosts) * 1e9:6.0f} ns/request"
+        )
+        del keys
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Cost of per-key limit overrides on the request path.
+
+Sends requests of --keys API keys through `Throtty.wrap(app)` with the in-memory
+backend, for a rule without overrides and for the same rule resolving each key's plan
+from a source that takes --latency-ms per call, as a Redis or database lookup would.
+Reports the time per request once every plan is cached, how many calls the source got
+for the first request of every key arriving together, and the time per request while
+all cached plans are stale and refreshed in the background.
+
+    PYTHONPATH=. python benchmarks/limit_overrides.py --requests 200000 --keys 10000
+"""
+
+import argparse
+import asyncio
+import time
+
+from core import Limit, LimitResolver, LimitSource, Throtty
+
+
+class SlowSource(LimitSource):
+    is_async = True
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def get(self, keys: list[str]) -> dict[str, Limit]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        # every other key is on a paid plan
+        return {key: Limit.parse("100000/60") for key in keys[::2]}
+
+
+async def noop_app(scope, receive, send) -> None:
+    pass
+
+
+async def receive() -> dict:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message) -> None:
+    pass
+
+
+def make_scope(path: str, api_key: str) -> dict:
+    return {
+        "type": "http",
+        "path": path,
+        "client": ("10.0.0.1", 51234),
+        "headers": [(b"x-api-key", api_key.encode())],
+    }
+
+
+async def measure(app, scopes: list[dict], requests: int) -> float:
+    started = time.perf_counter()
+    for i in range(requests):
+        await app(scopes[i % len(scopes)], receive, send)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+async def run(args) -> None:
+    source = SlowSource(args.latency_ms / 1000)
+    resolver = LimitResolver(source, ttl=3600)
+    throtty = Throtty()
+    key_func = lambda host, headers: "apikey:" + headers["x-api-key"]
+    throtty.add_rule("/plain", limit=10**9, window=60, key_func=key_func)
+    throtty.add_rule(
+        "/plans", limit=10**9, window=60, key_func=key_func, overrides=resolver
+    )
+    app = throtty.wrap(noop_app)
+    keys = [f"{i:08x}" for i in range(args.keys)]
+    plain = [make_scope("/plain", key) for key in keys]
+    plans = [make_scope("/plans", key) for key in keys]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(app(scope, receive, send) for scope in plans))
+    first = time.perf_counter() - started
+
+    print(f"requests: {args.requests:,}  keys: {args.keys:,}")
+    print(
+        f"{'no overrides':<24} {await measure(app, plain, args.requests):6.2f} us/request"
+    )
+    print(
+        f"{'cached plans':<24} {await measure(app, plans, args.requests):6.2f} us/request"
+    )
+    print(
+        f"{'first request per key':<24} {source.calls} source call(s) "
+        f"for {args.keys:,} keys in {first * 1000:.1f} ms"
+    )
+    resolver.invalidate()
+    stale = await measure(app, plans, args.requests)
+    print(f"{'stale plans, refreshing':<24} {stale:6.2f} us/request")
+    await throtty.engine.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Memory used by the in-memory backend per million rate limit keys.
+
+Compares the columnar `InMemStorage` against the previous layout, which kept one
+`f"{key}:{window}"` counter per window and one `BucketState` dataclass per bucket.
+An engine runs a single algorithm, so both workloads are measured on their own: the
+sliding window counter touches two consecutive windows per key, the token bucket
+stores one bucket per key.
+
+    PYTHONPATH=. python benchmarks/memory_per_key.py --keys 1000000
+"""
+
+import argparse
+import asyncio
+import gc
+import tracemalloc
+from dataclasses import dataclass
+
+from core._internals.domain.models import BucketState
+from core._internals.infrastructure.storage.in_mem import InMemStorage
+
+
+@dataclass
+class LegacyBucketState:
+    latest_refill: float
+    tokens: float
+
+
+def legacy_windows(keys: list[str]) -> dict:
+    windows: dict[str, int] = {}
+    for key in keys:
+        for window in (100, 101):
+            window_key = f"{key}:{window}"
+            windows[window_key] = windows.get(window_key, 0) + 1
+    return windows
+
+
+def legacy_buckets(keys: list[str]) -> dict:
+    return {key: LegacyBucketState(latest_refill=1.0, tokens=10.0) for key in keys}
+
+
+async def columnar_windows(keys: list[str]) -> InMemStorage:
+    storage = InMemStorage()
+    for key in keys:
+        for window in (100, 101):
+            await storage.increment_windows(key=key, window=window, ttl=3600)
+    return storage
+
+
+async def columnar_buckets(keys: list[str]) -> InMemStorage:
+    storage = InMemStorage()
+    state = BucketState(latest_refill=1.0, tokens=10.0)
+    for key in keys:
+        await storage.update_bucket_state(key=key, state=state, ttl=3600)
+    return storage
+
+
+def measure(fill) -> int:
+    gc.collect()
+    tracemalloc.start()
+    held = fill()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    # the key strings themselves are shared by both layouts, keep them out of the totals
+    keys = [f"ip:10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(args.keys)]
+    scale = 1_000_000 / args.keys
+
+    print(f"keys: {args.keys:,} (MiB per 1M keys)")
+    for name, legacy_fill, columnar_fill in (
+        ("sliding window counter", legacy_windows, columnar_windows),
+        ("token bucket", legacy_buckets, columnar_buckets),
+    ):
+        legacy = measure(lambda: legacy_fill(keys)) * scale / 2**20
+        columnar = measure(lambda: asyncio.run(columnar_fill(keys))) * scale / 2**20
+        print(
+            f"{name:<24} legacy {legacy:7.1f}  columnar {columnar:7.1f}"
+            f"  reduction {legacy / columnar:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
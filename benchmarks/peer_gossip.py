@@ -0,0 +1,88 @@
+"""Cluster-wide limit enforced by peer-synchronized nodes on localhost.
+
+Starts one process per node, each with its own `PeerStorage` gossiping over UDP, and
+drives the same key on every node at a steady rate for a few windows. Reports how many
+requests the cluster admitted per window against the limit, the overshoot comes from
+the sync interval.
+
+    PYTHONPATH=. python benchmarks/peer_gossip.py --nodes 4 --limit 200 --rate 200
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+from collections import Counter
+from datetime import timedelta
+
+from core._internals.domain.services.algorithm import SlidingWindowCounter
+from core._internals.infrastructure.storage.peer import PeerStorage, UdpTransport
+
+BASE_PORT = 47400
+
+
+async def node(index: int, args, start_at: float) -> Counter:
+    peers = [("127.0.0.1", BASE_PORT + i) for i in range(args.nodes) if i != index]
+    storage = PeerStorage(
+        transport=UdpTransport(bind=("127.0.0.1", BASE_PORT + index), peers=peers),
+        sync_interval=args.sync_interval,
+    )
+    await storage.start()
+    algorithm = SlidingWindowCounter(storage=storage)
+    window = timedelta(seconds=args.window)
+    admitted: Counter = Counter()
+
+    await asyncio.sleep(start_at - time.time())
+    interval = 1 / args.rate
+    next_at = time.monotonic()
+    for _ in range(int(args.rate * args.window * args.windows)):
+        result = await algorithm.is_allowed(
+            key="shared", limit=args.limit, window=window
+        )
+        if result.allowed:
+            admitted[int(time.time() // args.window)] += 1
+        next_at += interval
+        await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+    await storage.close()
+    return admitted
+
+
+def run(index: int, args, start_at: float, queue) -> None:
+    queue.put(asyncio.run(node(index, args, start_at)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--window", type=int, default=2)
+    parser.add_argument("--windows", type=int, default=3)
+    parser.add_argument("--rate", type=float, default=200, help="requests/s per node")
+    parser.add_argument("--sync-interval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    queue = multiprocessing.Queue()
+    start_at = time.time() + 1
+    processes = [
+        multiprocessing.Process(target=run, args=(i, args, start_at, queue))
+        for i in range(args.nodes)
+    ]
+    for process in processes:
+        process.start()
+    totals: Counter = Counter()
+    for _ in processes:
+        totals.update(queue.get())
+    for process in processes:
+        process.join()
+
+    offered = args.nodes * args.rate * args.window
+    print(
+        f"nodes: {args.nodes}  limit: {args.limit}/{args.window}s  "
+        f"offered: {offered:.0f}/window  sync: {args.sync_interval * 1000:.0f}ms"
+    )
+    for window in sorted(totals):
+        print(f"window {window}: admitted {totals[window]}")
+
+
+if __name__ == "__main__":
+    main()
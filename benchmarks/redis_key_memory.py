@@ -0,0 +1,90 @@
+"""Redis memory taken by the keys of the sliding window counter, per key layout.
+
+Every client key is a 64 character API key, as with keys taken from an API key or a
+JWT subject. Each layout is reported with the bytes of the two window key names one
+client needs. With --redis-dsn the counters of --keys clients are written through
+`RedisStorage` as well, and the growth of `used_memory` is reported before the keys
+are deleted again. Point it at a scratch database.
+
+    PYTHONPATH=. python benchmarks/redis_key_memory.py --keys 100000 --redis-dsn redis://localhost:6379/15
+"""
+
+import argparse
+import asyncio
+import os
+
+from core._internals.domain.models import WindowConsume
+from core._internals.infrastructure.storage.redis import RedisStorage, ThrottyRedis
+from core._internals.infrastructure.storage.redis.keys import RedisKeys
+
+LAYOUTS = {
+    "default": RedisKeys(),
+    "namespace": RedisKeys(namespace="rl:"),
+    "compact": RedisKeys(namespace="rl:", compact=True),
+    "hashed compact": RedisKeys(namespace="rl:", hash_over=32, compact=True),
+}
+WINDOW = 29_376_543
+
+
+def key_bytes(keys: RedisKeys, clients: list[str]) -> float:
+    total = sum(
+        len(keys.window(client, window).encode())
+        for client in clients
+        for window in (WINDOW, WINDOW - 1)
+    )
+    return total / len(clients)
+
+
+async def used_memory(redis) -> int:
+    return (await redis.info("memory"))["used_memory"]
+
+
+async def redis_growth(dsn: str, keys: RedisKeys, clients: list[str]) -> int:
+    client = ThrottyRedis(dsn=dsn, max_connections=8)
+    storage = RedisStorage(redis=client, keys=keys)
+    before = await used_memory(client.redis)
+    for start in range(0, len(clients), 1000):
+        await storage.consume_windows(
+            [
+                WindowConsume(
+                    key=key,
+                    current_window=WINDOW,
+                    previous_window=WINDOW - 1,
+                    weight=0.0,
+                    limit=10,
+                    cost=1,
+                    ttl=600,
+                )
+                for key in clients[start : start + 1000]
+            ]
+        )
+    after = await used_memory(client.redis)
+    names = [keys.window(key, WINDOW) for key in clients]
+    for start in range(0, len(names), 1000):
+        await client.redis.delete(*names[start : start + 1000])
+    await client.close_redis()
+    return after - before
+
+
+async def run(args) -> None:
+    clients = [f"apikey:{os.urandom(32).hex()}" for _ in range(args.keys)]
+    print(
+        f"clients: {args.keys:,}  (window key names per client / redis memory per client)"
+    )
+    for name, keys in LAYOUTS.items():
+        row = f"{name:<15} {key_bytes(keys, clients):6.1f} B"
+        if args.redis_dsn:
+            growth = await redis_growth(args.redis_dsn, keys, clients)
+            row += f"  {growth / args.keys:7.1f} B"
+        print(row)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=100_000)
+    parser.add_argument("--redis-dsn", default=None)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Balance and key movement of the consistent hash ring, and decisions per second
+over sharded Redis servers.
+
+For 2 to 8 servers and several `vnodes`, reports the share of hash slots taken by the
+busiest server relative to an even split, and the share of slots moved when one more
+server joins (the ideal being 1/(n+1)). Pass --redis-dsn once per server to time
+--requests single decisions from --concurrency tasks against the first server alone
+and against the ring of all of them.
+
+    PYTHONPATH=. python benchmarks/redis_shards.py --redis-dsn redis://a:6379/15 --redis-dsn redis://b:6379/15
+"""
+
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+from redis.crc import REDIS_CLUSTER_HASH_SLOTS
+
+from core import ThrottyCore
+from core._internals.infrastructure.storage.redis.ring import HashRing
+
+
+def owners(ring: HashRing) -> list[str]:
+    return [ring.slot_owner(slot) for slot in range(REDIS_CLUSTER_HASH_SLOTS)]
+
+
+def ring_report() -> None:
+    print("servers  vnodes  busiest/even  moved on join (ideal)")
+    for servers in (2, 4, 8):
+        nodes = [f"redis://redis-{i}:6379/0" for i in range(servers)]
+        for vnodes in (1, 16, 160):
+            ring = HashRing(nodes, vnodes=vnodes)
+            before = owners(ring)
+            busiest = max(Counter(before).values()) * servers / len(before)
+            ring.add("redis://redis-new:6379/0")
+            moved = sum(a != b for a, b in zip(before, owners(ring))) / len(before)
+            print(
+                f"{servers:>7} {vnodes:>7} {busiest:>13.2f}"
+                f"  {moved:>13.1%} ({1 / (servers + 1):.1%})"
+            )
+
+
+async def decisions(engine: ThrottyCore, requests: int, concurrency: int) -> float:
+    per_task = requests // concurrency
+
+    async def worker(offset: int) -> None:
+        for i in range(offset, offset + per_task):
+            await engine.execute(key=f"ip:{i}", limit=10**9, window=60)
+
+    await engine.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i * per_task) for i in range(concurrency)))
+    rate = per_task * concurrency / (time.perf_counter() - started)
+    await engine.close()
+    return rate
+
+
+async def run(args) -> None:
+    ring_report()
+    if not args.redis_dsn:
+        return
+    print(f"\nrequests: {args.requests:,}  concurrency: {args.concurrency}")
+    setups = {
+        "1 server": args.redis_dsn[0],
+        f"{len(args.redis_dsn)} servers": args.redis_dsn,
+    }
+    for name, dsn in setups.items():
+        engine = ThrottyCore(redis_dsn=dsn, max_connections=args.concurrency)
+        rate = await decisions(engine, args.requests, args.concurrency)
+        print(f"{name:<12} {rate:>9,.0f} decisions/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--redis-dsn", action="append", default=[])
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
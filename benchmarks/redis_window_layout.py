@@ -0,0 +1,112 @@
+"""Redis memory and decisions per second of the sliding window counter, per layout.
+
+The string layout keeps one counter key per window, so a client holds two keys while
+its previous window is still weighted in; `RedisKeys(hash_windows=True)` keeps both
+counts in one small hash per client. For each layout the counters of --keys clients
+are written for two consecutive windows, the growth of `used_memory` is reported per
+client, then --requests single decisions are timed over the same clients with
+--concurrency calls in flight. The keys are deleted again, point it at a scratch
+database.
+
+    PYTHONPATH=. python benchmarks/redis_window_layout.py --redis-dsn redis://localhost:6379/15
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from core._internals.domain.models import WindowConsume
+from core._internals.infrastructure.storage.redis import RedisStorage, ThrottyRedis
+from core._internals.infrastructure.storage.redis.keys import RedisKeys
+
+LAYOUTS = {
+    "string windows": RedisKeys(),
+    "hashed windows": RedisKeys(hash_windows=True),
+}
+WINDOW = 29_376_543
+TTL = 120
+
+
+def request(key: str, window: int) -> WindowConsume:
+    return WindowConsume(
+        key=key,
+        current_window=window,
+        previous_window=window - 1,
+        weight=0.5,
+        limit=10**9,
+        cost=1,
+        ttl=TTL,
+    )
+
+
+async def used_memory(redis) -> int:
+    return (await redis.info("memory"))["used_memory"]
+
+
+async def fill(storage: RedisStorage, clients: list[str]) -> None:
+    for window in (WINDOW - 1, WINDOW):
+        for start in range(0, len(clients), 1000):
+            await storage.consume_windows(
+                [request(key, window) for key in clients[start : start + 1000]]
+            )
+
+
+async def decisions(
+    storage: RedisStorage, clients: list[str], requests: int, concurrency: int
+) -> float:
+    per_task = requests // concurrency
+
+    async def worker(offset: int) -> None:
+        for i in range(offset, offset + per_task):
+            await storage.consume_windows([request(clients[i % len(clients)], WINDOW)])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i * per_task) for i in range(concurrency)))
+    return per_task * concurrency / (time.perf_counter() - started)
+
+
+async def measure(args, keys: RedisKeys, clients: list[str]) -> tuple[float, float]:
+    client = ThrottyRedis(dsn=args.redis_dsn, max_connections=args.concurrency)
+    storage = RedisStorage(redis=client, keys=keys)
+    await storage.start()
+    before = await used_memory(client.redis)
+    await fill(storage, clients)
+    growth = (await used_memory(client.redis) - before) / len(clients)
+    rate = await decisions(storage, clients, args.requests, args.concurrency)
+    if keys.hash_windows:
+        names = [keys.window_hash(key, TTL) for key in clients]
+    else:
+        names = [
+            keys.window(key, window)
+            for key in clients
+            for window in (WINDOW - 1, WINDOW)
+        ]
+    for start in range(0, len(names), 1000):
+        await client.redis.delete(*names[start : start + 1000])
+    await client.close_redis()
+    return growth, rate
+
+
+async def run(args) -> None:
+    clients = [f"ip:{os.urandom(4).hex()}" for _ in range(args.keys)]
+    print(
+        f"clients: {args.keys:,}  requests: {args.requests:,}  "
+        "(redis memory per client / decisions/s)"
+    )
+    for name, keys in LAYOUTS.items():
+        growth, rate = await measure(args, keys, clients)
+        print(f"{name:<15} {growth:7.1f} B  {rate:9,.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--redis-dsn", required=True)
+    parser.add_argument("--keys", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
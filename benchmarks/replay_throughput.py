@@ -0,0 +1,68 @@
+"""Records per second replayed by `Throtty.simulate` through each algorithm.
+
+Generates a synthetic access log with Poisson arrivals over a pool of client keys and
+replays it twice: from memory, which is the cost of routing and deciding, and from a
+JSON lines file read with `read_access_log`, which adds parsing. `--resolution` trades
+clock precision for bigger batches.
+
+    PYTHONPATH=. python benchmarks/replay_throughput.py --records 500000
+"""
+
+import argparse
+import json
+import random
+import tempfile
+
+from core import Throtty, read_access_log
+
+ALGORITHMS = ("slidingwindow_counter", "slidingwindow_log", "token_bucket")
+
+
+def synthetic_log(records: int, keys: int, rate: float) -> list[tuple[float, str, str]]:
+    rng = random.Random(0)
+    now = 1_700_000_000.0
+    log = []
+    for _ in range(records):
+        now += rng.expovariate(rate)
+        path = rng.choice(("/api/orders", "/api/users", "/login", "/static/app.js"))
+        log.append(
+            (now, path, f"ip:10.0.{rng.randrange(keys) % 256}.{rng.randrange(256)}")
+        )
+    return log
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=500_000)
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument("--rate", type=float, default=20_000, help="requests/s")
+    parser.add_argument("--resolution", type=float, default=0.01)
+    args = parser.parse_args()
+
+    throtty = Throtty()
+    throtty.add_rule("/api/*", limit=100, window=60)
+    throtty.add_rule("/login", limit=5, window=60)
+    log = synthetic_log(args.records, args.keys, args.rate)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".jsonl") as f:
+        for timestamp, path, key in log:
+            f.write(json.dumps({"timestamp": timestamp, "path": path, "ip": key[3:]}))
+            f.write("\n")
+        f.flush()
+
+        print(f"records: {args.records:,}  (records/s)")
+        for algorithm in ALGORITHMS:
+            rows = []
+            for name, records in (
+                ("memory", log),
+                ("jsonl", read_access_log(f.name)),
+            ):
+                report = throtty.simulate(
+                    records, algorithm=algorithm, resolution=args.resolution
+                )
+                rows.append(f"{name} {report.records_per_second:>9,.0f}")
+            print(f"{algorithm:<22} " + "  ".join(rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Retry herds at window boundaries, with aligned and staggered windows.
+
+Simulates --keys clients, each running --workers greedy workers against one rate limit
+key: a worker sends a request every --interval seconds while it is allowed and, once
+rejected, waits the Retry-After it was given. Decisions go through the real sliding
+window counter on a simulated clock. Reports the requests per second reaching the
+limiter (and its storage) after the first window, as peak, mean and peak-to-mean, for
+windows aligned on wall-clock multiples and staggered per key (`stagger_windows=True`),
+each with and without --jitter seconds of `retry_jitter`.
+
+    PYTHONPATH=. python benchmarks/retry_herd.py --keys 1000 --workers 4 --windows 10
+"""
+
+import argparse
+import heapq
+import random
+from collections import Counter
+
+from core._internals.application.use_cases.rate_limit import CheckRateLimitSyncUC
+from core._internals.domain.services.clock import ManualClock
+from core._internals.infrastructure.storage import SyncInMemStorage
+
+
+def simulate(args, stagger: bool, jitter: int) -> Counter:
+    clock = ManualClock()
+    uc = CheckRateLimitSyncUC(
+        storage=SyncInMemStorage(stripes=1),
+        clock=clock,
+        stagger=stagger,
+        retry_jitter=jitter,
+    )
+    rng = random.Random(7)
+    end = args.window * args.windows
+    # clients show up during the first window
+    events = [
+        (rng.uniform(0, args.window), f"client:{key}")
+        for key in range(args.keys)
+        for _ in range(args.workers)
+    ]
+    heapq.heapify(events)
+    per_second = Counter()
+    while events:
+        now, key = heapq.heappop(events)
+        if now >= end:
+            continue
+        clock.set(now)
+        result = uc.execute(key, args.limit, args.window)
+        if now >= args.window:
+            per_second[int(now)] += 1
+        wait = args.interval if result.allowed else max(result.retry_after, 1)
+        heapq.heappush(events, (now + wait, key))
+    return per_second
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--window", type=int, default=60)
+    parser.add_argument("--windows", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--jitter", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        f"keys: {args.keys:,}  workers/key: {args.workers}  "
+        f"limit: {args.limit}/{args.window}s"
+    )
+    print(f"{'':<26} {'peak/s':>8} {'mean/s':>8} {'peak/mean':>10}")
+    setups = {
+        "aligned windows": (False, 0),
+        f"aligned, {args.jitter}s jitter": (False, args.jitter),
+        "staggered windows": (True, 0),
+        f"staggered, {args.jitter}s jitter": (True, args.jitter),
+    }
+    for name, (stagger, jitter) in setups.items():
+        per_second = simulate(args, stagger, jitter)
+        seconds = range(args.window, args.window * args.windows)
+        counts = [per_second[second] for second in seconds]
+        mean = sum(counts) / len(counts)
+        peak = max(counts)
+        print(f"{name:<26} {peak:>8,} {mean:>8,.0f} {peak / mean:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
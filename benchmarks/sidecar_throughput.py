@@ -0,0 +1,103 @@
+"""Decisions per second through a `throtty serve` sidecar on localhost.
+
+Starts the sidecar in a child process and drives it from this one with the sliding
+window counter: one request at a time, many concurrent requests pipelined on the
+connection, and `execute_many` batches. The in-process in-memory backend is the
+reference.
+
+    PYTHONPATH=. python benchmarks/sidecar_throughput.py --requests 100000
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from core._internals.application.use_cases.rate_limit import CheckRateLimitUC
+from core._internals.infrastructure.storage import InMemStorage, SidecarStorage
+
+
+async def sequential(uc: CheckRateLimitUC, requests: int, keys: int) -> None:
+    for i in range(requests):
+        await uc.execute(key=f"ip:{i % keys}", limit=10**9, window=60)
+
+
+async def pipelined(uc: CheckRateLimitUC, requests: int, keys: int) -> None:
+    concurrency = 64
+
+    async def worker(offset: int) -> None:
+        for i in range(offset, requests, concurrency):
+            await uc.execute(key=f"ip:{i % keys}", limit=10**9, window=60)
+
+    await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+
+
+async def batched(uc: CheckRateLimitUC, requests: int, keys: int) -> None:
+    size = 100
+    for start in range(0, requests, size):
+        await uc.execute_many(
+            [(f"ip:{i % keys}", 10**9, 60) for i in range(start, start + size)]
+        )
+
+
+async def measure(uc: CheckRateLimitUC, mode, requests: int, keys: int) -> float:
+    await mode(uc, min(requests, 1000), keys)
+    started = time.perf_counter()
+    await mode(uc, requests, keys)
+    return requests / (time.perf_counter() - started)
+
+
+async def run(args, address: str) -> None:
+    local = CheckRateLimitUC(storage=InMemStorage())
+    storage = SidecarStorage(address)
+    remote = CheckRateLimitUC(storage=storage)
+    for _ in range(100):
+        try:
+            await storage.client.connect()
+            break
+        except OSError:
+            await asyncio.sleep(0.05)
+
+    print(f"requests: {args.requests:,}  keys: {args.keys:,}  (decisions/s)")
+    for name, mode in (
+        ("sequential", sequential),
+        ("pipelined x64", pipelined),
+        ("execute_many x100", batched),
+    ):
+        in_process = await measure(local, mode, args.requests, args.keys)
+        sidecar = await measure(remote, mode, args.requests, args.keys)
+        print(f"{name:<18} in-process {in_process:>10,.0f}  sidecar {sidecar:>10,.0f}")
+    await storage.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--keys", type=int, default=10_000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "throtty.sock")
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "core",
+            "serve",
+            "--unix",
+            path,
+            "--log-level",
+            "WARNING",
+        ]
+    )
+    try:
+        asyncio.run(run(args, f"unix://{path}"))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
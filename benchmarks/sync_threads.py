@@ -0,0 +1,73 @@
+"""Decisions per second of the blocking engine from many threads.
+
+Drives `SyncThrottyCore` from a thread pool the way a threaded WSGI server would,
+with one lock stripe (a single global lock) and with the default 16 stripes. The
+reference is calling the asyncio engine through `asyncio.run` on every request,
+which is what a WSGI application had to do before. Pass --redis-dsn to measure the
+blocking Redis storage as well.
+
+    PYTHONPATH=. python benchmarks/sync_threads.py --requests 200000
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core import ThrottyCore, SyncThrottyCore
+
+
+def threaded(check, requests: int, threads: int) -> float:
+    per_thread = requests // threads
+
+    def worker(offset: int) -> None:
+        for i in range(offset, offset + per_thread):
+            check(i)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(0, per_thread * threads, per_thread)))
+    return per_thread * threads / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument("--redis-dsn", default=None)
+    args = parser.parse_args()
+
+    engines = {
+        "memory, 1 stripe": SyncThrottyCore(stripes=1),
+        "memory, 16 stripes": SyncThrottyCore(stripes=16),
+    }
+    if args.redis_dsn:
+        engines["redis"] = SyncThrottyCore(redis_dsn=args.redis_dsn, max_connections=64)
+
+    print(f"requests: {args.requests:,}  keys: {args.keys:,}  (decisions/s)")
+    for name, engine in engines.items():
+
+        def check(i: int, engine=engine) -> None:
+            engine.execute(key=f"ip:{i % args.keys}", limit=10**9, window=60)
+
+        row = [
+            f"{threads:>2} threads {threaded(check, args.requests, threads):>9,.0f}"
+            for threads in (1, 4, 16)
+        ]
+        print(f"{name:<20} " + "  ".join(row))
+        engine.close()
+
+    async_engine = ThrottyCore()
+
+    def loop_per_request(i: int) -> None:
+        asyncio.run(
+            async_engine.execute(key=f"ip:{i % args.keys}", limit=10**9, window=60)
+        )
+
+    requests = min(args.requests, 20_000)
+    rate = threaded(loop_per_request, requests, 4)
+    print(f"{'asyncio.run each':<20} {4:>2} threads {rate:>9,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,72 @@
-from .limiter import Throtty, ThrottyMiddleware, rule
+from typing import TYPE_CHECKING
+
+from .limiter import Throtty, ThrottyMiddleware, ThrottyASGI, ThrottyWSGI, rule
 from ._internals.infrastructure.throtty.core import ThrottyCore
+from ._internals.infrastructure.throtty.sync_core import SyncThrottyCore
+from ._internals.domain.interfaces.clock import Clock
+from ._internals.domain.services.key import Key
+from ._internals.domain.services.limits import LimitResolver
+from ._internals.domain.interfaces.limit_source import LimitSource
+from ._internals.domain.models import Limit
+from ._internals.domain.services.clock import (
+    SystemClock,
+    MonotonicClock,
+    CoarseClock,
+    ManualClock,
+)
+from ._internals.lazy import lazy_imports
+
+if TYPE_CHECKING:
+    from ._internals.infrastructure.storage.peer import UdpTransport, UnixTransport
+    from ._internals.infrastructure.clock import RedisClock
+    from ._internals.infrastructure.replay import read_access_log, ReplayReport
+    from ._internals.infrastructure.storage.redis.keys import RedisKeys
+    from ._internals.infrastructure.limits import (
+        CallableLimitSource,
+        FileLimitSource,
+        RedisLimitSource,
+    )
+
+# optional parts load on first use, keeping cold starts to the in-memory engine
+__getattr__ = lazy_imports(
+    __name__,
+    {
+        "UdpTransport": "._internals.infrastructure.storage.peer",
+        "UnixTransport": "._internals.infrastructure.storage.peer",
+        "RedisClock": "._internals.infrastructure.clock",
+        "read_access_log": "._internals.infrastructure.replay",
+        "ReplayReport": "._internals.infrastructure.replay",
+        "RedisKeys": "._internals.infrastructure.storage.redis.keys",
+        "CallableLimitSource": "._internals.infrastructure.limits",
+        "FileLimitSource": "._internals.infrastructure.limits",
+        "RedisLimitSource": "._internals.infrastructure.limits",
+    },
+)
 
-__all__ = ["Throtty", "ThrottyMiddleware", "ThrottyCore", "rule"]
+__all__ = [
+    "Throtty",
+    "ThrottyMiddleware",
+    "ThrottyASGI",
+    "ThrottyWSGI",
+    "ThrottyCore",
+    "SyncThrottyCore",
+    "rule",
+    "Key",
+    "UdpTransport",
+    "UnixTransport",
+    "Clock",
+    "SystemClock",
+    "MonotonicClock",
+    "CoarseClock",
+    "ManualClock",
+    "RedisClock",
+    "read_access_log",
+    "ReplayReport",
+    "RedisKeys",
+    "Limit",
+    "LimitSource",
+    "LimitResolver",
+    "CallableLimitSource",
+    "FileLimitSource",
+    "RedisLimitSource",
+]
@@ -1,30 +1,118 @@
+import random
 from datetime import timedelta
-from typing import Optional
+from typing import Iterable, Optional, Union
 
-from ...domain.interfaces.storage import StorageInterface
+from ...domain.interfaces.consume_storage import ConsumeStorageInterface
+from ...domain.interfaces.sync_storage import SyncStorageInterface
 from ...domain.interfaces.rate_limit import RateLimitAlgorithm
-from ...domain.services.algorithm import (
-    SlidingWindowCounter,
-    SlidingWindowLog,
-    TokenBucket,
-)
-from ...domain.models.rate_limit_result import RateLimitResult
+from ...domain.interfaces.clock import Clock
+from ...domain.services import algorithm
+from ...domain.models import RateLimitResult, RateLimitRequest
 
+BatchItem = Union[RateLimitRequest, tuple]
 
-class CheckRateLimitUC:
+
+class _CheckRateLimit:
+    # the asyncio and blocking use cases below only differ in awaiting the algorithm
     def __init__(
-        self, storage: StorageInterface, algo: Optional[str] = "slidingwindow_counter"
+        self,
+        storage: Union[ConsumeStorageInterface, SyncStorageInterface],
+        algo: Optional[str] = "slidingwindow_counter",
+        clock: Optional[Clock] = None,
+        stagger: bool = False,
+        retry_jitter: int = 0,
     ):
-        alghs = {
-            "slidingwindow_counter": SlidingWindowCounter(storage=storage),
-            "slidingwindow_log": SlidingWindowLog(storage=storage),
-            "token_bucket": TokenBucket(storage=storage),
-        }
-        if algo not in alghs:
-            raise ValueError(
-                f"Algorithm not yet supported. Please choose between one of these {list(alghs.keys())}"
-            )
-        self.flow: RateLimitAlgorithm = alghs[algo]
-
-    async def execute(self, key: str, limit: int, window: timedelta) -> RateLimitResult:
-        return await self.flow.is_allowed(key=key, limit=limit, window=window)
+        if retry_jitter < 0:
+            raise ValueError("retry_jitter can't be negative")
+        self.flow: RateLimitAlgorithm = _algorithm(storage, algo, clock, stagger)
+        self.retry_jitter = int(retry_jitter)
+
+    def _jitter(self, result: RateLimitResult) -> RateLimitResult:
+        # clients told to come back at the same second would arrive together, so every
+        # rejection gets its own extra wait; never less, an earlier retry is rejected again
+        if self.retry_jitter and not result.allowed:
+            result.retry_after += random.randint(0, self.retry_jitter)
+        return result
+
+    def _jitter_many(self, results: list[RateLimitResult]) -> list[RateLimitResult]:
+        if self.retry_jitter:
+            for result in results:
+                self._jitter(result)
+        return results
+
+
+class CheckRateLimitUC(_CheckRateLimit):
+    async def execute(
+        self, key: str, limit: int, window: timedelta, cost: int = 1
+    ) -> RateLimitResult:
+        result = await self.flow.is_allowed(
+            key=key, limit=limit, window=_as_window(window), cost=cost
+        )
+        return self._jitter(result)
+
+    async def execute_many(
+        self, requests: Iterable[BatchItem], atomic: bool = False
+    ) -> list[RateLimitResult]:
+        batch = [_as_request(request) for request in requests]
+        if not batch:
+            return []
+        results = await self.flow.is_allowed_many(requests=batch, atomic=atomic)
+        return self._jitter_many(results)
+
+
+class CheckRateLimitSyncUC(_CheckRateLimit):
+    def execute(
+        self, key: str, limit: int, window: timedelta, cost: int = 1
+    ) -> RateLimitResult:
+        result = self.flow.check(
+            key=key, limit=limit, window=_as_window(window), cost=cost
+        )
+        return self._jitter(result)
+
+    def execute_many(
+        self, requests: Iterable[BatchItem], atomic: bool = False
+    ) -> list[RateLimitResult]:
+        batch = [_as_request(request) for request in requests]
+        if not batch:
+            return []
+        results = self.flow.check_many(requests=batch, atomic=atomic)
+        return self._jitter_many(results)
+
+
+def _algorithm(
+    storage: Union[ConsumeStorageInterface, SyncStorageInterface],
+    algo: Optional[str],
+    clock: Optional[Clock],
+    stagger: bool = False,
+) -> RateLimitAlgorithm:
+    # only the selected algorithm module is imported
+    alghs = {
+        "slidingwindow_counter": "SlidingWindowCounter",
+        "slidingwindow_log": "SlidingWindowLog",
+        "token_bucket": "TokenBucket",
+    }
+    if algo not in alghs:
+        raise ValueError(
+            f"Algorithm not yet supported. Please choose between one of these {list(alghs.keys())}"
+        )
+    options = {}
+    if stagger and algo == "slidingwindow_counter":
+        # buckets refill continuously and logs slide with every request, neither has
+        # boundaries to spread
+        options["stagger"] = True
+    return getattr(algorithm, alghs[algo])(storage=storage, clock=clock, **options)
+
+
+def _as_window(window: Union[timedelta, int]) -> timedelta:
+    if not isinstance(window, timedelta):
+        window = timedelta(seconds=window)
+    return window
+
+
+def _as_request(request: BatchItem) -> RateLimitRequest:
+    if not isinstance(request, RateLimitRequest):
+        request = RateLimitRequest(*request)
+    request.window = _as_window(request.window)
+    if request.cost < 0:
+        raise ValueError("Request cost can't be negative")
+    return request
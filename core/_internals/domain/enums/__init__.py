@@ -1 +1,2 @@
 from .storage import StorageType
+from .circuit import CircuitState
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class CircuitState(str, Enum):
+    closed = "closed"
+    open = "open"
+    half_open = "half-open"
@@ -4,3 +4,6 @@ from enum import Enum
 class StorageType(str, Enum):
     redis = "redis"
     in_mem = "in-mem"
+    hybrid = "hybrid"
+    peer = "peer"
+    sidecar = "sidecar"
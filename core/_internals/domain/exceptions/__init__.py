@@ -1 +1,7 @@
-from .exception import RedisError, ThrottyError, UnsupportedStorage, RateLimitExceeded
+from .exception import (
+    RedisError,
+    ThrottyError,
+    UnsupportedStorage,
+    RateLimitExceeded,
+    SidecarError,
+)
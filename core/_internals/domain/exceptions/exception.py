@@ -24,3 +24,8 @@ class RedisError(ThrottyError):
 class RateLimitExceeded(ThrottyError):
     def __init__(self, details: dict):
         super().__init__(message="Rate limit exceeded", details=details)
+
+
+class SidecarError(ThrottyError):
+    def __init__(self, message):
+        super().__init__(message)
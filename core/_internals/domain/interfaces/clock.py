@@ -0,0 +1,16 @@
+from abc import ABC, abstractmethod
+
+
+class Clock(ABC):
+    """Time source of the rate limiting algorithms.
+
+    `now()` returns seconds since the Unix epoch: window numbers and `reset_at` are derived
+    from it and have to line up between processes sharing a storage.
+    """
+
+    @abstractmethod
+    def now(self) -> float:
+        pass
+
+    async def start(self) -> None:
+        pass
@@ -0,0 +1,33 @@
+from abc import ABC, abstractmethod
+
+from ..models import WindowConsume, LogConsume, BucketConsume, ConsumeResult
+
+
+class ConsumeStorageInterface(ABC):
+    """What the algorithms need of an asyncio storage: one batched consume call per
+    decision. Storages that only decide remotely, such as the sidecar client, implement
+    this alone; StorageInterface adds the read-modify-write primitives.
+    """
+
+    @abstractmethod
+    async def consume_windows(
+        self, requests: list[WindowConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        pass
+
+    @abstractmethod
+    async def consume_logs(
+        self, requests: list[LogConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        pass
+
+    @abstractmethod
+    async def consume_buckets(
+        self, requests: list[BucketConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        pass
+
+    # Connections, scripts and background work a backend can set up ahead of the first
+    # request, e.g. from the ASGI lifespan startup. Backends start lazily without it.
+    async def start(self) -> None:
+        pass
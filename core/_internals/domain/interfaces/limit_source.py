@@ -0,0 +1,28 @@
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Optional, Union
+
+from ..models import Limit
+
+
+class LimitSource(ABC):
+    """Per-key limit overrides, such as the plan of every API key.
+
+    `get` returns the overrides it holds among the requested keys, the other keys keep
+    the limit of their rule. Sources doing network I/O set `is_async` and return an
+    awaitable. A source that learns about changes calls the `invalidate` callback given to
+    `start` with the changed keys, or None when any key may have changed.
+    """
+
+    is_async: bool = False
+
+    @abstractmethod
+    def get(
+        self, keys: list[str]
+    ) -> Union[dict[str, Limit], Awaitable[dict[str, Limit]]]:
+        pass
+
+    async def start(self, invalidate: Callable[[Optional[list[str]]], None]) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
@@ -1,12 +1,81 @@
 from abc import ABC, abstractmethod
 from datetime import timedelta
+from typing import Any
 
-from ...domain.models import RateLimitResult
+from ...domain.models import RateLimitResult, RateLimitRequest, ConsumeResult
 
 
 class RateLimitAlgorithm(ABC):
-    @abstractmethod
+    """Decides requests through a single batched consume call of the storage.
+
+    Algorithms plan the storage request of every decision and build its result from
+    what the storage consumed. The asyncio (`is_allowed*`) and blocking (`check*`) entry
+    points share that planning and result building and differ only in awaiting the
+    storage call. Implementations set `_storage` and `_clock`.
+    """
+
     async def is_allowed(
-        self, key: str, limit: int, window: timedelta
+        self, key: str, limit: int, window: timedelta, cost: int = 1
+    ) -> RateLimitResult:
+        now = self._clock.now()
+        plan = self._plan(key, limit, window, cost, now)
+        [consumed] = await self._consume([plan], False)
+        return self._result(plan, consumed, window, now)
+
+    async def is_allowed_many(
+        self, requests: list[RateLimitRequest], atomic: bool = False
+    ) -> list[RateLimitResult]:
+        now = self._clock.now()
+        plans = self._plans(requests, now)
+        consumed = await self._consume(plans, atomic)
+        return self._results(requests, plans, consumed, now)
+
+    def check(
+        self, key: str, limit: int, window: timedelta, cost: int = 1
+    ) -> RateLimitResult:
+        now = self._clock.now()
+        plan = self._plan(key, limit, window, cost, now)
+        [consumed] = self._consume([plan], False)
+        return self._result(plan, consumed, window, now)
+
+    def check_many(
+        self, requests: list[RateLimitRequest], atomic: bool = False
+    ) -> list[RateLimitResult]:
+        now = self._clock.now()
+        plans = self._plans(requests, now)
+        consumed = self._consume(plans, atomic)
+        return self._results(requests, plans, consumed, now)
+
+    def _plans(self, requests: list[RateLimitRequest], now: float) -> list:
+        return [
+            self._plan(request.key, request.limit, request.window, request.cost, now)
+            for request in requests
+        ]
+
+    def _results(
+        self,
+        requests: list[RateLimitRequest],
+        plans: list,
+        consumed: list[ConsumeResult],
+        now: float,
+    ) -> list[RateLimitResult]:
+        return [
+            self._result(plan, result, request.window, now)
+            for request, plan, result in zip(requests, plans, consumed)
+        ]
+
+    @abstractmethod
+    def _plan(
+        self, key: str, limit: int, window: timedelta, cost: int, now: float
+    ) -> Any:
+        pass
+
+    @abstractmethod
+    def _consume(self, plans: list, atomic: bool) -> Any:
+        """The consume call of the storage, awaitable for asyncio storages."""
+
+    @abstractmethod
+    def _result(
+        self, plan: Any, consumed: ConsumeResult, window: timedelta, now: float
     ) -> RateLimitResult:
         pass
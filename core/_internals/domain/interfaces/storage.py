@@ -1,18 +1,34 @@
-from abc import ABC, abstractmethod
+from abc import abstractmethod
 from typing import Optional
 
-from ..models import WindowData, BucketState
+from ..models import (
+    WindowData,
+    BucketState,
+    WindowConsume,
+    LogConsume,
+    BucketConsume,
+    ConsumeResult,
+)
+from .consume_storage import ConsumeStorageInterface
 
 
-class StorageInterface(ABC):
+class StorageInterface(ConsumeStorageInterface):
     @abstractmethod
-    async def increment_windows(self, key: str, window: int, ttl: int) -> int:
+    async def increment_windows(
+        self, key: str, window: int, ttl: int, amount: int = 1
+    ) -> int:
         pass
 
     @abstractmethod
     async def get_window_counts(
-        self, key: str, current_window: int, previous_window: int
+        self,
+        key: str,
+        current_window: int,
+        previous_window: int,
+        ttl: Optional[int] = None,
     ) -> WindowData:
+        # `ttl`, the lifetime the windows were incremented with, tells the window sizes
+        # of one key apart where their indexes alone do not
         pass
 
     @abstractmethod
@@ -34,3 +50,131 @@ class StorageInterface(ABC):
     @abstractmethod
     async def update_bucket_state(self, key: str, state: BucketState, ttl: int) -> None:
         pass
+
+    # Batched decisions. Every request is checked and, when allowed, charged its cost.
+    # With `atomic` nothing is charged unless every request of the batch is allowed.
+    # These defaults are composed from the primitives above, backends that can decide
+    # a whole batch in one round trip or one locked pass override them.
+
+    async def consume_windows(
+        self, requests: list[WindowConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        results = []
+        pending: dict[tuple[str, int], int] = {}
+        for request in requests:
+            data = await self.get_window_counts(
+                key=request.key,
+                current_window=request.current_window,
+                previous_window=request.previous_window,
+                ttl=request.ttl,
+            )
+            series = (request.key, request.ttl)
+            count = (
+                data.previous_count * request.weight
+                + data.current_count
+                + pending.get(series, 0)
+            )
+            allowed = count + request.cost <= request.limit
+            if allowed:
+                count += request.cost
+                if atomic:
+                    pending[series] = pending.get(series, 0) + request.cost
+                else:
+                    await self.increment_windows(
+                        key=request.key,
+                        window=request.current_window,
+                        ttl=request.ttl,
+                        amount=request.cost,
+                    )
+            results.append(
+                ConsumeResult(allowed=allowed, remaining=request.limit - count)
+            )
+        if atomic:
+            if not all(result.allowed for result in results):
+                return self._reject(requests, results)
+            for request in requests:
+                await self.increment_windows(
+                    key=request.key,
+                    window=request.current_window,
+                    ttl=request.ttl,
+                    amount=request.cost,
+                )
+        return results
+
+    async def consume_logs(
+        self, requests: list[LogConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        results = []
+        pending: dict[str, int] = {}
+        for request in requests:
+            await self.remove_before(key=request.key, timestamp=request.start)
+            count = await self.count_in_range(
+                key=request.key, start=request.start, end=request.now
+            )
+            count += pending.get(request.key, 0)
+            allowed = count + request.cost <= request.limit
+            if allowed:
+                count += request.cost
+                if atomic:
+                    pending[request.key] = pending.get(request.key, 0) + request.cost
+                else:
+                    await self._charge_log(request)
+            results.append(
+                ConsumeResult(allowed=allowed, remaining=request.limit - count)
+            )
+        if atomic:
+            if not all(result.allowed for result in results):
+                return self._reject(requests, results)
+            for request in requests:
+                await self._charge_log(request)
+        return results
+
+    async def consume_buckets(
+        self, requests: list[BucketConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        results = []
+        states: dict[str, BucketState] = {}
+        for request in requests:
+            state = states.get(request.key)
+            if state is None:
+                state = await self.get_bucket_state(key=request.key)
+                if state is None:
+                    state = BucketState(
+                        latest_refill=request.now, tokens=float(request.capacity)
+                    )
+                states[request.key] = state
+            state.refill(request.now, request.capacity, request.refill_rate)
+            allowed = state.tokens >= request.cost
+            if allowed:
+                state.tokens -= request.cost
+            results.append(ConsumeResult(allowed=allowed, remaining=state.tokens))
+        if atomic and not all(result.allowed for result in results):
+            return self._reject(requests, results)
+        for request in requests:
+            state = states.pop(request.key, None)
+            if state is not None:
+                await self.update_bucket_state(
+                    key=request.key, state=state, ttl=request.ttl
+                )
+        return results
+
+    async def _charge_log(self, request: LogConsume) -> None:
+        for _ in range(request.cost):
+            await self.add_timestamp(
+                key=request.key, timestamp=request.now, ttl=request.ttl
+            )
+
+    @staticmethod
+    def _reject(requests: list, results: list[ConsumeResult]) -> list[ConsumeResult]:
+        # a refused atomic batch charges nothing, report what each request had left
+        return [
+            ConsumeResult(
+                allowed=False,
+                remaining=(
+                    result.remaining + request.cost
+                    if result.allowed
+                    else result.remaining
+                ),
+            )
+            for request, result in zip(requests, results)
+        ]
@@ -0,0 +1,33 @@
+from abc import ABC, abstractmethod
+
+from ..models import WindowConsume, LogConsume, BucketConsume, ConsumeResult
+
+
+class SyncStorageInterface(ABC):
+    """Blocking counterpart of StorageInterface for threaded (WSGI) applications.
+
+    Only the batch operations are required: every algorithm decides through a single
+    consume call, so the read-modify-write primitives have no sync callers. Implementations
+    must be safe to call from many threads at once.
+    """
+
+    @abstractmethod
+    def consume_windows(
+        self, requests: list[WindowConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        pass
+
+    @abstractmethod
+    def consume_logs(
+        self, requests: list[LogConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        pass
+
+    @abstractmethod
+    def consume_buckets(
+        self, requests: list[BucketConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        pass
+
+    def close(self) -> None:
+        pass
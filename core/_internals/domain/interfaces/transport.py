@@ -0,0 +1,17 @@
+from abc import ABC, abstractmethod
+from typing import Callable
+
+
+class PeerTransport(ABC):
+    @abstractmethod
+    async def start(self, on_message: Callable[[bytes], None]) -> None:
+        pass
+
+    @abstractmethod
+    def send(self, data: bytes) -> None:
+        """Send one datagram to every peer, best effort."""
+        pass
+
+    @abstractmethod
+    async def close(self) -> None:
+        pass
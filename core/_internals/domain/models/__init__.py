@@ -1,3 +1,11 @@
 from .bucket import BucketState
 from .window import WindowData
 from .rate_limit_result import RateLimitResult
+from .consume import (
+    RateLimitRequest,
+    WindowConsume,
+    LogConsume,
+    BucketConsume,
+    ConsumeResult,
+)
+from .limit import Limit
@@ -1,7 +1,12 @@
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True)
 class BucketState:
     latest_refill: float
     tokens: float
+
+    def refill(self, now: float, capacity: float, refill_rate: float) -> None:
+        elapsed = max(0.0, now - self.latest_refill)
+        self.tokens = min(capacity, self.tokens + elapsed * refill_rate)
+        self.latest_refill = now
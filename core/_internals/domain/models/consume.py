@@ -0,0 +1,49 @@
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Union
+
+
+@dataclass(slots=True)
+class RateLimitRequest:
+    key: str
+    limit: int
+    window: Union[timedelta, int]
+    cost: int = 1
+
+
+@dataclass(slots=True)
+class WindowConsume:
+    key: str
+    current_window: int
+    previous_window: int
+    # share of the previous window still inside the sliding window
+    weight: float
+    limit: int
+    cost: int
+    ttl: int
+
+
+@dataclass(slots=True)
+class LogConsume:
+    key: str
+    start: float
+    now: float
+    limit: int
+    cost: int
+    ttl: int
+
+
+@dataclass(slots=True)
+class BucketConsume:
+    key: str
+    capacity: int
+    refill_rate: float
+    now: float
+    cost: int
+    ttl: int
+
+
+@dataclass(slots=True)
+class ConsumeResult:
+    allowed: bool
+    remaining: float
@@ -0,0 +1,26 @@
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Union
+
+
+@dataclass(slots=True, frozen=True)
+class Limit:
+    limit: int
+    window: timedelta
+
+    @classmethod
+    def parse(cls, value: Union["Limit", str, bytes, tuple, list, dict]) -> "Limit":
+        """Read "limit/window", (limit, window) or {"limit": ..., "window": ...}."""
+        if isinstance(value, Limit):
+            return value
+        if isinstance(value, bytes):
+            value = value.decode()
+        if isinstance(value, str):
+            value = value.split("/")
+        elif isinstance(value, dict):
+            value = (value["limit"], value["window"])
+        limit, window = value
+        limit, window = int(limit), int(window)
+        if limit < 0 or window <= 0:
+            raise ValueError(f"Invalid limit {limit}/{window}")
+        return cls(limit=limit, window=timedelta(seconds=window))
@@ -4,7 +4,7 @@ from typing import Optional
 from ...domain.exceptions import RateLimitExceeded
 
 
-@dataclass
+@dataclass(slots=True)
 class RateLimitResult:
     allowed: bool
     limit: int
@@ -14,7 +14,13 @@ class RateLimitResult:
 
     def check(self) -> None:
         if not self.allowed:
-            raise RateLimitExceeded()
+            raise RateLimitExceeded(details=self.dump())
 
     def dump(self) -> dict:
-        return {k: str(v).encode("utf-8") for k, v in self.__dict__.items()}
+        return {
+            "allowed": str(self.allowed).encode("utf-8"),
+            "limit": str(self.limit).encode("utf-8"),
+            "remaining": str(self.remaining).encode("utf-8"),
+            "reset_at": str(self.reset_at).encode("utf-8"),
+            "retry_after": str(self.retry_after).encode("utf-8"),
+        }
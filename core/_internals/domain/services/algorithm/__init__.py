@@ -1,3 +1,10 @@
-from .sliding_window_counter import SlidingWindowCounter
-from .sliding_window_log import SlidingWindowLog
-from .token_bucket import TokenBucket
+from ....lazy import lazy_imports
+
+__getattr__ = lazy_imports(
+    __name__,
+    {
+        "SlidingWindowCounter": ".sliding_window_counter",
+        "SlidingWindowLog": ".sliding_window_log",
+        "TokenBucket": ".token_bucket",
+    },
+)
@@ -0,0 +1,14 @@
+import math
+from zlib import crc32
+
+_SPAN = 2**32
+
+
+def window_phase(key: str, window_seconds: float) -> float:
+    # a fixed offset in [0, window) from the key, spreading the window boundaries of
+    # different keys evenly over the window while every node agrees on those of one key
+    return crc32(key.encode()) / _SPAN * window_seconds
+
+
+def window_index(now: float, window_seconds: float, phase: float = 0.0) -> int:
+    return math.floor((now - phase) / window_seconds)
@@ -1,46 +1,67 @@
 from datetime import timedelta
-from time import time
+from typing import Optional, Union
 
-
-from ....domain.interfaces.storage import StorageInterface
+from ....domain.interfaces.consume_storage import ConsumeStorageInterface
+from ....domain.interfaces.sync_storage import SyncStorageInterface
 from ....domain.interfaces.rate_limit import RateLimitAlgorithm
-from ....domain.models import RateLimitResult
+from ....domain.interfaces.clock import Clock
+from ..clock import SystemClock
+from .phase import window_index, window_phase
+from ....domain.models import (
+    RateLimitResult,
+    WindowConsume,
+    ConsumeResult,
+)
 
 
 class SlidingWindowCounter(RateLimitAlgorithm):
-    def __init__(self, storage: StorageInterface):
+    def __init__(
+        self,
+        storage: Union[ConsumeStorageInterface, SyncStorageInterface],
+        clock: Optional[Clock] = None,
+        stagger: bool = False,
+    ):
         self._storage = storage
+        self._clock = clock or SystemClock()
+        self._stagger = stagger
 
-    async def is_allowed(
-        self, key: str, limit: int, window: timedelta
-    ) -> RateLimitResult:
-        now = time()
+    def _plan(
+        self, key: str, limit: int, window: timedelta, cost: int, now: float
+    ) -> WindowConsume:
         window_seconds = int(window.total_seconds())
-
-        curr_window = int(now / window_seconds)
-        prev_window = curr_window - 1
-
-        data = await self._storage.get_window_counts(
-            key=key, current_window=curr_window, previous_window=prev_window
-        )
-
-        curr_count = await self._storage.increment_windows(
-            key=key, window=curr_window, ttl=window_seconds * 2
+        phase = self._phase(key, window_seconds)
+        curr_window = window_index(now, window_seconds, phase)
+        elapsed = now - phase - (curr_window * window_seconds)
+        return WindowConsume(
+            key=key,
+            current_window=curr_window,
+            previous_window=curr_window - 1,
+            weight=1 - elapsed / window_seconds,
+            limit=limit,
+            cost=cost,
+            ttl=window_seconds * 2,
         )
-        elapsed = now - (curr_window * window_seconds)
-        weight = elapsed / window_seconds
-
-        est_count = (data.previous_count * (1 - weight)) + curr_count
 
-        remaining_token = max(0, limit - est_count)
-        reset_at = (curr_window + 1) * window_seconds
-        retry_after = int(reset_at - now)
-        allowed = est_count <= limit
+    def _consume(self, plans: list[WindowConsume], atomic: bool):
+        return self._storage.consume_windows(plans, atomic=atomic)
 
+    def _result(
+        self,
+        request: WindowConsume,
+        consumed: ConsumeResult,
+        window: timedelta,
+        now: float,
+    ) -> RateLimitResult:
+        window_seconds = int(window.total_seconds())
+        phase = self._phase(request.key, window_seconds)
+        reset_at = (request.current_window + 1) * window_seconds + phase
         return RateLimitResult(
-            allowed=allowed,
-            limit=limit,
-            remaining=remaining_token,
+            allowed=consumed.allowed,
+            limit=request.limit,
+            remaining=max(0, consumed.remaining),
             reset_at=reset_at,
-            retry_after=retry_after,
+            retry_after=int(reset_at - now),
         )
+
+    def _phase(self, key: str, window_seconds: int) -> float:
+        return window_phase(key, window_seconds) if self._stagger else 0
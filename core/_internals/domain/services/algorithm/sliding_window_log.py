@@ -1,40 +1,57 @@
 from datetime import timedelta
-from time import time
+from typing import Optional, Union
 
-
-from ....domain.interfaces.storage import StorageInterface
+from ....domain.interfaces.consume_storage import ConsumeStorageInterface
+from ....domain.interfaces.sync_storage import SyncStorageInterface
 from ....domain.interfaces.rate_limit import RateLimitAlgorithm
-from ....domain.models import RateLimitResult
+from ....domain.interfaces.clock import Clock
+from ..clock import SystemClock
+from .phase import window_index
+from ....domain.models import (
+    RateLimitResult,
+    LogConsume,
+    ConsumeResult,
+)
 
 
 class SlidingWindowLog(RateLimitAlgorithm):
-    def __init__(self, storage: StorageInterface):
+    def __init__(
+        self,
+        storage: Union[ConsumeStorageInterface, SyncStorageInterface],
+        clock: Optional[Clock] = None,
+    ):
         self._storage = storage
+        self._clock = clock or SystemClock()
 
-    async def is_allowed(
-        self, key: str, limit: int, window: timedelta
-    ) -> RateLimitResult:
-        now = time()
+    def _plan(
+        self, key: str, limit: int, window: timedelta, cost: int, now: float
+    ) -> LogConsume:
         window_seconds = window.total_seconds()
-        curr_window = int(now / window_seconds)
-        window_start = now - window_seconds
-
-        await self._storage.remove_before(key=key, timestamp=window_start)
-
-        await self._storage.add_timestamp(
-            key=key, timestamp=now, ttl=int(window_seconds)
+        return LogConsume(
+            key=key,
+            start=now - window_seconds,
+            now=now,
+            limit=limit,
+            cost=cost,
+            ttl=max(1, int(window_seconds)),
         )
-        count = await self._storage.count_in_range(key=key, start=window_start, end=now)
 
-        allowed = count < limit
-        remaining_token = max(0, limit - count)
-        reset_at = (curr_window + 1) * window_seconds
-        retr_after = int(reset_at - now)
+    def _consume(self, plans: list[LogConsume], atomic: bool):
+        return self._storage.consume_logs(plans, atomic=atomic)
 
+    def _result(
+        self,
+        request: LogConsume,
+        consumed: ConsumeResult,
+        window: timedelta,
+        now: float,
+    ) -> RateLimitResult:
+        window_seconds = window.total_seconds()
+        reset_at = (window_index(now, window_seconds) + 1) * window_seconds
         return RateLimitResult(
-            allowed=allowed,
-            limit=limit,
-            remaining=remaining_token,
+            allowed=consumed.allowed,
+            limit=request.limit,
+            remaining=max(0, consumed.remaining),
             reset_at=reset_at,
-            retry_after=retr_after,
+            retry_after=int(reset_at - now),
         )
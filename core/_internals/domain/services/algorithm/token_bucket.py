@@ -1,55 +1,61 @@
 from datetime import timedelta
-from time import time
+from typing import Optional, Union
 
-from ....domain.interfaces.storage import StorageInterface
-from ....domain.models.bucket import BucketState
+from ....domain.interfaces.consume_storage import ConsumeStorageInterface
+from ....domain.interfaces.sync_storage import SyncStorageInterface
 from ....domain.interfaces.rate_limit import RateLimitAlgorithm
-from ....domain.models import RateLimitResult
+from ....domain.interfaces.clock import Clock
+from ..clock import SystemClock
+from ....domain.models import (
+    RateLimitResult,
+    BucketConsume,
+    ConsumeResult,
+)
 
 
 class TokenBucket(RateLimitAlgorithm):
-    def __init__(self, storage: StorageInterface):
+    def __init__(
+        self,
+        storage: Union[ConsumeStorageInterface, SyncStorageInterface],
+        clock: Optional[Clock] = None,
+    ):
         self._storage = storage
+        self._clock = clock or SystemClock()
 
-    async def is_allowed(
-        self, key: str, limit: int, window: timedelta
-    ) -> RateLimitResult:
-        now = time()
+    def _plan(
+        self, key: str, limit: int, window: timedelta, cost: int, now: float
+    ) -> BucketConsume:
         window_seconds = window.total_seconds()
-        refill_rate = limit / window_seconds
-
-        state = await self._storage.get_bucket_state(key=key)
-        if not state:
-            state = BucketState(tokens=float(limit), latest_refill=now)
-        elapsed = now - state.latest_refill
-        tokens_to_add = elapsed * refill_rate
-
-        state.tokens = min(limit, state.tokens + tokens_to_add)
-        state.latest_refill = now
-
-        if state.tokens >= 1.0:
-            state.tokens -= 1.0
-            allowed = True
-        else:
-            allowed = False
-
-        remaining_token = state.tokens
-        await self._storage.update_bucket_state(
-            key=key, state=state, ttl=int(window_seconds * 2)
+        return BucketConsume(
+            key=key,
+            capacity=limit,
+            refill_rate=limit / window_seconds,
+            now=now,
+            cost=cost,
+            ttl=int(window_seconds * 2),
         )
 
-        if not allowed:
-            tokens_needed = 1.0 - state.tokens
-            retry_after = max(1, int(tokens_needed / refill_rate))
+    def _consume(self, plans: list[BucketConsume], atomic: bool):
+        return self._storage.consume_buckets(plans, atomic=atomic)
+
+    def _result(
+        self,
+        request: BucketConsume,
+        consumed: ConsumeResult,
+        window: timedelta,
+        now: float,
+    ) -> RateLimitResult:
+        tokens = consumed.remaining
+        if not consumed.allowed:
+            tokens_needed = request.cost - tokens
+            retry_after = max(1, int(tokens_needed / request.refill_rate))
         else:
             retry_after = 0
 
-        reset_at = now + (limit - state.tokens) / refill_rate
-
         return RateLimitResult(
-            allowed=allowed,
-            limit=limit,
-            remaining=remaining_token,
-            reset_at=reset_at,
+            allowed=consumed.allowed,
+            limit=request.capacity,
+            remaining=tokens,
+            reset_at=request.now + (request.capacity - tokens) / request.refill_rate,
             retry_after=retry_after,
         )
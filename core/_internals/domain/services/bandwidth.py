@@ -0,0 +1,51 @@
+from typing import Optional
+
+from ..models import BucketState
+
+
+class BandwidthLimiter:
+    """Byte-rate token buckets, one per key, that pace traffic instead of refusing it.
+
+    Every chunk is debited in full and may take a bucket below zero. The returned delay
+    is how long the caller has to wait for the debt to be paid back at `rate` bytes per
+    second, so concurrent streams of one key queue up behind each other. Buckets that
+    have refilled to `burst` are the same as absent ones and are swept once the table
+    doubles in size.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0")
+        if burst is not None and burst <= 0:
+            raise ValueError("burst must be greater than 0")
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else rate)
+        self._buckets: dict[str, BucketState] = {}
+        self._sweep_at = 1024
+
+    def reserve(self, key: str, size: int, now: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self._sweep_at:
+                self._sweep(now)
+            bucket = BucketState(latest_refill=now, tokens=self.burst)
+            self._buckets[key] = bucket
+        else:
+            bucket.refill(now, self.burst, self.rate)
+        bucket.tokens -= size
+        if bucket.tokens >= 0:
+            return 0.0
+        return -bucket.tokens / self.rate
+
+    def _sweep(self, now: float) -> None:
+        full = [
+            key
+            for key, bucket in self._buckets.items()
+            if bucket.tokens + (now - bucket.latest_refill) * self.rate >= self.burst
+        ]
+        for key in full:
+            del self._buckets[key]
+        self._sweep_at = max(1024, len(self._buckets) * 2)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
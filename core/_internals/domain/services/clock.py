@@ -0,0 +1,71 @@
+import asyncio
+from time import monotonic, time
+from typing import Optional
+
+from ..interfaces.clock import Clock
+
+
+class SystemClock(Clock):
+    """Wall clock time, as returned by `time.time()`."""
+
+    def now(self) -> float:
+        return time()
+
+
+class MonotonicClock(Clock):
+    """Epoch time that never jumps.
+
+    Reads the wall clock once and advances it with `time.monotonic()` afterwards, so NTP
+    steps or manual clock changes cannot refill or drain buckets. The process drifts
+    along with its monotonic clock until it restarts.
+    """
+
+    def __init__(self):
+        self._offset = time() - monotonic()
+
+    def now(self) -> float:
+        return monotonic() + self._offset
+
+
+class CoarseClock(Clock):
+    """Caches the time of another clock for the rest of the current event loop tick.
+
+    All decisions made in one tick share one reading of the source clock instead of
+    paying for one each. Outside of a running event loop every call reads the source.
+    """
+
+    def __init__(self, source: Optional[Clock] = None):
+        self.source = source or MonotonicClock()
+        self._cached: Optional[float] = None
+
+    def now(self) -> float:
+        cached = self._cached
+        if cached is not None:
+            return cached
+        value = self.source.now()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return value
+        self._cached = value
+        loop.call_soon(self._expire)
+        return value
+
+    def _expire(self) -> None:
+        self._cached = None
+
+
+class ManualClock(Clock):
+    """Clock that only moves when told to, for tests, benchmarks and simulations."""
+
+    def __init__(self, start: float = 0.0):
+        self._now = float(start)
+
+    def now(self) -> float:
+        return self._now
+
+    def set(self, timestamp: float) -> None:
+        self._now = float(timestamp)
+
+    def advance(self, seconds: float) -> None:
+        self._now += seconds
@@ -0,0 +1,297 @@
+from base64 import urlsafe_b64encode
+from ipaddress import ip_address, ip_network
+from socket import AF_INET, AF_INET6, inet_ntop, inet_pton
+from sys import intern
+from typing import Iterable, Optional, Union
+
+_CACHE_SIZE = 65536
+_IPV4_MAPPED = bytes(10) + b"\xff\xff"
+
+
+class _Header:
+    __slots__ = ("name", "prefix")
+
+    def __init__(self, name: str, prefix: str):
+        self.name = name
+        self.prefix = prefix
+
+    def raw(self, host: str, values: dict):
+        return values.get(self.name) or None
+
+    def text(self, raw) -> str:
+        return self.prefix + (raw if raw.__class__ is str else raw.decode("latin-1"))
+
+
+class _ClientIP:
+    __slots__ = (
+        "trusted",
+        "header",
+        "prefix",
+        "lengths",
+        "packed",
+        "_trust",
+        "_clients",
+    )
+
+    def __init__(
+        self,
+        trusted: tuple,
+        header: str,
+        prefix: str,
+        lengths: tuple[int, int] = (32, 128),
+        packed: bool = False,
+    ):
+        self.trusted = trusted
+        self.header = header
+        self.prefix = prefix
+        self.lengths = lengths
+        self.packed = packed
+        self._trust: dict[str, bool] = {}
+        self._clients: dict = {}
+
+    def raw(self, host: str, values: dict):
+        if not self.trusted:
+            return host
+        trusted = self._trust.get(host)
+        if not (self._trusted(host) if trusted is None else trusted):
+            return host
+        forwarded = values.get(self.header)
+        if not forwarded:
+            return host
+        client = self._clients.get(forwarded)
+        if client is None:
+            client = self._forwarded_client(forwarded)
+            if len(self._clients) >= _CACHE_SIZE:
+                self._clients.clear()
+            self._clients[forwarded] = client
+        return client or host
+
+    def _forwarded_client(self, forwarded) -> str:
+        if forwarded.__class__ is not str:
+            forwarded = forwarded.decode("latin-1")
+        # proxies append the address they received from, the rightmost untrusted
+        # address is the last one no trusted proxy can have made up
+        hops = [hop.strip() for hop in forwarded.split(",")]
+        for hop in reversed(hops):
+            if hop and not self._trusted(hop):
+                return hop
+        return hops[0]
+
+    def text(self, raw) -> str:
+        if not self.packed and self.lengths == (32, 128):
+            return self.prefix + raw
+        family = AF_INET6 if ":" in raw else AF_INET
+        try:
+            address = inet_pton(family, raw)
+        except OSError:
+            return self.prefix + raw
+        if address[:12] == _IPV4_MAPPED:
+            family, address = AF_INET, address[12:]
+        version = 4 if family == AF_INET else 6
+        bits = len(address) * 8
+        length = self.lengths[0] if version == 4 else self.lengths[1]
+        network = int.from_bytes(address, "big") >> (bits - length)
+        if not self.packed:
+            text = inet_ntop(
+                family, (network << (bits - length)).to_bytes(bits // 8, "big")
+            )
+            return self.prefix + (text if length == bits else f"{text}/{length}")
+        # the prefix bits as big endian bytes, "ip:4:ywBxTQ" for 203.0.113.77 and
+        # "ip:6/64:IAENuAAAAAA" for any address of 2001:db8::/64
+        packed = urlsafe_b64encode(network.to_bytes((length + 7) // 8, "big"))
+        tag = version if length == bits else f"{version}/{length}"
+        return f"{self.prefix}{tag}:{packed.rstrip(b'=').decode()}"
+
+    def _trusted(self, address: str) -> bool:
+        trusted = self._trust.get(address)
+        if trusted is None:
+            try:
+                parsed = ip_address(address)
+            except ValueError:
+                trusted = False
+            else:
+                trusted = any(parsed in network for network in self.trusted)
+            if len(self._trust) >= _CACHE_SIZE:
+                self._trust.clear()
+            self._trust[address] = trusted
+        return trusted
+
+
+class _Constant:
+    __slots__ = ("value",)
+
+    def __init__(self, value: str):
+        self.value = value
+
+    def raw(self, host: str, values: dict):
+        return self.value
+
+    def text(self, raw) -> str:
+        return raw
+
+
+_FALLBACK = (_ClientIP((), "", "ip:"),)
+
+
+class Key:
+    """Declarative description of a rate limit key, compiled by `add_rule`.
+
+    Fields are combined with `+` into one key ("org:acme:user:42") and alternatives with
+    `|`, the first alternative whose headers are all present and not empty gives the
+    key. When none does, the key is the client IP, as without a key function.
+
+    Client IPs can be aggregated to their network (`ipv6_prefix=64` limits a whole /64
+    with one counter) and packed: the prefix bits are encoded as a few base64
+    characters instead of the address text, which shortens every key stored for them.
+    """
+
+    __slots__ = ("alternatives",)
+
+    def __init__(self, alternatives: tuple):
+        self.alternatives = alternatives
+
+    @classmethod
+    def header(cls, name: str, prefix: Optional[str] = None) -> "Key":
+        name = name.lower()
+        return cls(((_Header(name, (name if prefix is None else prefix) + ":"),),))
+
+    @classmethod
+    def ip(
+        cls,
+        trusted_proxies: Iterable[str] = (),
+        header: str = "x-forwarded-for",
+        prefix: str = "ip",
+        ipv4_prefix: int = 32,
+        ipv6_prefix: int = 128,
+        packed: bool = False,
+    ) -> "Key":
+        if not 0 <= ipv4_prefix <= 32 or not 0 <= ipv6_prefix <= 128:
+            raise ValueError(
+                "ipv4_prefix must be within 0-32 and ipv6_prefix within 0-128"
+            )
+        trusted = tuple(ip_network(proxy, strict=False) for proxy in trusted_proxies)
+        return cls(
+            (
+                (
+                    _ClientIP(
+                        trusted,
+                        header.lower(),
+                        prefix + ":",
+                        (ipv4_prefix, ipv6_prefix),
+                        packed,
+                    ),
+                ),
+            )
+        )
+
+    @classmethod
+    def const(cls, value: str) -> "Key":
+        return cls(((_Constant(value),),))
+
+    def __or__(self, other: "Key") -> "Key":
+        if not isinstance(other, Key):
+            return NotImplemented
+        return Key(self.alternatives + other.alternatives)
+
+    def __add__(self, other: "Key") -> "Key":
+        if not isinstance(other, Key):
+            return NotImplemented
+        return Key(
+            tuple(
+                left + right
+                for left in self.alternatives
+                for right in other.alternatives
+            )
+        )
+
+    def compile(self) -> "KeyExtractor":
+        return KeyExtractor(self)
+
+
+class KeyExtractor:
+    """Compiled `Key` reading the raw request headers.
+
+    Only the headers the key uses are picked out of the ASGI header list or the WSGI
+    environment, and values are decoded once: keys are cached by their raw header
+    values, so a returning client gets the same interned string back. Also callable as
+    a regular `(host, headers)` key function.
+    """
+
+    __slots__ = ("_alternatives", "_names", "_environ", "_fallback")
+
+    def __init__(self, key: Key):
+        self._alternatives = tuple((fields, {}) for fields in key.alternatives)
+        self._fallback: dict[str, str] = {}
+        names = {
+            field.name if isinstance(field, _Header) else field.header
+            for fields in key.alternatives
+            for field in fields
+            if isinstance(field, _Header)
+            or (isinstance(field, _ClientIP) and field.trusted)
+        }
+        self._names = {name.encode("latin-1"): name for name in names}
+        self._environ = {
+            "HTTP_" + name.upper().replace("-", "_"): name for name in names
+        }
+        for name in ("content-type", "content-length"):
+            if name in names:
+                self._environ[name.upper().replace("-", "_")] = name
+
+    def from_scope(self, scope) -> str:
+        client = scope.get("client")
+        host = client[0] if client else "default"
+        values = {}
+        names = self._names
+        if names:
+            for name, value in scope["headers"]:
+                if name in names:
+                    name = names[name]
+                    previous = values.get(name)
+                    values[name] = (
+                        value if previous is None else previous + b"," + value
+                    )
+        return self._extract(host, values)
+
+    def from_environ(self, environ) -> str:
+        values = {
+            name: environ[variable]
+            for variable, name in self._environ.items()
+            if variable in environ
+        }
+        return self._extract(environ.get("REMOTE_ADDR") or "default", values)
+
+    def __call__(self, host: str, headers: dict) -> str:
+        values = {
+            name: headers[name] for name in self._names.values() if name in headers
+        }
+        return self._extract(host, values)
+
+    def _extract(self, host: str, values: dict) -> str:
+        for fields, cache in self._alternatives:
+            if len(fields) == 1:
+                raw = fields[0].raw(host, values)
+                if raw is None:
+                    continue
+            else:
+                raw = tuple(field.raw(host, values) for field in fields)
+                if None in raw:
+                    continue
+            key = cache.get(raw)
+            if key is None:
+                key = self._remember(fields, cache, raw)
+            return key
+        key = self._fallback.get(host)
+        if key is None:
+            key = self._remember(_FALLBACK, self._fallback, host)
+        return key
+
+    @staticmethod
+    def _remember(fields: tuple, cache: dict, raw: Union[tuple, bytes, str]) -> str:
+        if len(fields) == 1:
+            key = fields[0].text(raw)
+        else:
+            key = ":".join(field.text(value) for field, value in zip(fields, raw))
+        if len(cache) >= _CACHE_SIZE:
+            cache.clear()
+        cache[raw] = key = intern(key)
+        return key
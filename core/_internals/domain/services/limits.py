@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from time import monotonic
+from typing import Optional
+
+from ..interfaces.limit_source import LimitSource
+from ..models import Limit
+
+logger = logging.getLogger("throtty")
+
+
+class LimitResolver:
+    """Bounded TTL cache of the per-key limits of a `LimitSource`.
+
+    A key seen before is answered from memory: once its entry is older than `ttl`, or
+    invalidated by the source, the cached limit is still used while a background lookup
+    refreshes it, so only the first request of a key waits on the source. Keys without an
+    override are cached too. Asyncio lookups of one event loop tick go to the source in a
+    single `get` call, and while the source fails the last known limits are kept. Past
+    `max_size` keys the oldest entries are dropped first.
+    """
+
+    def __init__(
+        self, source: LimitSource, ttl: float = 60.0, max_size: int = 1_000_000
+    ):
+        if ttl <= 0:
+            raise ValueError("ttl must be greater than 0")
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.source = source
+        self.ttl = ttl
+        self.max_size = max_size
+        # key -> (limit or None, fetched at)
+        self._cache: dict[str, tuple[Optional[Limit], float]] = {}
+        self._valid_after = float("-inf")
+        # keys looked up and not answered yet, and those of the next call to the source
+        self._waiting: dict[str, asyncio.Future] = {}
+        self._batch: list[str] = []
+        self._tasks: set[asyncio.Task] = set()
+
+    async def resolve(self, key: str) -> Optional[Limit]:
+        entry = self._cache.get(key)
+        if entry is not None:
+            fetched_at = entry[1]
+            if fetched_at <= self._valid_after or monotonic() - fetched_at >= self.ttl:
+                self._lookup(key)
+            return entry[0]
+        if not self.source.is_async:
+            return self.resolve_sync(key)
+        return await self._lookup(key)
+
+    def resolve_sync(self, key: str) -> Optional[Limit]:
+        """Blocking variant for the WSGI engine, looking up stale keys inline."""
+        entry = self._cache.get(key)
+        now = monotonic()
+        if (
+            entry is not None
+            and entry[1] > self._valid_after
+            and now - entry[1] < self.ttl
+        ):
+            return entry[0]
+        try:
+            found = self.source.get([key])
+        except Exception as e:
+            logger.warning("Throtty could not look up the limit of %r: %s", key, e)
+            return entry[0] if entry is not None else None
+        limit = found.get(key)
+        self._store(key, limit, now)
+        return limit
+
+    def invalidate(self, keys: Optional[list[str]] = None) -> None:
+        """Mark keys, or every key, as changed; they are refreshed on their next use."""
+        if keys is None:
+            self._valid_after = monotonic()
+            return
+        for key in keys:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache[key] = (entry[0], float("-inf"))
+
+    async def start(self) -> None:
+        await self.source.start(self.invalidate)
+
+    async def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await self.source.close()
+
+    def _lookup(self, key: str) -> asyncio.Future:
+        future = self._waiting.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            if not self._batch:
+                # every lookup of this tick joins one call to the source
+                loop.call_soon(self._dispatch)
+            future = self._waiting[key] = loop.create_future()
+            self._batch.append(key)
+        return future
+
+    def _dispatch(self) -> None:
+        keys, self._batch = self._batch, []
+        task = asyncio.get_running_loop().create_task(self._fetch(keys))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, keys: list[str]) -> None:
+        # an invalidation arriving during the call leaves the answers stale
+        started = monotonic()
+        found = None
+        try:
+            reply = self.source.get(keys)
+            found = await reply if self.source.is_async else reply
+        except Exception as e:
+            logger.warning("Throtty could not look up %d limits: %s", len(keys), e)
+        finally:
+            # requests waiting on a failed or cancelled lookup keep the last known limit
+            for key in keys:
+                if found is None:
+                    entry = self._cache.get(key)
+                    limit = entry[0] if entry is not None else None
+                else:
+                    limit = found.get(key)
+                    self._store(key, limit, started)
+                future = self._waiting.pop(key)
+                if not future.done():
+                    future.set_result(limit)
+
+    def _store(self, key: str, limit: Optional[Limit], fetched_at: float) -> None:
+        cache = self._cache
+        if key not in cache and len(cache) >= self.max_size:
+            del cache[next(iter(cache))]
+        cache[key] = (limit, fetched_at)
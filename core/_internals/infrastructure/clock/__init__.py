@@ -0,0 +1,4 @@
+from ...lazy import lazy_imports
+from .factory import ClockOption, resolve_clock
+
+__getattr__ = lazy_imports(__name__, {"RedisClock": ".redis_clock"})
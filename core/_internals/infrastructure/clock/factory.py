@@ -0,0 +1,27 @@
+from typing import Literal, Optional, Union
+
+from ...domain.interfaces.clock import Clock
+from ...domain.services.clock import SystemClock, MonotonicClock, CoarseClock
+
+ClockOption = Union[Clock, Literal["system", "monotonic", "coarse", "redis"]]
+
+
+def resolve_clock(clock: Optional[ClockOption], redis=None) -> Clock:
+    if clock is None or clock == "system":
+        return SystemClock()
+    if isinstance(clock, Clock):
+        return clock
+    if clock == "monotonic":
+        return MonotonicClock()
+    if clock == "coarse":
+        return CoarseClock()
+    if clock == "redis":
+        if redis is None:
+            raise ValueError('clock="redis" requires a redis storage')
+        from .redis_clock import RedisClock
+
+        return RedisClock(redis)
+    raise ValueError(
+        f"Unknown clock {clock!r}. Choose between system, monotonic, coarse, redis or "
+        "pass a Clock instance"
+    )
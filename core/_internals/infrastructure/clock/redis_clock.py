@@ -0,0 +1,83 @@
+import asyncio
+import logging
+from time import monotonic, time
+from typing import Optional, Union
+
+from redis import Redis, RedisCluster
+from redis.asyncio import Redis as AsyncRedis, RedisCluster as AsyncRedisCluster
+from redis.exceptions import RedisError as RedisClientError
+
+from ...domain.interfaces.clock import Clock
+
+logger = logging.getLogger(__name__)
+
+
+class RedisClock(Clock):
+    """Epoch time following the clock of a Redis server.
+
+    Every node sharing the server agrees on window boundaries and bucket refills even when
+    their own clocks are skewed. The offset to the server `TIME` is measured every
+    `sync_interval` seconds, halving the round trip, and time advances with the local
+    monotonic clock in between, so a decision never waits on the measurement. Asyncio
+    clients are measured in a background task, blocking clients inline. Until the first
+    measurement, and whenever Redis is unreachable, the last known offset is kept.
+    """
+
+    def __init__(
+        self,
+        redis: Union[Redis, RedisCluster, AsyncRedis, AsyncRedisCluster],
+        sync_interval: float = 5.0,
+    ):
+        if sync_interval <= 0:
+            raise ValueError("sync_interval must be greater than 0")
+        self.redis = redis
+        self.sync_interval = sync_interval
+        self._is_async = isinstance(redis, (AsyncRedis, AsyncRedisCluster))
+        self._offset = time() - monotonic()
+        self._synced_at = float("-inf")
+        self._task: Optional[asyncio.Task] = None
+
+    def now(self) -> float:
+        current = monotonic()
+        if current - self._synced_at >= self.sync_interval:
+            self._synced_at = current
+            self._refresh()
+        return current + self._offset
+
+    async def sync(self) -> None:
+        """Measure the offset to the server clock now, e.g. once at startup."""
+        sent = monotonic()
+        if self._is_async:
+            reply = await self.redis.time()
+        else:
+            reply = self.redis.time()
+        self._apply(sent, reply, monotonic())
+
+    async def start(self) -> None:
+        await self._sync_in_background()
+
+    def _refresh(self) -> None:
+        if not self._is_async:
+            sent = monotonic()
+            try:
+                self._apply(sent, self.redis.time(), monotonic())
+            except (RedisClientError, OSError) as e:
+                logger.warning("Throtty could not read the Redis clock: %s", e)
+            return
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._task = loop.create_task(self._sync_in_background())
+
+    async def _sync_in_background(self) -> None:
+        try:
+            await self.sync()
+        except (RedisClientError, OSError, asyncio.TimeoutError) as e:
+            logger.warning("Throtty could not read the Redis clock: %s", e)
+
+    def _apply(self, sent: float, reply, received: float) -> None:
+        seconds, micros = reply
+        self._offset = int(seconds) + int(micros) / 1_000_000 - (sent + received) / 2
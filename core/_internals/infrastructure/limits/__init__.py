@@ -0,0 +1,5 @@
+from .sources import CallableLimitSource, FileLimitSource
+from ...lazy import lazy_imports
+
+# only the Redis source needs redis
+__getattr__ = lazy_imports(__name__, {"RedisLimitSource": ".redis_source"})
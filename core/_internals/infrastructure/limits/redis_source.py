@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from typing import Callable, Optional, Union
+
+from redis import Redis, RedisCluster
+from redis.asyncio import Redis as AsyncRedis, RedisCluster as AsyncRedisCluster
+from redis.exceptions import RedisError as RedisClientError
+
+from ...domain.interfaces.limit_source import LimitSource
+from ...domain.models import Limit
+
+logger = logging.getLogger("throtty")
+
+_INVALIDATE_CHANNEL = "__redis__:invalidate"
+
+
+class RedisLimitSource(LimitSource):
+    """Limits kept in one Redis hash, the field being the rate limit key and the value
+    "limit/window" (`HSET throtty:limits apikey:42 5000/3600`).
+
+    The keys of one lookup batch are read with a single `HMGET`. With `track`, a
+    connection of the asyncio client subscribes to Redis client-side caching
+    invalidations (`CLIENT TRACKING ... BCAST PREFIX <hash>`): any write to the hash marks
+    the cached limits stale, and they are refreshed in the background on their next use
+    instead of waiting for their TTL. Blocking clients rely on the TTL alone.
+    """
+
+    def __init__(
+        self,
+        redis: Union[Redis, RedisCluster, AsyncRedis, AsyncRedisCluster],
+        hash_key: str = "throtty:limits",
+        track: bool = False,
+    ):
+        self.redis = redis
+        self.hash_key = hash_key
+        self.track = track
+        self.is_async = isinstance(redis, (AsyncRedis, AsyncRedisCluster))
+        if track:
+            if not isinstance(redis, AsyncRedis):
+                raise ValueError("Tracking needs an asyncio redis.asyncio.Redis client")
+            protocol = redis.connection_pool.connection_kwargs.get("protocol", 2)
+            if str(protocol) == "3":
+                raise ValueError("Tracking needs a RESP2 connection")
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self, keys: list[str]):
+        if self.is_async:
+            return self._get(keys)
+        return self._parse(keys, self.redis.hmget(self.hash_key, keys))
+
+    async def _get(self, keys: list[str]) -> dict[str, Limit]:
+        return self._parse(keys, await self.redis.hmget(self.hash_key, keys))
+
+    def _parse(self, keys: list[str], values: list) -> dict[str, Limit]:
+        limits = {}
+        for key, value in zip(keys, values):
+            if value is None:
+                continue
+            try:
+                limits[key] = Limit.parse(value)
+            except (ValueError, TypeError):
+                logger.warning(
+                    "Throtty ignores the invalid limit %r of %r in %s",
+                    value,
+                    key,
+                    self.hash_key,
+                )
+        return limits
+
+    async def start(self, invalidate: Callable[[Optional[list[str]]], None]) -> None:
+        if self.track and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._watch(invalidate))
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _watch(self, invalidate: Callable[[Optional[list[str]]], None]) -> None:
+        delay = 0.1
+        while True:
+            connection = self.redis.connection_pool.make_connection()
+            try:
+                await connection.connect()
+                await connection.send_command("CLIENT", "ID")
+                client_id = await connection.read_response()
+                # the connection receives the invalidations of its own tracking
+                await connection.send_command(
+                    "CLIENT",
+                    "TRACKING",
+                    "ON",
+                    "REDIRECT",
+                    client_id,
+                    "BCAST",
+                    "PREFIX",
+                    self.hash_key,
+                )
+                await connection.read_response()
+                await connection.send_command("SUBSCRIBE", _INVALIDATE_CHANNEL)
+                await connection.read_response()
+                # writes made while nothing was tracking went unnoticed
+                invalidate(None)
+                delay = 0.1
+                while True:
+                    message = await connection.read_response()
+                    if message and message[0] in (b"message", "message"):
+                        # the hash is one key, any field of it may have changed
+                        invalidate(None)
+            except (RedisClientError, OSError) as e:
+                logger.warning("Throtty lost the Redis limit invalidations: %s", e)
+            finally:
+                await connection.disconnect()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 5.0)
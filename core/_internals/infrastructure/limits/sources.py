@@ -0,0 +1,92 @@
+import asyncio
+import csv
+import inspect
+import json
+import logging
+import os
+from time import monotonic
+from typing import Any, Awaitable, Callable, Optional, Union
+
+from ...domain.interfaces.limit_source import LimitSource
+from ...domain.models import Limit
+
+logger = logging.getLogger("throtty")
+
+
+class CallableLimitSource(LimitSource):
+    """Limits returned by a function of the key, or a coroutine function for I/O.
+
+    The function returns "limit/window", (limit, window), a `Limit`, or None to keep the
+    limit of the rule.
+    """
+
+    def __init__(self, func: Callable[[str], Union[Any, Awaitable[Any]]]):
+        self.func = func
+        self.is_async = inspect.iscoroutinefunction(func)
+
+    def get(self, keys: list[str]):
+        if self.is_async:
+            return self._gather(keys)
+        return self._parse(keys, [self.func(key) for key in keys])
+
+    async def _gather(self, keys: list[str]) -> dict[str, Limit]:
+        values = await asyncio.gather(*(self.func(key) for key in keys))
+        return self._parse(keys, values)
+
+    @staticmethod
+    def _parse(keys: list[str], values: list) -> dict[str, Limit]:
+        return {
+            key: Limit.parse(value)
+            for key, value in zip(keys, values)
+            if value is not None
+        }
+
+
+class FileLimitSource(LimitSource):
+    """Limits read from a JSON or CSV file, reloaded when the file changes.
+
+    A JSON file maps keys to "limit/window", [limit, window] or {"limit", "window"}; a CSV
+    file has `key`, `limit` and `window` columns. The modification time is checked at most
+    every `check_interval` seconds, and a reload invalidates every cached limit.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], check_interval: float = 5.0):
+        self.path = os.fspath(path)
+        self.check_interval = check_interval
+        self._invalidate: Optional[Callable[[Optional[list[str]]], None]] = None
+        self._mtime = os.stat(self.path).st_mtime_ns
+        self._checked_at = monotonic()
+        self._limits = self._load()
+
+    def get(self, keys: list[str]) -> dict[str, Limit]:
+        now = monotonic()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            self._reload()
+        limits = self._limits
+        return {key: limits[key] for key in keys if key in limits}
+
+    async def start(self, invalidate: Callable[[Optional[list[str]]], None]) -> None:
+        self._invalidate = invalidate
+
+    def _reload(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self._mtime:
+                return
+            limits = self._load()
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Throtty could not reload limits from %s: %s", self.path, e)
+            return
+        self._mtime, self._limits = mtime, limits
+        if self._invalidate is not None:
+            self._invalidate(None)
+
+    def _load(self) -> dict[str, Limit]:
+        with open(self.path, newline="") as f:
+            if self.path.endswith(".csv"):
+                return {
+                    row["key"]: Limit.parse((row["limit"], row["window"]))
+                    for row in csv.DictReader(f)
+                }
+            return {key: Limit.parse(value) for key, value in json.load(f).items()}
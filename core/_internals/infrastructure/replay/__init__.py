@@ -0,0 +1,2 @@
+from .reader import read_access_log
+from .simulator import ReplaySimulator, ReplayReport, RuleReport
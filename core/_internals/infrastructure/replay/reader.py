@@ -0,0 +1,69 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+Record = tuple[float, str, str]
+
+
+def read_access_log(
+    source: Union[str, Path],
+    format: Optional[str] = None,
+    time_field: str = "timestamp",
+    path_field: str = "path",
+    key_field: str = "ip",
+) -> Iterator[Record]:
+    """Stream `(timestamp, path, key)` records out of a CSV or JSON lines access log.
+
+    The file is read line by line, so logs far larger than memory can be replayed. The
+    format is taken from the suffix (`.csv`, `.jsonl`, `.ndjson`, optionally `.gz`)
+    unless given. Timestamps are epoch seconds or ISO 8601 strings, and keys are built
+    as `"<key_field>:<value>"`, the same shape as the default `"ip:<host>"` key.
+    """
+    source = Path(source)
+    suffixes = [suffix for suffix in source.suffixes if suffix != ".gz"]
+    format = format or (suffixes[-1].lstrip(".") if suffixes else "")
+    if format == "ndjson":
+        format = "jsonl"
+    if format not in ("csv", "jsonl"):
+        raise ValueError(f"Unsupported access log format {format!r}, use csv or jsonl")
+    return _records(source, format, time_field, path_field, key_field)
+
+
+def _records(
+    source: Path, format: str, time_field: str, path_field: str, key_field: str
+) -> Iterator[Record]:
+    if source.suffix == ".gz":
+        stream = io.TextIOWrapper(gzip.open(source, "rb"), encoding="utf-8", newline="")
+    else:
+        stream = open(source, encoding="utf-8", newline="")
+    with stream:
+        rows = csv.DictReader(stream) if format == "csv" else _json_lines(stream)
+        prefix = f"{key_field}:"
+        for line, row in enumerate(rows, start=1):
+            try:
+                yield (
+                    _timestamp(row[time_field]),
+                    row[path_field],
+                    prefix + str(row[key_field]),
+                )
+            except (KeyError, ValueError, TypeError) as e:
+                raise ValueError(f"{source}: bad record {line}: {e!r}") from e
+
+
+def _json_lines(stream) -> Iterator[dict]:
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _timestamp(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
@@ -0,0 +1,266 @@
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Iterable, Mapping, Optional, Sequence
+
+from ..storage.in_mem import SyncInMemStorage
+from ...domain.services.clock import ManualClock
+from ...domain.interfaces.rate_limit import RateLimitAlgorithm
+from ...domain.models import RateLimitRequest
+from ...application.use_cases.rate_limit import CheckRateLimitSyncUC
+from .reader import Record
+
+_ROUTE_CACHE_SIZE = 4096
+_ALGORITHM = "slidingwindow_counter"
+
+logger = logging.getLogger("throtty")
+
+
+@dataclass(slots=True)
+class RuleReport:
+    path: str
+    limit: int
+    window: int
+    requests: int = 0
+    rejected: int = 0
+    # key -> [requests, rejected]
+    keys: dict[str, list[int]] = field(default_factory=dict)
+
+    @property
+    def rejection_rate(self) -> float:
+        return self.rejected / self.requests if self.requests else 0.0
+
+    def key_percentiles(
+        self, percentiles: Sequence[float] = (50, 90, 99, 100)
+    ) -> dict[str, dict[float, int]]:
+        requests = sorted(counts[0] for counts in self.keys.values())
+        rejected = sorted(counts[1] for counts in self.keys.values())
+        return {
+            "requests": {p: _percentile(requests, p) for p in percentiles},
+            "rejected": {p: _percentile(rejected, p) for p in percentiles},
+        }
+
+    def top_keys(self, n: int = 10) -> list[tuple[str, int, int]]:
+        ranked = sorted(self.keys.items(), key=lambda item: item[1][1], reverse=True)
+        return [
+            (key, requests, rejected)
+            for key, (requests, rejected) in ranked[:n]
+            if rejected
+        ]
+
+
+@dataclass(slots=True)
+class ReplayReport:
+    rules: list[RuleReport]
+    records: int = 0
+    unmatched: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def records_per_second(self) -> float:
+        return self.records / self.elapsed if self.elapsed else 0.0
+
+
+class ReplaySimulator:
+    """Replays recorded traffic through the real algorithms against a simulated clock.
+
+    Records are routed to the first matching rule, like the middleware does, and
+    decided in batches: consecutive records less than `resolution` seconds apart share
+    one clock reading and one `check_many` call on a private in-memory storage, which
+    keeps the per-request cost to planning and counting. Records are expected roughly in
+    time order; late ones are decided at the clock of the batch they fall into.
+
+    Every engine of the rules gets its own storage and, unless `algorithm` is given,
+    its own algorithm and window staggering. The levels of hierarchical rules are
+    decided as one atomic chain; fixed level keys are kept and the other levels are
+    keyed by the record key, the only key a record carries.
+    """
+
+    def __init__(
+        self,
+        rules: Sequence[Mapping],
+        algorithm: Optional[str] = None,
+        resolution: float = 0.01,
+        batch_size: int = 4096,
+    ):
+        if not rules:
+            raise ValueError("At least one rule is needed to replay traffic")
+        if resolution < 0:
+            raise ValueError("resolution can't be negative")
+        if batch_size < 1:
+            raise ValueError("batch_size must be greater than 0")
+        self._rules = []
+        self._windows = []
+        self._levels: list[Optional[list[tuple[Optional[str], int, timedelta]]]] = []
+        # rule -> index of the engine deciding it, engine -> (algorithm, stagger)
+        self._owners: list[int] = []
+        self._engines: list[tuple[str, bool]] = []
+        # engines deciding hierarchical rules
+        self._chains: set[int] = set()
+        engines: dict[int, int] = {}
+        for rule in rules:
+            window = _as_window(rule["window"])
+            seconds = int(window.total_seconds())
+            self._rules.append((rule["pattern"], rule["path"], rule["limit"], seconds))
+            self._windows.append(window)
+            levels = _levels(rule)
+            self._levels.append(levels)
+            engine = rule.get("engine")
+            owner = engines.get(id(engine))
+            if owner is None:
+                owner = engines[id(engine)] = len(self._engines)
+                self._engines.append(
+                    (
+                        algorithm or getattr(engine, "algorithm", None) or _ALGORITHM,
+                        getattr(engine, "stagger_windows", False),
+                    )
+                )
+            self._owners.append(owner)
+            if levels is not None:
+                self._chains.add(owner)
+            if rule.get("overrides") is not None:
+                logger.warning(
+                    "Replay decides %r with its rule limits, per-key overrides are "
+                    "not applied",
+                    rule["path"],
+                )
+        self._resolution = resolution
+        self._batch_size = batch_size
+
+    def run(self, records: Iterable[Record]) -> ReplayReport:
+        clock = ManualClock()
+        flows = [
+            CheckRateLimitSyncUC(
+                storage=SyncInMemStorage(stripes=1),
+                algo=algorithm,
+                clock=clock,
+                stagger=stagger,
+            ).flow
+            for algorithm, stagger in self._engines
+        ]
+        reports = [RuleReport(*rule[1:]) for rule in self._rules]
+        report = ReplayReport(rules=reports)
+        routes: dict[str, Optional[int]] = {}
+        # engine -> requests of the batch (None for a chain of quota levels) and the
+        # (rule, key) they came from, in arrival order
+        batch: dict[int, tuple[list[Optional[RateLimitRequest]], list]] = {}
+        batched = 0
+        batch_end = float("-inf")
+
+        def count(index: int, key: str, allowed: bool) -> None:
+            rule = reports[index]
+            counts = rule.keys.get(key)
+            if counts is None:
+                counts = rule.keys[key] = [0, 0]
+            counts[0] += 1
+            if not allowed:
+                counts[1] += 1
+                rule.rejected += 1
+            rule.requests += 1
+
+        def check(flow: RateLimitAlgorithm, requests: list, owners: list) -> None:
+            for (index, key), result in zip(owners, flow.check_many(requests)):
+                count(index, key, result.allowed)
+
+        def decide(flow: RateLimitAlgorithm, requests: list, owners: list) -> None:
+            start = 0
+            for at, request in enumerate(requests):
+                if request is not None:
+                    continue
+                # a chain is all or nothing, decide what came before it first
+                if start < at:
+                    check(flow, requests[start:at], owners[start:at])
+                start = at + 1
+                index, key = owners[at]
+                chain = [
+                    RateLimitRequest(fixed or key, limit, window)
+                    for fixed, limit, window in self._levels[index]
+                ]
+                results = flow.check_many(chain, atomic=True)
+                count(index, key, all(result.allowed for result in results))
+            if start < len(requests):
+                check(flow, requests[start:], owners[start:])
+
+        def flush() -> None:
+            for owner, (requests, owners) in batch.items():
+                if owner in self._chains:
+                    decide(flows[owner], requests, owners)
+                else:
+                    check(flows[owner], requests, owners)
+            batch.clear()
+
+        started = time.perf_counter()
+        for timestamp, path, key in records:
+            report.records += 1
+            index = routes.get(path, -1)
+            if index == -1:
+                if len(routes) >= _ROUTE_CACHE_SIZE:
+                    routes.clear()
+                index = routes[path] = self._route(path)
+            if index is None:
+                report.unmatched += 1
+                continue
+            if timestamp >= batch_end or batched >= self._batch_size:
+                if batch:
+                    flush()
+                batched = 0
+                clock.set(timestamp)
+                batch_end = timestamp + self._resolution
+            owner = self._owners[index]
+            pending = batch.get(owner)
+            if pending is None:
+                pending = batch[owner] = ([], [])
+            if self._levels[index] is None:
+                rule = reports[index]
+                pending[0].append(
+                    RateLimitRequest(key, rule.limit, self._windows[index])
+                )
+            else:
+                pending[0].append(None)
+            pending[1].append((index, key))
+            batched += 1
+        if batch:
+            flush()
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def _route(self, path: str) -> Optional[int]:
+        for index, rule in enumerate(self._rules):
+            if rule[0].match(path):
+                return index
+        return None
+
+
+def _as_window(window) -> timedelta:
+    if not isinstance(window, timedelta):
+        window = timedelta(seconds=window)
+    return window
+
+
+def _levels(rule: Mapping) -> Optional[list[tuple[Optional[str], int, timedelta]]]:
+    # (fixed key or None for the record key, limit, window) per quota level
+    if not rule.get("levels"):
+        return None
+    levels = [
+        (
+            level["key_func"] if isinstance(level["key_func"], str) else None,
+            level["limit"],
+            _as_window(level["window"]),
+        )
+        for level in rule["levels"]
+    ]
+    if sum(fixed is None for fixed, _, _ in levels) > 1:
+        logger.warning(
+            "Replay keys every per-request level of %r by the record key",
+            rule["path"],
+        )
+    return levels
+
+
+def _percentile(values: list[int], percentile: float) -> int:
+    if not values:
+        return 0
+    rank = math.ceil(percentile / 100 * len(values)) - 1
+    return values[max(0, min(len(values) - 1, rank))]
@@ -0,0 +1,2 @@
+from .client import SidecarClient
+from .server import SidecarServer
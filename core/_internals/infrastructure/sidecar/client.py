@@ -0,0 +1,118 @@
+import asyncio
+from typing import Optional
+
+from ...domain.exceptions import SidecarError
+from ...domain.models import ConsumeResult
+from .protocol import (
+    ConsumeRequest,
+    decode_response,
+    encode_request,
+    parse_address,
+    split_frames,
+)
+
+# like the Redis socket timeouts, a stalled sidecar fails the call instead of hanging it
+DEFAULT_TIMEOUT = 5.0
+
+
+class _ClientProtocol(asyncio.Protocol):
+    def __init__(self, client: "SidecarClient"):
+        self.client = client
+        self.buffer = bytearray()
+
+    def data_received(self, data: bytes) -> None:
+        self.buffer += data
+        pending = self.client._pending
+        for frame in split_frames(self.buffer):
+            request_id, response = decode_response(frame)
+            future = pending.pop(request_id, None)
+            if future is None or future.done():
+                continue
+            if isinstance(response, str):
+                future.set_exception(SidecarError(response))
+            else:
+                future.set_result(response)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.client._disconnected(exc)
+
+
+class SidecarClient:
+    """Pipelined connection to a sidecar server.
+
+    Requests are written without waiting for earlier answers, and all frames queued
+    during one event loop iteration go out in a single write. Connecting and every call
+    give up with `TimeoutError` after `timeout` seconds, None waits forever.
+    """
+
+    def __init__(self, address: str, timeout: Optional[float] = DEFAULT_TIMEOUT):
+        self.address = address
+        self.timeout = timeout
+        self._transport: Optional[asyncio.Transport] = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._outbox: list[bytes] = []
+        self._next_id = 0
+        self._connecting: Optional[asyncio.Lock] = None
+
+    async def connect(self) -> None:
+        if self._transport is not None:
+            return
+        if self._connecting is None:
+            self._connecting = asyncio.Lock()
+        async with self._connecting:
+            if self._transport is not None:
+                return
+            async with asyncio.timeout(self.timeout):
+                self._transport = await self._open()
+
+    async def _open(self) -> asyncio.Transport:
+        loop = asyncio.get_running_loop()
+        family, address = parse_address(self.address)
+        if family == "unix":
+            transport, _ = await loop.create_unix_connection(
+                lambda: _ClientProtocol(self), path=address
+            )
+        else:
+            host, port = address
+            transport, _ = await loop.create_connection(
+                lambda: _ClientProtocol(self), host=host, port=port
+            )
+        return transport
+
+    async def call(
+        self, op: int, requests: list[ConsumeRequest], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        await self.connect()
+        loop = asyncio.get_running_loop()
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+        request_id = self._next_id
+        future = loop.create_future()
+        self._pending[request_id] = future
+        if not self._outbox:
+            loop.call_soon(self._flush)
+        self._outbox.append(encode_request(request_id, op, requests, atomic))
+        try:
+            async with asyncio.timeout(self.timeout):
+                return await future
+        finally:
+            self._pending.pop(request_id, None)
+
+    def _flush(self) -> None:
+        frames, self._outbox = self._outbox, []
+        if self._transport is not None and frames:
+            self._transport.write(b"".join(frames))
+
+    def _disconnected(self, exc: Optional[Exception]) -> None:
+        self._transport = None
+        self._outbox = []
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(
+                    ConnectionError(f"sidecar connection lost: {exc or 'closed'}")
+                )
+
+    async def close(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
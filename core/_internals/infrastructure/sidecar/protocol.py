@@ -0,0 +1,163 @@
+"""Length-prefixed binary protocol between sidecar clients and the server.
+
+Every frame starts with its length (u32, not counting itself) and the id of the request,
+so clients can pipeline any number of requests on one connection and match responses
+that come back out of order.
+
+    request:  u32 length | u32 id | u8 op | u8 flags | u16 count | count * item
+    item:     u16 key length | key (utf-8) | fixed fields of the op
+    response: u32 length | u32 id | u8 status | u16 count | count * (u8 allowed, f64 remaining)
+
+A response with an error status carries a utf-8 message instead of results.
+"""
+
+import struct
+from typing import Union
+
+from ...domain.models import WindowConsume, LogConsume, BucketConsume, ConsumeResult
+
+OP_WINDOWS = 1
+OP_LOGS = 2
+OP_BUCKETS = 3
+
+FLAG_ATOMIC = 1
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+LENGTH = struct.Struct("<I")
+REQUEST = struct.Struct("<IBBH")
+RESPONSE = struct.Struct("<IBH")
+KEY = struct.Struct("<H")
+RESULT = struct.Struct("<Bd")
+
+# current window, previous window, weight, limit, cost, ttl
+WINDOW = struct.Struct("<qqdIII")
+# start, now, limit, cost, ttl
+LOG = struct.Struct("<ddIII")
+# capacity, refill rate, now, cost, ttl
+BUCKET = struct.Struct("<IddII")
+
+ConsumeRequest = Union[WindowConsume, LogConsume, BucketConsume]
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode_request(
+    request_id: int, op: int, requests: list[ConsumeRequest], atomic: bool
+) -> bytes:
+    parts = [REQUEST.pack(request_id, op, FLAG_ATOMIC if atomic else 0, len(requests))]
+    for request in requests:
+        key = request.key.encode()
+        parts.append(KEY.pack(len(key)))
+        parts.append(key)
+        if op == OP_WINDOWS:
+            parts.append(
+                WINDOW.pack(
+                    request.current_window,
+                    request.previous_window,
+                    request.weight,
+                    request.limit,
+                    request.cost,
+                    request.ttl,
+                )
+            )
+        elif op == OP_LOGS:
+            parts.append(
+                LOG.pack(
+                    request.start, request.now, request.limit, request.cost, request.ttl
+                )
+            )
+        else:
+            parts.append(
+                BUCKET.pack(
+                    request.capacity,
+                    request.refill_rate,
+                    request.now,
+                    request.cost,
+                    request.ttl,
+                )
+            )
+    payload = b"".join(parts)
+    return LENGTH.pack(len(payload)) + payload
+
+
+def decode_request(frame: memoryview) -> tuple[int, int, bool, list[ConsumeRequest]]:
+    request_id, op, flags, count = REQUEST.unpack_from(frame)
+    offset = REQUEST.size
+    requests: list[ConsumeRequest] = []
+    for _ in range(count):
+        (size,) = KEY.unpack_from(frame, offset)
+        offset += KEY.size
+        key = bytes(frame[offset : offset + size]).decode()
+        offset += size
+        if op == OP_WINDOWS:
+            current, previous, weight, limit, cost, ttl = WINDOW.unpack_from(
+                frame, offset
+            )
+            offset += WINDOW.size
+            requests.append(
+                WindowConsume(key, current, previous, weight, limit, cost, ttl)
+            )
+        elif op == OP_LOGS:
+            start, now, limit, cost, ttl = LOG.unpack_from(frame, offset)
+            offset += LOG.size
+            requests.append(LogConsume(key, start, now, limit, cost, ttl))
+        elif op == OP_BUCKETS:
+            capacity, rate, now, cost, ttl = BUCKET.unpack_from(frame, offset)
+            offset += BUCKET.size
+            requests.append(BucketConsume(key, capacity, rate, now, cost, ttl))
+        else:
+            raise ProtocolError(f"Unknown operation {op}")
+    return request_id, op, bool(flags & FLAG_ATOMIC), requests
+
+
+def encode_response(request_id: int, results: list[ConsumeResult]) -> bytes:
+    payload = RESPONSE.pack(request_id, STATUS_OK, len(results)) + b"".join(
+        RESULT.pack(result.allowed, result.remaining) for result in results
+    )
+    return LENGTH.pack(len(payload)) + payload
+
+
+def encode_error(request_id: int, message: str) -> bytes:
+    payload = RESPONSE.pack(request_id, STATUS_ERROR, 0) + message.encode()
+    return LENGTH.pack(len(payload)) + payload
+
+
+def decode_response(frame: memoryview) -> tuple[int, Union[list[ConsumeResult], str]]:
+    request_id, status, count = RESPONSE.unpack_from(frame)
+    if status != STATUS_OK:
+        return request_id, bytes(frame[RESPONSE.size :]).decode()
+    return request_id, [
+        ConsumeResult(allowed=bool(allowed), remaining=remaining)
+        for allowed, remaining in RESULT.iter_unpack(frame[RESPONSE.size :])
+    ]
+
+
+def split_frames(buffer: bytearray) -> list[memoryview]:
+    """Cut every complete frame off the front of buffer."""
+    frames = []
+    offset = 0
+    end = len(buffer)
+    data = memoryview(bytes(buffer))
+    while end - offset >= LENGTH.size:
+        (size,) = LENGTH.unpack_from(data, offset)
+        if end - offset - LENGTH.size < size:
+            break
+        offset += LENGTH.size
+        frames.append(data[offset : offset + size])
+        offset += size
+    del buffer[:offset]
+    return frames
+
+
+def parse_address(address: str) -> tuple[str, Union[str, tuple[str, int]]]:
+    """Split "unix:///path" or "tcp://host:port" into its family and address."""
+    if address.startswith("unix://"):
+        return "unix", address[len("unix://") :]
+    if address.startswith("tcp://"):
+        host, _, port = address[len("tcp://") :].rpartition(":")
+        return "tcp", (host or "127.0.0.1", int(port))
+    raise ValueError(f"Unsupported sidecar address {address!r}, use unix:// or tcp://")
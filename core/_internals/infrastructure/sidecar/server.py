@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from ...domain.interfaces.storage import StorageInterface
+from .protocol import (
+    OP_WINDOWS,
+    OP_LOGS,
+    OP_BUCKETS,
+    ProtocolError,
+    decode_request,
+    encode_error,
+    encode_response,
+    parse_address,
+    split_frames,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class _ServerProtocol(asyncio.Protocol):
+    def __init__(self, server: "SidecarServer"):
+        self.server = server
+        self.buffer = bytearray()
+        self.transport: Optional[asyncio.Transport] = None
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self.transport = transport
+        self.server.connections.add(transport)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.server.connections.discard(self.transport)
+
+    def data_received(self, data: bytes) -> None:
+        self.buffer += data
+        frames = split_frames(self.buffer)
+        if frames:
+            # every read is answered with a single write, pipelined requests batch up
+            asyncio.ensure_future(self._handle(frames))
+
+    async def _handle(self, frames: list) -> None:
+        out = []
+        for frame in frames:
+            try:
+                request_id, op, atomic, requests = decode_request(frame)
+            except (ProtocolError, ValueError, UnicodeDecodeError) as e:
+                logger.warning("closing sidecar connection: %s", e)
+                self.transport.close()
+                return
+            try:
+                results = await self.server.operations[op](requests, atomic)
+                out.append(encode_response(request_id, results))
+            except Exception as e:
+                out.append(encode_error(request_id, f"{type(e).__name__}: {e}"))
+        if not self.transport.is_closing():
+            self.transport.write(b"".join(out))
+
+
+class SidecarServer:
+    """Serves rate limit decisions of one storage to many local processes."""
+
+    def __init__(self, storage: StorageInterface, address: str):
+        self.storage = storage
+        self.address = address
+        self.operations = {
+            OP_WINDOWS: storage.consume_windows,
+            OP_LOGS: storage.consume_logs,
+            OP_BUCKETS: storage.consume_buckets,
+        }
+        self.connections: set[asyncio.Transport] = set()
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        family, address = parse_address(self.address)
+        if family == "unix":
+            if os.path.exists(address):
+                os.unlink(address)
+            self._server = await loop.create_unix_server(
+                lambda: _ServerProtocol(self), path=address
+            )
+        else:
+            host, port = address
+            self._server = await loop.create_server(
+                lambda: _ServerProtocol(self), host=host, port=port
+            )
+
+    @property
+    def sockets(self) -> list:
+        return list(self._server.sockets) if self._server else []
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        for transport in list(self.connections):
+            transport.close()
+        await self._server.wait_closed()
+        self._server = None
+        family, address = parse_address(self.address)
+        if family == "unix" and os.path.exists(address):
+            os.unlink(address)
@@ -1,2 +1,19 @@
-from .in_mem import InMemStorage
-from .redis import RedisStorage, ThrottyRedis
+from ...lazy import lazy_imports
+
+# storages are imported when selected, so in-memory deployments never load redis
+__getattr__ = lazy_imports(
+    __name__,
+    {
+        "InMemStorage": ".in_mem",
+        "SyncInMemStorage": ".in_mem",
+        "RedisStorage": ".redis",
+        "SyncRedisStorage": ".redis",
+        "ThrottyRedis": ".redis",
+        "HybridStorage": ".hybrid",
+        "CircuitBreakerStorage": ".breaker",
+        "PeerStorage": ".peer",
+        "UdpTransport": ".peer",
+        "UnixTransport": ".peer",
+        "SidecarStorage": ".sidecar",
+    },
+)
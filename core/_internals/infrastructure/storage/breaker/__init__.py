@@ -0,0 +1 @@
+from .repo import CircuitBreakerStorage
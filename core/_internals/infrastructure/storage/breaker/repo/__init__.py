@@ -0,0 +1 @@
+from .breaker_impl import CircuitBreakerStorage
@@ -0,0 +1,230 @@
+import asyncio
+import logging
+from collections import Counter, deque
+from dataclasses import replace
+from time import monotonic
+from typing import Callable, Optional
+
+from redis.exceptions import RedisError as RedisClientError
+
+from .....domain.enums import CircuitState
+from .....domain.interfaces.storage import StorageInterface
+from .....domain.models import (
+    BucketState,
+    WindowData,
+    WindowConsume,
+    LogConsume,
+    BucketConsume,
+    ConsumeResult,
+)
+from ...in_mem import InMemStorage
+
+logger = logging.getLogger(__name__)
+
+# failures of the remote store, anything else (bad input, misuse) is raised as is
+_FAILURES = (RedisClientError, OSError, asyncio.TimeoutError)
+
+
+class CircuitBreakerStorage(StorageInterface):
+    """Guards a remote storage with per-call deadlines and a circuit breaker.
+
+    Every call gets `timeout` seconds. Once at least `min_calls` calls were made in the
+    last `window` seconds and the share of failures reaches `error_threshold`, the circuit
+    opens and decisions fail open to a local in-memory limiter whose limits are divided
+    by `fallback_divisor`, the number of instances sharing the remote limit. After
+    `reset_timeout` seconds one probe call is let through (half-open): success closes the
+    circuit, failure keeps it open for another `reset_timeout`.
+    """
+
+    def __init__(
+        self,
+        storage: StorageInterface,
+        timeout: float = 0.05,
+        error_threshold: float = 0.5,
+        min_calls: int = 20,
+        window: float = 10.0,
+        reset_timeout: float = 5.0,
+        fallback_divisor: int = 1,
+        on_state_change: Optional[Callable[[CircuitState, CircuitState], None]] = None,
+    ):
+        if timeout <= 0:
+            raise ValueError("timeout must be greater than 0")
+        if not 0 < error_threshold <= 1:
+            raise ValueError("error_threshold must be between 0 and 1")
+        if fallback_divisor < 1:
+            raise ValueError("fallback_divisor must be at least 1")
+        self.storage = storage
+        self.fallback = InMemStorage()
+        self.timeout = timeout
+        self.error_threshold = error_threshold
+        self.min_calls = min_calls
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.fallback_divisor = fallback_divisor
+        self.on_state_change = on_state_change
+
+        self.state = CircuitState.closed
+        self._opened_at = 0.0
+        self._probing = False
+        # calls and failures per second over the last `window` seconds
+        self._buckets: deque[list] = deque()
+        self._counters: Counter[str] = Counter()
+        self._transitions: Counter[str] = Counter()
+
+    def metrics(self) -> dict:
+        return {
+            "state": self.state.value,
+            **self._counters,
+            "transitions": dict(self._transitions),
+        }
+
+    async def increment_windows(
+        self, key: str, window: int, ttl: int, amount: int = 1
+    ) -> int:
+        return await self._call("increment_windows", key, window, ttl, amount)
+
+    async def get_window_counts(
+        self,
+        key: str,
+        current_window: int,
+        previous_window: int,
+        ttl: Optional[int] = None,
+    ) -> WindowData:
+        return await self._call(
+            "get_window_counts", key, current_window, previous_window, ttl
+        )
+
+    async def add_timestamp(self, key: str, timestamp: float, ttl: int) -> None:
+        return await self._call("add_timestamp", key, timestamp, ttl)
+
+    async def count_in_range(self, key: str, start: float, end: float) -> int:
+        return await self._call("count_in_range", key, start, end)
+
+    async def remove_before(self, key: str, timestamp: float) -> None:
+        return await self._call("remove_before", key, timestamp)
+
+    async def get_bucket_state(self, key: str) -> Optional[BucketState]:
+        return await self._call("get_bucket_state", key)
+
+    async def update_bucket_state(self, key: str, state: BucketState, ttl: int) -> None:
+        return await self._call("update_bucket_state", key, state, ttl)
+
+    async def start(self) -> None:
+        await self.storage.start()
+
+    async def consume_windows(
+        self, requests: list[WindowConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        return await self._consume("consume_windows", requests, atomic)
+
+    async def consume_logs(
+        self, requests: list[LogConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        return await self._consume("consume_logs", requests, atomic)
+
+    async def consume_buckets(
+        self, requests: list[BucketConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        return await self._consume("consume_buckets", requests, atomic)
+
+    async def _consume(self, method: str, requests: list, atomic: bool) -> list:
+        scaled = None
+        if self.fallback_divisor > 1:
+            scaled = [self._scale(request) for request in requests]
+        return await self._call(method, requests, atomic, fallback_args=scaled)
+
+    def _scale(self, request):
+        divisor = self.fallback_divisor
+        if isinstance(request, BucketConsume):
+            return replace(
+                request,
+                capacity=max(1, request.capacity // divisor),
+                refill_rate=request.refill_rate / divisor,
+            )
+        return replace(request, limit=max(1, request.limit // divisor))
+
+    async def _call(self, method: str, *args, fallback_args: Optional[list] = None):
+        if not self._allow_request():
+            self._counters["fallback_calls"] += 1
+            if fallback_args is not None:
+                args = (fallback_args, *args[1:])
+            return await getattr(self.fallback, method)(*args)
+
+        probe = self.state == CircuitState.half_open
+        try:
+            async with asyncio.timeout(self.timeout):
+                result = await getattr(self.storage, method)(*args)
+        except _FAILURES as e:
+            self._record(failed=True, probe=probe)
+            self._counters[
+                "timeouts" if isinstance(e, asyncio.TimeoutError) else "failures"
+            ] += 1
+            self._counters["fallback_calls"] += 1
+            if fallback_args is not None:
+                args = (fallback_args, *args[1:])
+            return await getattr(self.fallback, method)(*args)
+        except BaseException:
+            if probe:
+                self._probing = False
+            raise
+        self._record(failed=False, probe=probe)
+        self._counters["remote_calls"] += 1
+        return result
+
+    def _allow_request(self) -> bool:
+        if self.state == CircuitState.closed:
+            return True
+        if self.state == CircuitState.open:
+            if monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._transition(CircuitState.half_open)
+        # half-open lets a single probe through at a time
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def _record(self, failed: bool, probe: bool) -> None:
+        now = monotonic()
+        if probe:
+            self._probing = False
+            if failed:
+                self._open(now)
+            else:
+                self._buckets.clear()
+                self._transition(CircuitState.closed)
+            return
+        if self.state != CircuitState.closed:
+            # a call started before the circuit opened
+            return
+
+        second = int(now)
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0])
+        bucket = self._buckets[-1]
+        bucket[1] += 1
+        bucket[2] += failed
+        while self._buckets and self._buckets[0][0] <= now - self.window:
+            self._buckets.popleft()
+
+        if not failed:
+            return
+        calls = sum(bucket[1] for bucket in self._buckets)
+        failures = sum(bucket[2] for bucket in self._buckets)
+        if calls >= self.min_calls and failures / calls >= self.error_threshold:
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        self._opened_at = now
+        self._buckets.clear()
+        self._transition(CircuitState.open)
+
+    def _transition(self, state: CircuitState) -> None:
+        previous, self.state = self.state, state
+        self._transitions[f"{previous.value}->{state.value}"] += 1
+        if state == CircuitState.open:
+            logger.warning("storage circuit opened, failing open to the local limiter")
+        else:
+            logger.info("storage circuit %s", state.value)
+        if self.on_state_change:
+            self.on_state_change(previous, state)
@@ -0,0 +1 @@
+from .hybrid_impl import HybridStorage
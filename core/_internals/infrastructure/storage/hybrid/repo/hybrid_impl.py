@@ -0,0 +1,361 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from time import monotonic
+from typing import Optional
+
+from redis.exceptions import RedisError as RedisClientError
+from sortedcontainers import SortedList
+
+from .....domain.interfaces.storage import StorageInterface
+from .....domain.models import BucketState, BucketConsume, ConsumeResult, WindowData
+from ...redis import ThrottyRedis
+from ...redis.keys import RedisKeys
+from ...redis.codec import encode_bucket, decode_bucket
+from ...redis.scripts import GET_BUCKET, SET_BUCKET, MERGE_BUCKET
+
+logger = logging.getLogger(__name__)
+
+
+class HybridStorage(StorageInterface):
+    """Decides against local counters and syncs them with Redis in the background.
+
+    Writes are buffered as deltas and pushed in one pipeline every `flush_interval`
+    seconds. The same pipeline pulls back the cluster-wide aggregate of every key this
+    node touched, and keys that were only read are re-pulled once their snapshot is
+    older than `max_staleness`. Token buckets send the tokens spent on this node since
+    the last sync, which are charged to the shared bucket, and take its merged state back.
+    If Redis is unreachable the deltas stay buffered and decisions keep being made
+    from the last known aggregate plus local traffic.
+    """
+
+    def __init__(
+        self,
+        redis: ThrottyRedis,
+        flush_interval: float = 0.1,
+        max_staleness: float = 1.0,
+        keys: Optional[RedisKeys] = None,
+    ):
+        if flush_interval <= 0:
+            raise ValueError("flush_interval must be greater than 0")
+        if max_staleness < flush_interval:
+            raise ValueError("max_staleness cannot be lower than flush_interval")
+        if keys is not None and keys.hash_windows:
+            # deltas are flushed as INCRBY on one string key per window
+            raise ValueError(
+                "HybridStorage does not support RedisKeys(hash_windows=True)"
+            )
+        self.storage = redis
+        self.keys = keys or RedisKeys()
+        self.flush_interval = flush_interval
+        self.max_staleness = max_staleness
+
+        # sliding window counters
+        self._global_windows: dict[str, int] = {}
+        self._pending_windows: dict[str, int] = defaultdict(int)
+        self._inflight_windows: dict[str, int] = {}
+        self._window_ttls: dict[str, int] = {}
+
+        # sliding window logs
+        self._global_timestamps: dict[str, SortedList] = defaultdict(SortedList)
+        self._pending_timestamps: dict[str, list[float]] = defaultdict(list)
+        self._inflight_timestamps: dict[str, list[float]] = {}
+        self._timestamp_ttls: dict[str, int] = {}
+        self._trim_before: dict[str, float] = {}
+
+        # token buckets: tokens spent here are merged into the shared bucket, states
+        # written through update_bucket_state() alone are written back as they are
+        self._buckets: dict[str, BucketState] = {}
+        self._dirty_buckets: dict[str, int] = {}
+        self._spent_tokens: dict[str, int] = defaultdict(int)
+        # capacity, refill rate and clock of the latest request, for the merge
+        self._bucket_rates: dict[str, tuple[int, float, float]] = {}
+        self._legacy_buckets: dict[str, str] = {}
+
+        self._kinds: dict[str, str] = {}
+        self._pulled_at: dict[str, float] = {}
+        self._accessed: set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def _touch(self, key: str, kind: str) -> None:
+        self._kinds[key] = kind
+        self._accessed.add(key)
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def increment_windows(
+        self, key: str, window: int, ttl: int, amount: int = 1
+    ) -> int:
+        curr_key = self.keys.window(key, window)
+        self._touch(curr_key, "window")
+        self._pending_windows[curr_key] += amount
+        self._window_ttls[curr_key] = ttl
+        return self._window_count(curr_key)
+
+    async def get_window_counts(
+        self,
+        key: str,
+        current_window: int,
+        previous_window: int,
+        ttl: Optional[int] = None,
+    ) -> WindowData:
+        curr_key = self.keys.window(key, current_window)
+        prev_key = self.keys.window(key, previous_window)
+        self._touch(curr_key, "window")
+        self._touch(prev_key, "window")
+        return WindowData(
+            current_count=self._window_count(curr_key),
+            previous_count=self._window_count(prev_key),
+            current_window=current_window,
+        )
+
+    def _window_count(self, redis_key: str) -> int:
+        return (
+            self._global_windows.get(redis_key, 0)
+            + self._inflight_windows.get(redis_key, 0)
+            + self._pending_windows.get(redis_key, 0)
+        )
+
+    async def add_timestamp(self, key: str, timestamp: float, ttl: int) -> None:
+        key = self.keys.log(key)
+        self._touch(key, "log")
+        self._pending_timestamps[key].append(timestamp)
+        self._timestamp_ttls[key] = ttl
+
+    async def count_in_range(self, key: str, start: float, end: float) -> int:
+        key = self.keys.log(key)
+        self._touch(key, "log")
+        remote = self._global_timestamps.get(key)
+        count = 0
+        if remote:
+            count += remote.bisect_right(end) - remote.bisect_left(start)
+        for local in (self._inflight_timestamps, self._pending_timestamps):
+            for timestamp in local.get(key, ()):
+                if start <= timestamp <= end:
+                    count += 1
+        return count
+
+    async def remove_before(self, key: str, timestamp: float) -> None:
+        key = self.keys.log(key)
+        self._touch(key, "log")
+        if key in self._global_timestamps:
+            remote = self._global_timestamps[key]
+            del remote[: remote.bisect_left(timestamp)]
+        if key in self._pending_timestamps:
+            self._pending_timestamps[key] = [
+                ts for ts in self._pending_timestamps[key] if ts >= timestamp
+            ]
+        self._trim_before[key] = max(timestamp, self._trim_before.get(key, 0))
+
+    async def get_bucket_state(self, key: str) -> Optional[BucketState]:
+        legacy = self.keys.legacy_bucket(key)
+        key = self.keys.bucket(key)
+        self._touch(key, "bucket")
+        self._legacy_buckets[key] = legacy
+        state = self._buckets.get(key)
+        if state is None:
+            return None
+        return BucketState(latest_refill=state.latest_refill, tokens=state.tokens)
+
+    async def update_bucket_state(self, key: str, state: BucketState, ttl: int) -> None:
+        key = self.keys.bucket(key)
+        self._touch(key, "bucket")
+        self._buckets[key] = BucketState(
+            latest_refill=state.latest_refill, tokens=state.tokens
+        )
+        self._dirty_buckets[key] = ttl
+
+    async def consume_buckets(
+        self, requests: list[BucketConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        results = await super().consume_buckets(requests, atomic=atomic)
+        for request, result in zip(requests, results):
+            key = self.keys.bucket(request.key)
+            self._bucket_rates[key] = (
+                request.capacity,
+                request.refill_rate,
+                request.now,
+            )
+            if result.allowed:
+                self._spent_tokens[key] += request.cost
+        return results
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except (RedisClientError, OSError, asyncio.TimeoutError) as e:
+                logger.warning("Throtty hybrid sync failed, keeping local state: %s", e)
+            except Exception:
+                # a task that dies here would leave this node unsynced for good
+                logger.exception("Throtty hybrid sync failed unexpectedly")
+
+    async def flush(self) -> None:
+        """Push buffered deltas to Redis and pull back the global aggregates."""
+        async with self._flush_lock:
+            await self._sync()
+
+    async def _sync(self) -> None:
+        now = monotonic()
+        accessed, self._accessed = self._accessed, set()
+        windows, self._pending_windows = self._pending_windows, defaultdict(int)
+        timestamps, self._pending_timestamps = (
+            self._pending_timestamps,
+            defaultdict(list),
+        )
+        trims, self._trim_before = self._trim_before, {}
+        buckets, self._dirty_buckets = self._dirty_buckets, {}
+        spent, self._spent_tokens = self._spent_tokens, defaultdict(int)
+        # keep in-flight deltas visible to decisions until the aggregates come back
+        self._inflight_windows = windows
+        self._inflight_timestamps = timestamps
+
+        stale = [
+            key
+            for key in accessed
+            if key not in windows
+            and key not in timestamps
+            and key not in buckets
+            and now - self._pulled_at.get(key, float("-inf")) >= self.max_staleness
+        ]
+        if not (windows or timestamps or trims or buckets or stale):
+            self._forget_idle(now)
+            return
+        ops: list[tuple[str, str]] = []
+
+        try:
+            async with self.storage.get_redis() as redis:
+                async with redis.pipeline(transaction=False) as pipe:
+                    for redis_key, delta in windows.items():
+                        pipe.incrby(redis_key, delta)
+                        pipe.expire(redis_key, self._window_ttls[redis_key])
+                        ops.append(("incr", redis_key))
+                        ops.append(("noop", redis_key))
+                    # members must stay unique across nodes and equal timestamps
+                    nonce = os.urandom(8).hex()
+                    for key, values in timestamps.items():
+                        pipe.zadd(
+                            key,
+                            {f"{ts}:{nonce}:{i}": ts for i, ts in enumerate(values)},
+                        )
+                        pipe.expire(key, self._timestamp_ttls[key])
+                        ops.append(("noop", key))
+                        ops.append(("noop", key))
+                    for key, before in trims.items():
+                        pipe.zremrangebyscore(key, 0, f"({before}")
+                        ops.append(("noop", key))
+                    for key in set(timestamps) | set(trims):
+                        pipe.zrangebyscore(
+                            key, trims.get(key, "-inf"), "+inf", withscores=True
+                        )
+                        ops.append(("zrange", key))
+                    for key, ttl in buckets.items():
+                        rates = self._bucket_rates.get(key)
+                        if rates is None:
+                            tokens, latest_refill = encode_bucket(self._buckets[key])
+                            pipe.eval(SET_BUCKET, 1, key, tokens, latest_refill, ttl)
+                            ops.append(("noop", key))
+                            continue
+                        capacity, rate, at = rates
+                        pipe.eval(
+                            MERGE_BUCKET,
+                            2,
+                            key,
+                            self._legacy_buckets.get(key, key),
+                            capacity,
+                            repr(rate),
+                            repr(at),
+                            spent.get(key, 0),
+                            ttl,
+                        )
+                        ops.append(("merge", key))
+                    for key in stale:
+                        if self._kinds.get(key) == "log":
+                            pipe.zrangebyscore(key, "-inf", "+inf", withscores=True)
+                            ops.append(("zrange", key))
+                        elif self._kinds.get(key) == "bucket":
+                            pipe.eval(
+                                GET_BUCKET, 2, key, self._legacy_buckets.get(key, key)
+                            )
+                            ops.append(("bucket", key))
+                        else:
+                            pipe.get(key)
+                            ops.append(("get", key))
+                    results = await pipe.execute()
+        except BaseException:
+            self._inflight_windows, self._inflight_timestamps = {}, {}
+            self._restore(windows, timestamps, trims, buckets, spent)
+            raise
+
+        self._inflight_windows, self._inflight_timestamps = {}, {}
+
+        for (op, key), result in zip(ops, results):
+            if op in ("incr", "get"):
+                self._global_windows[key] = int(result or 0)
+            elif op == "zrange":
+                self._global_timestamps[key] = SortedList(score for _, score in result)
+            elif op == "bucket":
+                self._adopt_bucket(key, decode_bucket(result))
+            elif op == "merge":
+                self._merge_bucket(key, decode_bucket(result))
+            if op != "noop":
+                self._pulled_at[key] = now
+        self._forget_idle(now)
+
+    def _adopt_bucket(self, key: str, remote: Optional[BucketState]) -> None:
+        if remote is None:
+            return
+        local = self._buckets.get(key)
+        if local is None or remote.latest_refill > local.latest_refill:
+            self._buckets[key] = remote
+
+    def _merge_bucket(self, key: str, remote: BucketState) -> None:
+        # the shared bucket already holds what was sent, keep what was spent since
+        remote.tokens = max(0.0, remote.tokens - self._spent_tokens.get(key, 0))
+        self._buckets[key] = remote
+
+    def _restore(self, windows, timestamps, trims, buckets, spent) -> None:
+        for redis_key, delta in windows.items():
+            self._pending_windows[redis_key] += delta
+        for key, values in timestamps.items():
+            self._pending_timestamps[key][:0] = values
+        for key, before in trims.items():
+            self._trim_before[key] = max(before, self._trim_before.get(key, 0))
+        for key, ttl in buckets.items():
+            self._dirty_buckets.setdefault(key, ttl)
+        for key, tokens in spent.items():
+            self._spent_tokens[key] += tokens
+
+    def _forget_idle(self, now: float) -> None:
+        # drop snapshots of keys nobody asked for in a while so memory stays bounded
+        horizon = max(self.max_staleness * 10, 60)
+        idle = [key for key, at in self._pulled_at.items() if now - at > horizon]
+        for key in idle:
+            del self._pulled_at[key]
+            self._kinds.pop(key, None)
+            self._global_windows.pop(key, None)
+            self._global_timestamps.pop(key, None)
+            if key not in self._dirty_buckets:
+                self._buckets.pop(key, None)
+                self._bucket_rates.pop(key, None)
+                self._legacy_buckets.pop(key, None)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except (RedisClientError, OSError, asyncio.TimeoutError) as e:
+            logger.warning("Throtty hybrid final flush failed: %s", e)
@@ -1 +1 @@
-from .repo import InMemStorage
+from .repo import InMemStorage, SyncInMemStorage
@@ -1 +1,2 @@
 from .in_mem_impl import InMemStorage
+from .sync_in_mem_impl import SyncInMemStorage
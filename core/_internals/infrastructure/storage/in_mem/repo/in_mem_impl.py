@@ -1,59 +1,463 @@
-from collections import defaultdict
-from sortedcontainers import SortedList
+from array import array
+from time import monotonic
 import asyncio
-from typing import Optional
+from typing import TYPE_CHECKING, Callable, Optional
 
 from .....domain.interfaces.storage import StorageInterface
-from .....domain.models import BucketState, WindowData
+from .....domain.models import (
+    BucketState,
+    WindowData,
+    WindowConsume,
+    LogConsume,
+    BucketConsume,
+    ConsumeResult,
+)
+
+if TYPE_CHECKING:
+    from sortedcontainers import SortedList
+
+_NO_WINDOW = -2
+_MIN_PURGE_SIZE = 1024
+
+Table = Callable[[str], "InMemStorage"]
 
 
 class InMemStorage(StorageInterface):
+    """Columnar in-memory storage.
+
+    Counters and buckets live in flat `array` columns indexed through a key -> slot
+    map instead of one Python object per key. A window slot only keeps the latest
+    window of a series together with the count of the window before it, which is all
+    the sliding window counter reads. Slots expire after their ttl and are recycled,
+    expired ones are purged whenever the tables double in size.
+    """
+
     def __init__(self):
-        self._windows: dict[str, int] = {}
-        self._timestamps: dict[str, SortedList] = defaultdict(SortedList)
-        self._buckets: dict[str, BucketState] = {}
+        # sliding window counters, one slot per key and window size (told apart by ttl)
+        self._window_slots: dict[str, int] = {}
+        self._window_extra: dict[str, list[int]] = {}
+        self._window_ids = array("q")
+        self._window_curr = array("i")
+        self._window_prev = array("i")
+        self._window_ttls = array("i")
+        self._window_expires = array("d")
+        self._window_free: list[int] = []
+
+        # token buckets, one slot per key
+        self._bucket_slots: dict[str, int] = {}
+        self._bucket_tokens = array("d")
+        self._bucket_refill = array("d")
+        self._bucket_expires = array("d")
+        self._bucket_free: list[int] = []
+
+        self._timestamps: dict[str, "SortedList"] = {}
+        self._timestamp_expires: dict[str, float] = {}
+
+        self._purge_at = _MIN_PURGE_SIZE
         self._lock = asyncio.Lock()
 
-    async def increment_windows(self, key: str, window: int, ttl: int) -> int:
+    async def increment_windows(
+        self, key: str, window: int, ttl: int, amount: int = 1
+    ) -> int:
         async with self._lock:
-            window_key = f"{key}:{window}"
-            self._windows[window_key] = self._windows.get(window_key, 0) + 1
-            return self._windows[window_key]
+            return self._increment_window(key, window, ttl, amount, monotonic())
 
     async def get_window_counts(
-        self, key: str, current_window: int, previous_window: int
+        self,
+        key: str,
+        current_window: int,
+        previous_window: int,
+        ttl: Optional[int] = None,
     ) -> WindowData:
         async with self._lock:
-            curr_key = f"{key}:{current_window}"
-            prev_key = f"{key}:{previous_window}"
+            current, previous = self._window_counts(
+                key, current_window, previous_window, monotonic(), ttl
+            )
             return WindowData(
-                current_count=self._windows.get(curr_key, 0),
-                previous_count=self._windows.get(prev_key, 0),
+                current_count=current,
+                previous_count=previous,
                 current_window=current_window,
             )
 
     async def add_timestamp(self, key: str, timestamp: float, ttl: int) -> None:
         async with self._lock:
-            self._timestamps[key].add(timestamp)
+            self._add_timestamps(key, timestamp, 1, ttl, monotonic())
 
     async def count_in_range(self, key: str, start: float, end: float) -> int:
         async with self._lock:
-            timestamps = self._timestamps.get(key, SortedList())
-            start_idx = timestamps.bisect_left(start)
-            end_idx = timestamps.bisect_right(end)
-            return end_idx - start_idx
+            return self._count_in_range(key, start, end)
 
     async def remove_before(self, key: str, timestamp: float) -> None:
         async with self._lock:
-            if key in self._timestamps:
-                timestamps = self._timestamps[key]
-                idx = timestamps.bisect_left(timestamp)
-                del timestamps[:idx]
+            self._remove_before(key, timestamp)
 
     async def get_bucket_state(self, key: str) -> Optional[BucketState]:
         async with self._lock:
-            return self._buckets.get(key)
+            return self._read_bucket(key, monotonic())
 
     async def update_bucket_state(self, key: str, state: BucketState, ttl: int) -> None:
         async with self._lock:
-            self._buckets[key] = state
+            self._write_bucket(key, state, ttl, monotonic())
+
+    async def consume_windows(
+        self, requests: list[WindowConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        async with self._lock:
+            return self._consume_windows(requests, atomic, self._own)
+
+    async def consume_logs(
+        self, requests: list[LogConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        async with self._lock:
+            return self._consume_logs(requests, atomic, self._own)
+
+    async def consume_buckets(
+        self, requests: list[BucketConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        async with self._lock:
+            return self._consume_buckets(requests, atomic, self._own)
+
+    def _own(self, key: str) -> "InMemStorage":
+        return self
+
+    # the decisions run on whichever table holds each key, so the thread-safe storage
+    # can share them across its lock stripes
+    @staticmethod
+    def _consume_windows(
+        requests: list[WindowConsume], atomic: bool, table: Table
+    ) -> list[ConsumeResult]:
+        now = monotonic()
+        results = []
+        pending: dict[tuple[str, int], int] = {}
+        for request in requests:
+            store = table(request.key)
+            current, previous = store._window_counts(
+                request.key,
+                request.current_window,
+                request.previous_window,
+                now,
+                request.ttl,
+            )
+            series = (request.key, request.ttl)
+            count = previous * request.weight + current + pending.get(series, 0)
+            allowed = count + request.cost <= request.limit
+            if allowed:
+                count += request.cost
+                if atomic:
+                    pending[series] = pending.get(series, 0) + request.cost
+                else:
+                    store._increment_window(
+                        request.key,
+                        request.current_window,
+                        request.ttl,
+                        request.cost,
+                        now,
+                    )
+            results.append(
+                ConsumeResult(allowed=allowed, remaining=request.limit - count)
+            )
+        if atomic:
+            if not all(result.allowed for result in results):
+                return StorageInterface._reject(requests, results)
+            for request in requests:
+                table(request.key)._increment_window(
+                    request.key,
+                    request.current_window,
+                    request.ttl,
+                    request.cost,
+                    now,
+                )
+        return results
+
+    @staticmethod
+    def _consume_logs(
+        requests: list[LogConsume], atomic: bool, table: Table
+    ) -> list[ConsumeResult]:
+        now = monotonic()
+        results = []
+        pending: dict[str, int] = {}
+        for request in requests:
+            store = table(request.key)
+            # Everything left after trimming is in the window, including entries a
+            # thread that read the clock later managed to record first.
+            store._remove_before(request.key, request.start)
+            count = store._count_logged(request.key)
+            count += pending.get(request.key, 0)
+            allowed = count + request.cost <= request.limit
+            if allowed:
+                count += request.cost
+                if atomic:
+                    pending[request.key] = pending.get(request.key, 0) + request.cost
+                else:
+                    store._add_timestamps(
+                        request.key, request.now, request.cost, request.ttl, now
+                    )
+            results.append(
+                ConsumeResult(allowed=allowed, remaining=request.limit - count)
+            )
+        if atomic:
+            if not all(result.allowed for result in results):
+                return StorageInterface._reject(requests, results)
+            for request in requests:
+                table(request.key)._add_timestamps(
+                    request.key, request.now, request.cost, request.ttl, now
+                )
+        return results
+
+    @staticmethod
+    def _consume_buckets(
+        requests: list[BucketConsume], atomic: bool, table: Table
+    ) -> list[ConsumeResult]:
+        now = monotonic()
+        results = []
+        states: dict[str, BucketState] = {}
+        for request in requests:
+            state = states.get(request.key)
+            if state is None:
+                state = table(request.key)._read_bucket(
+                    request.key, now
+                ) or BucketState(
+                    latest_refill=request.now, tokens=float(request.capacity)
+                )
+                states[request.key] = state
+            state.refill(request.now, request.capacity, request.refill_rate)
+            allowed = state.tokens >= request.cost
+            if allowed:
+                state.tokens -= request.cost
+            results.append(ConsumeResult(allowed=allowed, remaining=state.tokens))
+        if atomic and not all(result.allowed for result in results):
+            return StorageInterface._reject(requests, results)
+        for request in requests:
+            state = states.pop(request.key, None)
+            if state is not None:
+                table(request.key)._write_bucket(request.key, state, request.ttl, now)
+        return results
+
+    def purge_expired(self) -> int:
+        """Release every expired slot and log, returning how many entries were dropped."""
+        now = monotonic()
+        expires = self._window_expires
+        windows = [
+            (slot, key)
+            for key, slot in self._window_slots.items()
+            if expires[slot] <= now
+        ]
+        windows.extend(
+            (slot, key)
+            for key, slots in self._window_extra.items()
+            for slot in slots
+            if expires[slot] <= now
+        )
+        for slot, key in windows:
+            self._free_window(slot, key)
+
+        expires = self._bucket_expires
+        buckets = [
+            key for key, slot in self._bucket_slots.items() if expires[slot] <= now
+        ]
+        for key in buckets:
+            self._bucket_free.append(self._bucket_slots.pop(key))
+
+        logs = [
+            key
+            for key, expires_at in self._timestamp_expires.items()
+            if expires_at <= now or not self._timestamps.get(key)
+        ]
+        for key in logs:
+            del self._timestamp_expires[key]
+            self._timestamps.pop(key, None)
+        return len(windows) + len(buckets) + len(logs)
+
+    def _increment_window(
+        self, key: str, window: int, ttl: int, amount: int, now: float
+    ) -> int:
+        slot = self._window_slot(key, ttl, now)
+        current = self._window_ids[slot]
+        self._window_expires[slot] = now + ttl
+        if window == current:
+            self._window_curr[slot] += amount
+            return self._window_curr[slot]
+        if window == current - 1:
+            self._window_prev[slot] += amount
+            return self._window_prev[slot]
+        if window < current:
+            return amount
+        self._window_prev[slot] = (
+            self._window_curr[slot] if window == current + 1 else 0
+        )
+        self._window_curr[slot] = amount
+        self._window_ids[slot] = window
+        return amount
+
+    def _window_counts(
+        self,
+        key: str,
+        current_window: int,
+        previous_window: int,
+        now: float,
+        ttl: Optional[int] = None,
+    ) -> tuple[int, int]:
+        slot = self._find_window_slot(key, current_window, previous_window, ttl)
+        if slot is None:
+            return 0, 0
+        return (
+            self._window_count(slot, current_window, now),
+            self._window_count(slot, previous_window, now),
+        )
+
+    def _add_timestamps(
+        self, key: str, timestamp: float, count: int, ttl: int, now: float
+    ) -> None:
+        timestamps = self._timestamps.get(key)
+        if timestamps is None:
+            self._maybe_purge(len(self._timestamps))
+            # only the sliding window log needs sortedcontainers
+            from sortedcontainers import SortedList
+
+            timestamps = self._timestamps[key] = SortedList()
+        for _ in range(count):
+            timestamps.add(timestamp)
+        self._timestamp_expires[key] = now + ttl
+
+    def _count_in_range(self, key: str, start: float, end: float) -> int:
+        timestamps = self._timestamps.get(key)
+        if not timestamps:
+            return 0
+        return timestamps.bisect_right(end) - timestamps.bisect_left(start)
+
+    def _count_logged(self, key: str) -> int:
+        timestamps = self._timestamps.get(key)
+        return len(timestamps) if timestamps else 0
+
+    def _remove_before(self, key: str, timestamp: float) -> None:
+        timestamps = self._timestamps.get(key)
+        if timestamps:
+            del timestamps[: timestamps.bisect_left(timestamp)]
+
+    def _read_bucket(self, key: str, now: float) -> Optional[BucketState]:
+        slot = self._bucket_slots.get(key)
+        if slot is None or self._bucket_expires[slot] <= now:
+            return None
+        return BucketState(
+            latest_refill=self._bucket_refill[slot], tokens=self._bucket_tokens[slot]
+        )
+
+    def _write_bucket(self, key: str, state: BucketState, ttl: int, now: float) -> None:
+        slot = self._bucket_slots.get(key)
+        if slot is None:
+            slot = self._alloc_bucket(key, now)
+        self._bucket_tokens[slot] = state.tokens
+        self._bucket_refill[slot] = state.latest_refill
+        self._bucket_expires[slot] = now + ttl
+
+    def _window_count(self, slot: int, window: int, now: float) -> int:
+        if self._window_expires[slot] <= now:
+            return 0
+        current = self._window_ids[slot]
+        if window == current:
+            return self._window_curr[slot]
+        if window == current - 1:
+            return self._window_prev[slot]
+        return 0
+
+    def _find_window_slot(
+        self,
+        key: str,
+        current_window: int,
+        previous_window: int,
+        ttl: Optional[int] = None,
+    ) -> Optional[int]:
+        slot = self._window_slots.get(key)
+        if slot is None:
+            return None
+        if ttl is not None:
+            # the series of one key are told apart by their window size, their window
+            # indexes can be equal (a 60s and a 3600s window both at index 0 near t=0)
+            if self._window_ttls[slot] == ttl:
+                return slot
+            for extra in self._window_extra.get(key, ()):
+                if self._window_ttls[extra] == ttl:
+                    return extra
+            return None
+        # get_window_counts() is not given the window size, any series of the key at
+        # those windows answers
+        if self._window_ids[slot] in (current_window, previous_window):
+            return slot
+        for extra in self._window_extra.get(key, ()):
+            if self._window_ids[extra] in (current_window, previous_window):
+                return extra
+        return None
+
+    def _window_slot(self, key: str, ttl: int, now: float) -> int:
+        slot = self._window_slots.get(key)
+        if slot is None:
+            slot = self._alloc_window(key, ttl, now)
+            self._window_slots[key] = slot
+        elif self._window_ttls[slot] != ttl:
+            for extra in self._window_extra.get(key, ()):
+                if self._window_ttls[extra] == ttl:
+                    slot = extra
+                    break
+            else:
+                slot = self._alloc_window(key, ttl, now)
+                if key in self._window_slots:
+                    self._window_extra.setdefault(key, []).append(slot)
+                else:
+                    # the purge run by the allocation released the other series
+                    self._window_slots[key] = slot
+        if self._window_expires[slot] <= now:
+            self._window_ids[slot] = _NO_WINDOW
+        return slot
+
+    def _alloc_window(self, key: str, ttl: int, now: float) -> int:
+        self._maybe_purge(len(self._window_ids) - len(self._window_free))
+        if self._window_free:
+            slot = self._window_free.pop()
+            self._window_ids[slot] = _NO_WINDOW
+            self._window_curr[slot] = 0
+            self._window_prev[slot] = 0
+            self._window_ttls[slot] = ttl
+            self._window_expires[slot] = now + ttl
+            return slot
+        self._window_ids.append(_NO_WINDOW)
+        self._window_curr.append(0)
+        self._window_prev.append(0)
+        self._window_ttls.append(ttl)
+        self._window_expires.append(now + ttl)
+        return len(self._window_ids) - 1
+
+    def _free_window(self, slot: int, key: str) -> None:
+        extras = self._window_extra.get(key)
+        if self._window_slots.get(key) == slot:
+            if extras:
+                self._window_slots[key] = extras.pop(0)
+            else:
+                del self._window_slots[key]
+        elif extras:
+            extras.remove(slot)
+        if extras is not None and not extras:
+            del self._window_extra[key]
+        self._window_free.append(slot)
+
+    def _alloc_bucket(self, key: str, now: float) -> int:
+        self._maybe_purge(len(self._bucket_tokens) - len(self._bucket_free))
+        if self._bucket_free:
+            slot = self._bucket_free.pop()
+        else:
+            self._bucket_tokens.append(0.0)
+            self._bucket_refill.append(0.0)
+            self._bucket_expires.append(now)
+            slot = len(self._bucket_tokens) - 1
+        self._bucket_slots[key] = slot
+        return slot
+
+    def _maybe_purge(self, live: int) -> None:
+        if live < self._purge_at:
+            return
+        self.purge_expired()
+        live = max(
+            len(self._window_ids) - len(self._window_free),
+            len(self._bucket_tokens) - len(self._bucket_free),
+            len(self._timestamps),
+        )
+        self._purge_at = max(_MIN_PURGE_SIZE, live * 2)
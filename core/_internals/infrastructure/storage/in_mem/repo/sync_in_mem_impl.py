@@ -0,0 +1,74 @@
+from threading import Lock
+from typing import Callable, Sequence
+
+from .....domain.interfaces.sync_storage import SyncStorageInterface
+from .....domain.models import (
+    WindowConsume,
+    LogConsume,
+    BucketConsume,
+    ConsumeResult,
+)
+from .in_mem_impl import InMemStorage
+
+
+class SyncInMemStorage(SyncStorageInterface):
+    """Thread-safe in-memory storage for threaded servers, without an event loop.
+
+    Keys are spread over `stripes` independent columnar tables, each guarded by its own
+    `threading.Lock`, so threads deciding for different keys rarely wait on each other.
+    A batch takes the locks of every stripe it touches in ascending order, which keeps
+    atomic batches atomic and rules out deadlocks between overlapping batches.
+    """
+
+    def __init__(self, stripes: int = 16):
+        if stripes < 1:
+            raise ValueError("stripes must be at least 1")
+        self._tables = [InMemStorage() for _ in range(stripes)]
+        self._locks = [Lock() for _ in range(stripes)]
+
+    def consume_windows(
+        self, requests: list[WindowConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        return self._consume(InMemStorage._consume_windows, requests, atomic)
+
+    def consume_logs(
+        self, requests: list[LogConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        return self._consume(InMemStorage._consume_logs, requests, atomic)
+
+    def consume_buckets(
+        self, requests: list[BucketConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        return self._consume(InMemStorage._consume_buckets, requests, atomic)
+
+    def purge_expired(self) -> int:
+        """Release every expired entry of every stripe, returning how many were dropped."""
+        dropped = 0
+        for table, lock in zip(self._tables, self._locks):
+            with lock:
+                dropped += table.purge_expired()
+        return dropped
+
+    def _table(self, key: str) -> InMemStorage:
+        return self._tables[hash(key) % len(self._tables)]
+
+    def _consume(
+        self, decide: Callable, requests: Sequence, atomic: bool
+    ) -> list[ConsumeResult]:
+        if not requests:
+            return []
+        count = len(self._tables)
+        if len(requests) == 1:
+            with self._locks[hash(requests[0].key) % count]:
+                return decide(requests, atomic, self._table)
+        locks = [
+            self._locks[stripe]
+            for stripe in sorted({hash(request.key) % count for request in requests})
+        ]
+        for lock in locks:
+            lock.acquire()
+        try:
+            return decide(requests, atomic, self._table)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
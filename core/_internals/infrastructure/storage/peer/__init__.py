@@ -0,0 +1,2 @@
+from .repo import PeerStorage
+from .transport import UdpTransport, UnixTransport
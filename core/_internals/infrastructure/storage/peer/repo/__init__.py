@@ -0,0 +1 @@
+from .peer_impl import PeerStorage
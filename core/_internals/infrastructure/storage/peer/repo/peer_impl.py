@@ -0,0 +1,306 @@
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from dataclasses import replace
+from time import monotonic, time
+from typing import Optional
+
+from sortedcontainers import SortedList
+
+from .....domain.interfaces.storage import StorageInterface
+from .....domain.interfaces.transport import PeerTransport
+from .....domain.models import BucketState, WindowData, BucketConsume, ConsumeResult
+from ...in_mem import InMemStorage
+
+logger = logging.getLogger(__name__)
+
+
+class PeerStorage(StorageInterface):
+    """Cluster-wide limits without a central store.
+
+    Every node counts its own traffic locally and, every `sync_interval` seconds, sends
+    its peers a summary of the counters that changed: its own totals per window, and
+    per-second histograms of its sliding logs. Every `snapshot_interval` seconds the
+    summary covers all live counters, which also brings up to date peers that missed
+    datagrams or joined late. Totals are absolute, so lost, duplicated or reordered
+    datagrams only delay convergence. Decisions compare the local count plus the last
+    totals reported by peers against the limit, with no network I/O on the request path.
+
+    Token buckets cannot be summed across nodes, each node enforces its share of the
+    capacity and refill rate: one over the number of peers heard from in the last
+    `peer_timeout` seconds plus itself.
+    """
+
+    def __init__(
+        self,
+        transport: PeerTransport,
+        node_id: Optional[str] = None,
+        sync_interval: float = 0.1,
+        snapshot_interval: float = 1.0,
+        peer_timeout: float = 3.0,
+        max_datagram: int = 8192,
+    ):
+        if sync_interval <= 0:
+            raise ValueError("sync_interval must be greater than 0")
+        if snapshot_interval < sync_interval:
+            raise ValueError("snapshot_interval cannot be lower than sync_interval")
+        self.transport = transport
+        self.node_id = node_id or os.urandom(6).hex()
+        self.sync_interval = sync_interval
+        self.snapshot_interval = snapshot_interval
+        self.peer_timeout = peer_timeout
+        self.max_datagram = max_datagram
+
+        # (key, window) -> own count, ttl and expiry
+        self._windows: dict[tuple[str, int], int] = {}
+        self._window_ttls: dict[tuple[str, int], int] = {}
+        self._window_expires: dict[tuple[str, int], float] = {}
+        self._dirty_windows: set[tuple[str, int]] = set()
+        # (key, window) -> node -> count, and when the entry expires
+        self._remote_windows: dict[tuple[str, int], dict[str, int]] = defaultdict(dict)
+        self._remote_window_expires: dict[tuple[str, int], float] = {}
+
+        self._timestamps: dict[str, SortedList] = defaultdict(SortedList)
+        self._log_ttls: dict[str, int] = {}
+        self._dirty_logs: set[str] = set()
+        # key -> node -> {second: count}
+        self._remote_logs: dict[str, dict[str, dict[int, int]]] = defaultdict(dict)
+        self._remote_log_ttls: dict[str, int] = {}
+
+        self._buckets = InMemStorage()
+        self._peers: dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._starting: Optional[asyncio.Lock] = None
+        self._last_snapshot = 0.0
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        if self._starting is None:
+            self._starting = asyncio.Lock()
+        # the first requests arrive together, the transport is bound only once
+        async with self._starting:
+            if self._task is None:
+                await self.transport.start(self._receive)
+                self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.sync()
+        await self.transport.close()
+
+    def live_nodes(self) -> int:
+        now = monotonic()
+        return 1 + sum(
+            1 for seen in self._peers.values() if now - seen < self.peer_timeout
+        )
+
+    async def increment_windows(
+        self, key: str, window: int, ttl: int, amount: int = 1
+    ) -> int:
+        await self.start()
+        entry = (key, window)
+        self._windows[entry] = self._windows.get(entry, 0) + amount
+        self._window_ttls[entry] = ttl
+        self._window_expires[entry] = monotonic() + ttl
+        self._dirty_windows.add(entry)
+        return self._window_count(entry)
+
+    async def get_window_counts(
+        self,
+        key: str,
+        current_window: int,
+        previous_window: int,
+        ttl: Optional[int] = None,
+    ) -> WindowData:
+        await self.start()
+        return WindowData(
+            current_count=self._window_count((key, current_window)),
+            previous_count=self._window_count((key, previous_window)),
+            current_window=current_window,
+        )
+
+    def _window_count(self, entry: tuple[str, int]) -> int:
+        count = self._windows.get(entry, 0)
+        remote = self._remote_windows.get(entry)
+        if remote:
+            count += sum(remote.values())
+        return count
+
+    async def add_timestamp(self, key: str, timestamp: float, ttl: int) -> None:
+        await self.start()
+        self._timestamps[key].add(timestamp)
+        self._log_ttls[key] = ttl
+        self._dirty_logs.add(key)
+
+    async def count_in_range(self, key: str, start: float, end: float) -> int:
+        await self.start()
+        count = 0
+        timestamps = self._timestamps.get(key)
+        if timestamps:
+            count = timestamps.bisect_right(end) - timestamps.bisect_left(start)
+        # peers report per second, a second counts when it starts inside the range
+        for histogram in self._remote_logs.get(key, {}).values():
+            count += sum(n for second, n in histogram.items() if start <= second <= end)
+        return count
+
+    async def remove_before(self, key: str, timestamp: float) -> None:
+        timestamps = self._timestamps.get(key)
+        if timestamps:
+            del timestamps[: timestamps.bisect_left(timestamp)]
+
+    async def get_bucket_state(self, key: str) -> Optional[BucketState]:
+        await self.start()
+        return await self._buckets.get_bucket_state(key)
+
+    async def update_bucket_state(self, key: str, state: BucketState, ttl: int) -> None:
+        await self._buckets.update_bucket_state(key, state, ttl)
+
+    async def consume_buckets(
+        self, requests: list[BucketConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        await self.start()
+        nodes = self.live_nodes()
+        if nodes > 1:
+            requests = [
+                replace(
+                    request,
+                    capacity=max(1, request.capacity // nodes),
+                    refill_rate=request.refill_rate / nodes,
+                )
+                for request in requests
+            ]
+        return await self._buckets.consume_buckets(requests, atomic)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                self.sync()
+            except Exception:
+                logger.warning("peer sync failed", exc_info=True)
+
+    def sync(self) -> None:
+        """Expire old counters and send the pending summary to every peer."""
+        now = monotonic()
+        self._expire(now)
+        full = now - self._last_snapshot >= self.snapshot_interval
+        if full:
+            self._last_snapshot = now
+            windows, logs = list(self._windows), list(self._timestamps)
+        else:
+            windows, logs = self._dirty_windows, self._dirty_logs
+        entries = [
+            [
+                "w",
+                key,
+                window,
+                self._window_ttls[(key, window)],
+                self._windows[(key, window)],
+            ]
+            for key, window in windows
+            if (key, window) in self._windows
+        ]
+        for key in logs:
+            timestamps = self._timestamps.get(key)
+            if timestamps is None:
+                continue
+            histogram: dict[int, int] = defaultdict(int)
+            for timestamp in timestamps:
+                histogram[int(timestamp)] += 1
+            entries.append(["l", key, self._log_ttls[key], list(histogram.items())])
+        self._dirty_windows, self._dirty_logs = set(), set()
+        for datagram in self._pack(entries):
+            self.transport.send(datagram)
+
+    def _pack(self, entries: list) -> list[bytes]:
+        # an empty summary still goes out, it tells peers this node is alive
+        datagrams, chunk, size = [], [], 0
+        for entry in entries:
+            encoded = len(json.dumps(entry, separators=(",", ":")))
+            if chunk and size + encoded > self.max_datagram:
+                datagrams.append(self._encode(chunk))
+                chunk, size = [], 0
+            chunk.append(entry)
+            size += encoded + 1
+        datagrams.append(self._encode(chunk))
+        return datagrams
+
+    def _encode(self, entries: list) -> bytes:
+        return json.dumps(
+            {"n": self.node_id, "e": entries}, separators=(",", ":")
+        ).encode()
+
+    def _receive(self, data: bytes) -> None:
+        message = json.loads(data)
+        node = message["n"]
+        if node == self.node_id:
+            return
+        now = monotonic()
+        self._peers[node] = now
+        for entry in message["e"]:
+            if entry[0] == "w":
+                _, key, window, ttl, count = entry
+                remote = self._remote_windows[(key, window)]
+                # totals only grow within a window, an older datagram can't lower them
+                remote[node] = max(remote.get(node, 0), count)
+                self._remote_window_expires[(key, window)] = now + ttl
+            elif entry[0] == "l":
+                _, key, ttl, histogram = entry
+                horizon = int(time()) - ttl
+                self._remote_log_ttls[key] = ttl
+                self._remote_logs[key][node] = {
+                    second: n for second, n in histogram if second >= horizon
+                }
+
+    def _expire(self, now: float) -> None:
+        expired = [entry for entry, at in self._window_expires.items() if at <= now]
+        for entry in expired:
+            del (
+                self._windows[entry],
+                self._window_ttls[entry],
+                self._window_expires[entry],
+            )
+            self._dirty_windows.discard(entry)
+        expired = [
+            entry for entry, at in self._remote_window_expires.items() if at <= now
+        ]
+        for entry in expired:
+            del self._remote_window_expires[entry]
+            self._remote_windows.pop(entry, None)
+
+        wall = time()
+        for key in list(self._timestamps):
+            timestamps = self._timestamps[key]
+            del timestamps[: timestamps.bisect_left(wall - self._log_ttls[key])]
+            if not timestamps:
+                del self._timestamps[key], self._log_ttls[key]
+                self._dirty_logs.discard(key)
+        for key in list(self._remote_logs):
+            nodes = self._remote_logs[key]
+            horizon = wall - self._remote_log_ttls[key]
+            for node in list(nodes):
+                histogram = {s: n for s, n in nodes[node].items() if s >= int(horizon)}
+                if histogram:
+                    nodes[node] = histogram
+                else:
+                    del nodes[node]
+            if not nodes:
+                del self._remote_logs[key], self._remote_log_ttls[key]
+
+        gone = [
+            node
+            for node, seen in self._peers.items()
+            if now - seen >= self.peer_timeout * 10
+        ]
+        for node in gone:
+            del self._peers[node]
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import os
+import socket
+from typing import Callable, Optional, Sequence
+
+from ....domain.interfaces.transport import PeerTransport
+
+logger = logging.getLogger(__name__)
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, on_message: Callable[[bytes], None]):
+        self.on_message = on_message
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        try:
+            self.on_message(data)
+        except Exception:
+            logger.warning("dropping malformed peer message", exc_info=True)
+
+    def error_received(self, exc: Exception) -> None:
+        # peers come and go, an unreachable one must not stop the others
+        logger.debug("peer send failed: %s", exc)
+
+
+class UdpTransport(PeerTransport):
+    """Exchanges datagrams with a fixed list of peers over UDP."""
+
+    def __init__(self, bind: tuple[str, int], peers: Sequence[tuple[str, int]]):
+        self.bind = bind
+        self.peers = list(peers)
+        self._transport: Optional[asyncio.DatagramTransport] = None
+
+    @property
+    def address(self) -> tuple[str, int]:
+        """Bound address, useful when binding to port 0."""
+        return self._transport.get_extra_info("sockname")[:2]
+
+    async def start(self, on_message: Callable[[bytes], None]) -> None:
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: _DatagramProtocol(on_message), local_addr=self.bind
+        )
+
+    def send(self, data: bytes) -> None:
+        if self._transport is None:
+            return
+        for peer in self.peers:
+            self._transport.sendto(data, peer)
+
+    async def close(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+
+class UnixTransport(PeerTransport):
+    """Exchanges datagrams with peers on the same host through Unix sockets."""
+
+    def __init__(self, path: str, peers: Sequence[str]):
+        self.path = path
+        self.peers = list(peers)
+        self._transport: Optional[asyncio.DatagramTransport] = None
+
+    async def start(self, on_message: Callable[[bytes], None]) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(self.path)
+        sock.setblocking(False)
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: _DatagramProtocol(on_message), sock=sock
+        )
+
+    def send(self, data: bytes) -> None:
+        if self._transport is None:
+            return
+        for peer in self.peers:
+            self._transport.sendto(data, peer)
+
+    async def close(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
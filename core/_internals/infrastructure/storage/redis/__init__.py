@@ -1,2 +1,2 @@
-from .repo import RedisStorage
+from .repo import RedisStorage, SyncRedisStorage
 from .redis import ThrottyRedis
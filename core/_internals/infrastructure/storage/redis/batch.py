@@ -0,0 +1,148 @@
+import os
+from typing import Callable, Optional, Sequence
+
+from redis.crc import key_slot
+
+from ....domain.models import WindowConsume, LogConsume, BucketConsume, ConsumeResult
+from ....domain.exceptions import RedisError
+from .keys import RedisKeys
+from .ring import HashRing
+from .scripts import (
+    CONSUME_WINDOWS,
+    CONSUME_WINDOW_HASHES,
+    CONSUME_LOGS,
+    CONSUME_BUCKETS,
+)
+
+# Building the calls of the CONSUME_* scripts is shared by the asyncio and the blocking
+# Redis storages, only the way the calls are sent differs.
+
+
+def window_keys(request: WindowConsume, keys: RedisKeys) -> list[str]:
+    return [
+        keys.window(request.key, request.current_window),
+        keys.window(request.key, request.previous_window),
+    ]
+
+
+def window_args(request: WindowConsume) -> list:
+    return [request.weight, request.limit, request.cost, request.ttl]
+
+
+def window_hash_keys(request: WindowConsume, keys: RedisKeys) -> list[str]:
+    return [keys.window_hash(request.key, request.ttl)]
+
+
+def window_hash_args(request: WindowConsume) -> list:
+    return [
+        request.current_window,
+        request.weight,
+        request.limit,
+        request.cost,
+        request.ttl,
+    ]
+
+
+def log_keys(request: LogConsume, keys: RedisKeys) -> list[str]:
+    return [keys.log(request.key)]
+
+
+def log_args(request: LogConsume) -> list:
+    return [
+        repr(request.start),
+        repr(request.now),
+        request.limit,
+        request.cost,
+        request.ttl,
+    ]
+
+
+def bucket_keys(request: BucketConsume, keys: RedisKeys) -> list[str]:
+    return [keys.bucket(request.key), keys.legacy_bucket(request.key)]
+
+
+def bucket_args(request: BucketConsume) -> list:
+    return [
+        request.capacity,
+        repr(request.refill_rate),
+        repr(request.now),
+        request.cost,
+        request.ttl,
+    ]
+
+
+# script, key builder, argument builder, whether the call needs a member nonce
+CONSUMERS = {
+    WindowConsume: (CONSUME_WINDOWS, window_keys, window_args, False),
+    LogConsume: (CONSUME_LOGS, log_keys, log_args, True),
+    BucketConsume: (CONSUME_BUCKETS, bucket_keys, bucket_args, False),
+}
+WINDOW_HASH_CONSUMER = (
+    CONSUME_WINDOW_HASHES,
+    window_hash_keys,
+    window_hash_args,
+    False,
+)
+
+
+def consumers(keys: RedisKeys) -> dict:
+    if not keys.hash_windows:
+        return CONSUMERS
+    return {**CONSUMERS, WindowConsume: WINDOW_HASH_CONSUMER}
+
+
+def group_requests(
+    requests: Sequence,
+    atomic: bool,
+    is_cluster: bool,
+    keys: RedisKeys,
+    ring: Optional[HashRing] = None,
+) -> list[list[int]]:
+    if not is_cluster and ring is None:
+        return [list(range(len(requests)))]
+    # a script may only touch keys of one slot, or of one server of a sharded ring,
+    # run one call per slot or server
+    groups_by: dict = {}
+    for idx, request in enumerate(requests):
+        slot = key_slot(keys.tag(request.key).encode())
+        owner = slot if ring is None else ring.slot_owner(slot)
+        groups_by.setdefault(owner, []).append(idx)
+    groups = list(groups_by.values())
+    if atomic and len(groups) > 1:
+        raise RedisError(
+            f"Atomic batches {'across Redis servers' if ring else 'on Redis Cluster'} "
+            "need keys sharing one hash tag, e.g. 'user:{acme}:1' and 'org:{acme}'"
+        )
+    return groups
+
+
+def build_call(
+    requests: Sequence,
+    group: list[int],
+    atomic: bool,
+    redis_keys: RedisKeys,
+    keys: Callable[..., list[str]],
+    args: Callable[..., list],
+    nonce: bool,
+) -> tuple[list[str], list]:
+    batch_keys, batch_args = [], ["1" if atomic else "0"]
+    if nonce:
+        # log members must stay unique across clients writing equal timestamps
+        batch_args.append(os.urandom(8).hex())
+    for idx in group:
+        batch_keys.extend(keys(requests[idx], redis_keys))
+        batch_args.extend(args(requests[idx]))
+    return batch_keys, batch_args
+
+
+def parse_replies(
+    size: int, groups: list[list[int]], replies: Sequence
+) -> list[ConsumeResult]:
+    results: list[Optional[ConsumeResult]] = [None] * size
+    for group, reply in zip(groups, replies):
+        for pos, idx in enumerate(group):
+            results[idx] = ConsumeResult(
+                allowed=bool(int(reply[2 * pos])),
+                remaining=float(reply[2 * pos + 1]),
+            )
+    return results
@@ -0,0 +1,24 @@
+from typing import Optional, Sequence
+
+from ....domain.models import BucketState
+
+# Token buckets are stored as a small hash with two integer fields so Redis keeps them
+# listpack encoded: "t" holds the tokens and "r" the latest refill timestamp, both in
+# millionths.
+BUCKET_SCALE = 1_000_000
+
+
+def encode_bucket(state: BucketState) -> tuple[int, int]:
+    return (
+        round(state.tokens * BUCKET_SCALE),
+        round(state.latest_refill * BUCKET_SCALE),
+    )
+
+
+def decode_bucket(values: Optional[Sequence]) -> Optional[BucketState]:
+    if not values or values[0] is None or values[1] is None:
+        return None
+    return BucketState(
+        latest_refill=int(values[1]) / BUCKET_SCALE,
+        tokens=int(values[0]) / BUCKET_SCALE,
+    )
@@ -0,0 +1,109 @@
+from base64 import urlsafe_b64encode
+from hashlib import blake2b
+from typing import Optional
+
+_CACHE_SIZE = 65536
+_DIGEST_LENGTH = 16
+
+
+def hash_tag(key: str) -> str:
+    """Wrap a client key in a Redis Cluster hash tag.
+
+    Every Redis key derived from the same client key shares the tag, so all keys touched
+    by one decision hash to the same slot. Keys that already carry a non-empty tag are
+    left untouched, which lets callers co-locate several client keys on purpose.
+    """
+    start = key.find("{")
+    if start != -1:
+        end = key.find("}", start + 1)
+        if end > start + 1:
+            return key
+    return f"{{{key}}}"
+
+
+def window_key(key: str, window: int) -> str:
+    return f"{hash_tag(key)}:w:{window}"
+
+
+def log_key(key: str) -> str:
+    return f"{hash_tag(key)}:log"
+
+
+def bucket_key(key: str) -> str:
+    return f"{hash_tag(key)}:bucket"
+
+
+class RedisKeys:
+    """Builds the Redis keys of client keys, for every Redis backed storage.
+
+    The defaults produce the keys above. `namespace` is prepended to every key, keeping
+    the limiter apart from the other keys of a shared database. Client keys longer than
+    `hash_over` characters are replaced by a 12 byte BLAKE2b digest, written as 16
+    base64 characters; an explicit hash tag is kept in front of the digest so
+    co-located keys stay in one slot. `compact` shortens the suffixes to `:w<hex>`,
+    `:l` and `:b`. With `hash_windows`, the sliding window counter keeps both of its
+    windows in one hash per key and window length (`:wh:<ttl>`, compact `:h<hex>`).
+    """
+
+    def __init__(
+        self,
+        namespace: str = "",
+        hash_over: Optional[int] = None,
+        compact: bool = False,
+        hash_windows: bool = False,
+    ):
+        if hash_over is not None and hash_over < _DIGEST_LENGTH:
+            raise ValueError(f"hash_over must be at least {_DIGEST_LENGTH}")
+        self.namespace = namespace
+        self.hash_over = hash_over
+        self.compact = compact
+        self.hash_windows = hash_windows
+        self._plain = not namespace and hash_over is None
+        self._tags: dict[str, str] = {}
+
+    def tag(self, key: str) -> str:
+        """Hash tagged, hashed when long, client key, without the namespace."""
+        if self.hash_over is None or len(key) <= self.hash_over:
+            return hash_tag(key)
+        digest = urlsafe_b64encode(blake2b(key.encode(), digest_size=12).digest())
+        start = key.find("{")
+        end = key.find("}", start + 1) if start != -1 else -1
+        if end > start + 1:
+            return f"{key[start:end + 1]}{digest.decode()}"
+        return f"{{{digest.decode()}}}"
+
+    def prefix(self, key: str) -> str:
+        if self._plain:
+            return hash_tag(key)
+        prefix = self._tags.get(key)
+        if prefix is None:
+            if len(self._tags) >= _CACHE_SIZE:
+                self._tags.clear()
+            prefix = self._tags[key] = self.namespace + self.tag(key)
+        return prefix
+
+    def window(self, key: str, window: int) -> str:
+        if self.compact:
+            return f"{self.prefix(key)}:w{window:x}"
+        return f"{self.prefix(key)}:w:{window}"
+
+    def window_hash(self, key: str, ttl: int) -> str:
+        if self.compact:
+            return f"{self.prefix(key)}:h{ttl:x}"
+        return f"{self.prefix(key)}:wh:{ttl}"
+
+    def log(self, key: str) -> str:
+        return self.prefix(key) + (":l" if self.compact else ":log")
+
+    def bucket(self, key: str) -> str:
+        return self.prefix(key) + (":b" if self.compact else ":bucket")
+
+    def legacy_bucket(self, key: str) -> str:
+        """Where buckets lived before the hash-tagged layout: the client key itself.
+
+        A hashed client key no longer shares a slot with it, the bucket key is returned
+        instead and nothing is migrated.
+        """
+        if self.hash_over is None or len(key) <= self.hash_over:
+            return key
+        return self.bucket(key)
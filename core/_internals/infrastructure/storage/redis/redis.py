@@ -1,53 +1,159 @@
-from redis.asyncio import Redis, ConnectionPool
-from redis.exceptions import ConnectionError
+from redis.asyncio import Redis, ConnectionPool, RedisCluster
+from redis.commands.core import AsyncScript
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator, Optional
-from asyncio import Semaphore
+from typing import AsyncGenerator, Iterable, Optional, Sequence, Union
+from asyncio import Semaphore, gather
+
+from .ring import HashRing
 
 
 class ThrottyRedis:
+    """Redis connection of the Redis backed storages.
+
+    `dsn` may also be a list of independent Redis servers: each keeps its own pool and
+    semaphore, and rate limit keys are routed to them through a consistent hash ring
+    with `vnodes` points per server.
+    """
+
     def __init__(
         self,
-        redis: Optional[Redis] = None,
+        redis: Optional[Union[Redis, RedisCluster]] = None,
         pool: Optional[ConnectionPool] = None,
-        dsn: Optional[str] = None,
+        dsn: Optional[Union[str, Sequence[str]]] = None,
         max_connections: int = 10,
+        cluster: bool = False,
+        vnodes: int = 160,
     ):
         self._owns_connection = False
+        self._scripts: dict[str, AsyncScript] = {}
         self._semaphore: Semaphore = Semaphore(value=max_connections)
+        self._max_connections = max_connections
+        self.is_cluster = cluster or isinstance(redis, RedisCluster)
+        self.ring: Optional[HashRing] = None
+        self._shards: dict[str, "ThrottyRedis"] = {}
 
-        if redis:
+        if dsn is not None and not isinstance(dsn, str):
+            if cluster:
+                raise ValueError("A list of Redis servers cannot be a cluster")
+            if not dsn:
+                raise ValueError("At least one Redis server is required")
+            self.ring = HashRing(dsn, vnodes=vnodes)
+            self._shards = {node: self._shard(node) for node in self.ring.nodes}
+            # scripts are registered on the first server and run on any of them
+            self._redis = self._shards[self.ring.nodes[0]].redis
+            self._pool = None
+            self._owns_connection = True
+        elif redis:
             self._redis = redis
-            self._pool = redis.connection_pool
+            self._pool = getattr(redis, "connection_pool", None)
         elif pool:
             self._redis = Redis.from_pool(connection_pool=pool)
             self._pool = pool
+        elif dsn and cluster:
+            # the cluster client keeps one pool per node, max_connections applies to each
+            self._redis = RedisCluster.from_url(
+                url=dsn,
+                max_connections=max_connections,
+                socket_connect_timeout=5,
+                socket_keepalive=True,
+            )
+            self._pool = None
+            self._owns_connection = True
         elif dsn:
             self._pool = ConnectionPool.from_url(
                 url=dsn,
                 max_connections=max_connections,
                 socket_connect_timeout=5,
-                socker_keepalive=True,
+                socket_keepalive=True,
                 health_check_interval=30,
             )
             self._redis = Redis.from_pool(self._pool)
             self._owns_connection = True
 
     @property
-    def redis(self) -> Redis:
+    def redis(self) -> Union[Redis, RedisCluster]:
         return self._redis
 
+    @property
+    def shards(self) -> dict[str, "ThrottyRedis"]:
+        return dict(self._shards)
+
+    def node(self, key: str) -> "ThrottyRedis":
+        """Connection of the server owning a hash tagged key, itself when not sharded."""
+        if self.ring is None:
+            return self
+        return self._shards[self.ring.node(key)]
+
+    def add_node(self, dsn: str) -> None:
+        if self.ring is None:
+            raise ValueError("Only a list of Redis servers can grow")
+        self.ring.add(dsn)
+        self._shards[dsn] = self._shard(dsn)
+
+    async def remove_node(self, dsn: str) -> None:
+        if self.ring is None or dsn not in self._shards:
+            raise ValueError(f"{dsn} is not one of the Redis servers")
+        if len(self._shards) == 1:
+            raise ValueError("The last Redis server cannot be removed")
+        self.ring.remove(dsn)
+        shard = self._shards.pop(dsn)
+        if shard.redis is self._redis:
+            self._redis = self._shards[self.ring.nodes[0]].redis
+        await shard.close_redis()
+
+    def _shard(self, dsn: str) -> "ThrottyRedis":
+        return ThrottyRedis(dsn=dsn, max_connections=self._max_connections)
+
+    def script(self, source: str) -> AsyncScript:
+        script = self._scripts.get(source)
+        if script is None:
+            script = self._scripts[source] = self._redis.register_script(source)
+        return script
+
+    async def warm_up(self, connections: Optional[int] = None) -> None:
+        if self.ring is not None:
+            await gather(
+                *(shard.warm_up(connections) for shard in self._shards.values())
+            )
+            return
+        if self.is_cluster:
+            # discovers the slots and creates the node clients
+            await self._redis.initialize()
+            return
+        if self._pool is None:
+            await self._redis.ping()
+            return
+        count = min(connections or self._max_connections, self._pool.max_connections)
+        opened = await gather(*(self._pool.get_connection() for _ in range(count)))
+        for connection in opened:
+            await self._pool.release(connection)
+
+    async def load_scripts(self, sources: Iterable[str]) -> None:
+        # EVALSHA of a registered script then never takes the NOSCRIPT detour
+        if self.ring is not None:
+            sources = list(sources)
+            for source in sources:
+                self.script(source)
+            await gather(
+                *(shard.load_scripts(sources) for shard in self._shards.values())
+            )
+            return
+        for source in sources:
+            self.script(source)
+            await self._redis.script_load(source)
+
     @asynccontextmanager
-    async def get_redis(self) -> AsyncGenerator[Redis, None]:
+    async def get_redis(self) -> AsyncGenerator[Union[Redis, RedisCluster], None]:
         async with self._semaphore:
-            try:
-                yield self._redis
-            except ConnectionError as e:
-                raise ConnectionError from e
-            finally:
-                pass
+            yield self._redis
 
     async def close_redis(self):
-        if self._owns_connection and self._redis and self._pool:
+        if not self._owns_connection or not self._redis:
+            return
+        if self.ring is not None:
+            await gather(*(shard.close_redis() for shard in self._shards.values()))
+        elif self.is_cluster:
+            await self._redis.aclose()
+        elif self._pool:
             await self._redis.close()
             await self._pool.disconnect()
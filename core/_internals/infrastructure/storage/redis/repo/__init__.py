@@ -1 +1,2 @@
 from .redis_impl import RedisStorage
+from .sync_redis_impl import SyncRedisStorage
@@ -1,31 +1,61 @@
-from typing import Optional
-import json
+import asyncio
+from typing import Callable, Optional, Sequence
 
-from .....domain.models import BucketState, WindowData
+from .....domain.models import (
+    BucketState,
+    WindowData,
+    WindowConsume,
+    LogConsume,
+    BucketConsume,
+    ConsumeResult,
+)
 from .....domain.interfaces.storage import StorageInterface
 from ..redis import ThrottyRedis
+from ..keys import RedisKeys
+from ..codec import encode_bucket, decode_bucket
+from ..scripts import GET_BUCKET, SET_BUCKET, INCREMENT_WINDOW_HASH, SCRIPTS
+from ..batch import consumers, group_requests, build_call, parse_replies
 
 
 class RedisStorage(StorageInterface):
-    def __init__(self, redis: ThrottyRedis):
+    def __init__(self, redis: ThrottyRedis, keys: Optional[RedisKeys] = None):
         self.storage = redis
+        self.keys = keys or RedisKeys()
+        self._consumers = consumers(self.keys)
 
-    async def increment_windows(self, key: str, window: int, ttl: int) -> int:
-        window_key = f"{key}:{window}"
-        async with self.storage.get_redis() as redis:
+    async def increment_windows(
+        self, key: str, window: int, ttl: int, amount: int = 1
+    ) -> int:
+        if self.keys.hash_windows:
+            async with self._redis_for(key) as redis:
+                return await self.storage.script(INCREMENT_WINDOW_HASH)(
+                    keys=[self.keys.window_hash(key, ttl)],
+                    args=[window, amount, ttl],
+                    client=redis,
+                )
+        curr_key = self.keys.window(key, window)
+        async with self._redis_for(key) as redis:
             async with redis.pipeline() as pipe:
-                await pipe.incr(window_key)
-                await pipe.expire(window_key, ttl)
+                await pipe.incrby(curr_key, amount)
+                await pipe.expire(curr_key, ttl)
                 res = await pipe.execute()
         return res[0]
 
     async def get_window_counts(
-        self, key: str, current_window: int, previous_window: int
+        self,
+        key: str,
+        current_window: int,
+        previous_window: int,
+        ttl: Optional[int] = None,
     ) -> WindowData:
-        curr_key = f"{key}:{current_window}"
-        prev_key = f"{key}:{previous_window}"
+        if self.keys.hash_windows:
+            return await self._window_hash_counts(
+                key, current_window, previous_window, ttl
+            )
+        curr_key = self.keys.window(key, current_window)
+        prev_key = self.keys.window(key, previous_window)
 
-        async with self.storage.get_redis() as redis:
+        async with self._redis_for(key) as redis:
             async with redis.pipeline() as pipe:
                 await pipe.get(curr_key)
                 await pipe.get(prev_key)
@@ -37,36 +67,111 @@ class RedisStorage(StorageInterface):
                 current_window=current_window,
             )
 
+    async def _window_hash_counts(
+        self, key: str, current_window: int, previous_window: int, ttl: Optional[int]
+    ) -> WindowData:
+        # the hash of a window size is named after its ttl, the window indexes are fields
+        if ttl is None:
+            raise ValueError("Hashed windows are looked up by their ttl, pass ttl")
+        async with self._redis_for(key) as redis:
+            index, current, previous = await redis.hmget(
+                self.keys.window_hash(key, ttl), "i", "c", "p"
+            )
+        index = None if index is None else int(index)
+        if index == current_window:
+            counts = (int(current or 0), int(previous or 0))
+        elif index == previous_window:
+            counts = (0, int(current or 0))
+        else:
+            counts = (0, 0)
+        return WindowData(
+            current_count=counts[0],
+            previous_count=counts[1],
+            current_window=current_window,
+        )
+
     async def add_timestamp(self, key: str, timestamp: float, ttl: int) -> None:
-        async with self.storage.get_redis() as redis:
+        zset_key = self.keys.log(key)
+        async with self._redis_for(key) as redis:
             async with redis.pipeline() as pipe:
-                await pipe.zadd(key, {str(timestamp): timestamp})
-                await pipe.expire(key, ttl)
+                await pipe.zadd(zset_key, {str(timestamp): timestamp})
+                await pipe.expire(zset_key, ttl)
                 await pipe.execute()
 
     async def count_in_range(self, key: str, start: float, end: float) -> int:
-        async with self.storage.get_redis() as redis:
-            return await redis.zcount(key, start, end)
+        async with self._redis_for(key) as redis:
+            return await redis.zcount(self.keys.log(key), start, end)
 
     async def remove_before(self, key: str, timestamp: float):
-        async with self.storage.get_redis() as redis:
-            await redis.zremrangebyscore(key, 0, timestamp)
+        async with self._redis_for(key) as redis:
+            await redis.zremrangebyscore(self.keys.log(key), 0, timestamp)
 
     async def get_bucket_state(self, key: str) -> Optional[BucketState]:
-        async with self.storage.get_redis() as redis:
-            data = await redis.get(key)
-            if not data:
-                return None
-
-            state_dict = json.loads(data)
-            return BucketState(
-                latest_refill=float(state_dict["latest_refill"]),
-                tokens=float(state_dict["tokens"]),
+        async with self._redis_for(key) as redis:
+            values = await self.storage.script(GET_BUCKET)(
+                keys=[self.keys.bucket(key), self.keys.legacy_bucket(key)],
+                client=redis,
             )
+            return decode_bucket(values)
 
     async def update_bucket_state(self, key: str, state: BucketState, ttl: int) -> None:
-        async with self.storage.get_redis() as redis:
-            data = json.dumps(
-                {"tokens": state.tokens, "latest_refill": state.latest_refill}
+        tokens, latest_refill = encode_bucket(state)
+        async with self._redis_for(key) as redis:
+            await self.storage.script(SET_BUCKET)(
+                keys=[self.keys.bucket(key)],
+                args=[tokens, latest_refill, ttl],
+                client=redis,
             )
-            await redis.setex(key, ttl, data)
+
+    def _redis_for(self, key: str):
+        return self.storage.node(self.keys.tag(key)).get_redis()
+
+    async def start(self) -> None:
+        await self.storage.load_scripts(SCRIPTS)
+
+    async def consume_windows(
+        self, requests: list[WindowConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        return await self._consume(requests, atomic, *self._consumers[WindowConsume])
+
+    async def consume_logs(
+        self, requests: list[LogConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        return await self._consume(requests, atomic, *self._consumers[LogConsume])
+
+    async def consume_buckets(
+        self, requests: list[BucketConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        return await self._consume(requests, atomic, *self._consumers[BucketConsume])
+
+    async def _consume(
+        self,
+        requests: Sequence,
+        atomic: bool,
+        source: str,
+        keys: Callable[..., list[str]],
+        args: Callable[..., list],
+        nonce: bool,
+    ) -> list[ConsumeResult]:
+        if not requests:
+            return []
+        ring = self.storage.ring
+        groups = group_requests(
+            requests, atomic, self.storage.is_cluster, self.keys, ring
+        )
+
+        async def run(group: list[int]) -> list:
+            batch_keys, batch_args = build_call(
+                requests, group, atomic, self.keys, keys, args, nonce
+            )
+            # every key of a group lives on the server of its first key
+            node = self.storage
+            if ring is not None:
+                node = self.storage.node(self.keys.tag(requests[group[0]].key))
+            async with node.get_redis() as redis:
+                return await self.storage.script(source)(
+                    keys=batch_keys, args=batch_args, client=redis
+                )
+
+        replies = await asyncio.gather(*(run(group) for group in groups))
+        return parse_replies(len(requests), groups, replies)
@@ -0,0 +1,79 @@
+from typing import Callable, Optional, Sequence, Union
+
+from redis import Redis, RedisCluster
+
+from .....domain.models import (
+    WindowConsume,
+    LogConsume,
+    BucketConsume,
+    ConsumeResult,
+)
+from .....domain.interfaces.sync_storage import SyncStorageInterface
+from ..batch import consumers, group_requests, build_call, parse_replies
+from ..keys import RedisKeys
+
+
+class SyncRedisStorage(SyncStorageInterface):
+    """Blocking Redis storage running the same consume scripts as RedisStorage.
+
+    Uses a regular (non asyncio) redis-py client, which is thread-safe through its
+    connection pool, so threaded servers decide in one round trip per request without an
+    event loop. Counters are shared with asyncio services using the same Redis.
+    """
+
+    def __init__(
+        self,
+        redis: Union[Redis, RedisCluster],
+        owns_connection: bool = False,
+        keys: Optional[RedisKeys] = None,
+    ):
+        self.redis = redis
+        self.keys = keys or RedisKeys()
+        self._consumers = consumers(self.keys)
+        self.is_cluster = isinstance(redis, RedisCluster)
+        self._owns_connection = owns_connection
+        # registered up front so threads never race on the script cache
+        self._scripts = {
+            source: redis.register_script(source)
+            for source, _, _, _ in self._consumers.values()
+        }
+
+    def consume_windows(
+        self, requests: list[WindowConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        return self._consume(requests, atomic, *self._consumers[WindowConsume])
+
+    def consume_logs(
+        self, requests: list[LogConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        return self._consume(requests, atomic, *self._consumers[LogConsume])
+
+    def consume_buckets(
+        self, requests: list[BucketConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        return self._consume(requests, atomic, *self._consumers[BucketConsume])
+
+    def close(self) -> None:
+        if self._owns_connection:
+            self.redis.close()
+
+    def _consume(
+        self,
+        requests: Sequence,
+        atomic: bool,
+        source: str,
+        keys: Callable[..., list[str]],
+        args: Callable[..., list],
+        nonce: bool,
+    ) -> list[ConsumeResult]:
+        if not requests:
+            return []
+        groups = group_requests(requests, atomic, self.is_cluster, self.keys)
+        script = self._scripts[source]
+        replies = []
+        for group in groups:
+            batch_keys, batch_args = build_call(
+                requests, group, atomic, self.keys, keys, args, nonce
+            )
+            replies.append(script(keys=batch_keys, args=batch_args, client=self.redis))
+        return parse_replies(len(requests), groups, replies)
@@ -0,0 +1,69 @@
+from bisect import bisect_left
+from hashlib import blake2b
+from typing import Iterable
+
+from redis.crc import REDIS_CLUSTER_HASH_SLOTS, key_slot
+
+
+class HashRing:
+    """Consistent hash ring spreading the Redis Cluster hash slots over independent nodes.
+
+    Each node is placed on a 32 bit ring at `vnodes` points and owns the slots up to
+    each of its points, the slots being laid out evenly around the ring. Routing goes
+    through the slot of the hash tagged key, so every key of a decision, and client
+    keys sharing an explicit `{tag}`, land on one node as they would on a cluster.
+    Adding or removing a node only moves the slots of the arcs it gains or loses.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 160):
+        if vnodes < 1:
+            raise ValueError("vnodes must be at least 1")
+        self.vnodes = vnodes
+        self._nodes = list(nodes)
+        self._slots: list[str] = []
+        if len(set(self._nodes)) != len(self._nodes):
+            raise ValueError("Nodes of a hash ring must be unique")
+        self._assign()
+
+    @property
+    def nodes(self) -> list[str]:
+        return list(self._nodes)
+
+    def add(self, node: str) -> None:
+        if node in self._nodes:
+            raise ValueError(f"{node} is already on the ring")
+        self._nodes.append(node)
+        self._assign()
+
+    def remove(self, node: str) -> None:
+        if node not in self._nodes:
+            raise ValueError(f"{node} is not on the ring")
+        self._nodes.remove(node)
+        self._assign()
+
+    def node(self, key: str) -> str:
+        return self._slots[key_slot(key.encode())]
+
+    def slot_owner(self, slot: int) -> str:
+        return self._slots[slot]
+
+    def _assign(self) -> None:
+        if not self._nodes:
+            self._slots = []
+            return
+        points = sorted(
+            (self._point(f"{node}#{replica}"), node)
+            for node in self._nodes
+            for replica in range(self.vnodes)
+        )
+        positions = [point for point, _ in points]
+        step = (1 << 32) // REDIS_CLUSTER_HASH_SLOTS
+        # the owner of a slot is the first point at or after it, wrapping around
+        self._slots = [
+            points[bisect_left(positions, slot * step) % len(points)][1]
+            for slot in range(REDIS_CLUSTER_HASH_SLOTS)
+        ]
+
+    @staticmethod
+    def _point(label: str) -> int:
+        return int.from_bytes(blake2b(label.encode(), digest_size=4).digest(), "big")
@@ -0,0 +1,328 @@
+# Before the hash-tagged layout a token bucket was a JSON string stored under the client
+# key itself. Scripts reading a bucket get that key as its legacy key and, when the bucket
+# hash does not exist yet, move a JSON bucket found there to the hash layout described
+# in codec.py, keeping its TTL. The client key shares the slot of the bucket key unless
+# it was hashed (`RedisKeys(hash_over=...)`); the bucket key itself is passed then.
+MIGRATE_BUCKET = """
+local function migrate(key, legacy)
+    if not legacy or legacy == key or redis.call('TYPE', legacy).ok ~= 'string' then
+        return nil
+    end
+    local ok, state = pcall(cjson.decode, redis.call('GET', legacy))
+    if not ok or type(state) ~= 'table' or type(state.tokens) ~= 'number'
+        or type(state.latest_refill) ~= 'number' then
+        return nil
+    end
+    local tokens = string.format('%.0f', state.tokens * 1000000)
+    local refill = string.format('%.0f', state.latest_refill * 1000000)
+    local ttl = redis.call('PTTL', legacy)
+    redis.call('DEL', legacy)
+    redis.call('HSET', key, 't', tokens, 'r', refill)
+    if ttl > 0 then
+        redis.call('PEXPIRE', key, ttl)
+    end
+    return {tokens, refill}
+end
+"""
+
+GET_BUCKET = MIGRATE_BUCKET + """
+local values = redis.call('HMGET', KEYS[1], 't', 'r')
+if values[1] and values[2] then
+    return values
+end
+return migrate(KEYS[1], KEYS[2]) or false
+"""
+
+SET_BUCKET = """
+redis.call('HSET', KEYS[1], 't', ARGV[1], 'r', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+# Charges the tokens a hybrid node spent since its last sync to the shared bucket and
+# answers with the merged state. KEYS: the bucket and its legacy key. ARGV: capacity,
+# refill rate, now, tokens spent and ttl.
+MERGE_BUCKET = MIGRATE_BUCKET + """
+local SCALE = 1000000
+local capacity, rate = tonumber(ARGV[1]), tonumber(ARGV[2])
+local now, spent = tonumber(ARGV[3]), tonumber(ARGV[4])
+local values = redis.call('HMGET', KEYS[1], 't', 'r')
+if not (values[1] and values[2]) then
+    values = migrate(KEYS[1], KEYS[2])
+end
+local tokens, refill = capacity, now
+if values then
+    tokens, refill = tonumber(values[1]) / SCALE, tonumber(values[2]) / SCALE
+    tokens = math.min(capacity, tokens + math.max(0, now - refill) * rate)
+    refill = math.max(refill, now)
+end
+tokens = math.max(0, tokens - spent)
+local t = string.format('%.0f', tokens * SCALE)
+local r = string.format('%.0f', refill * SCALE)
+redis.call('HSET', KEYS[1], 't', t, 'r', r)
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return {t, r}
+"""
+
+# One increment of the hashed window layout (`RedisKeys(hash_windows=True)`): `i` holds
+# the current window index, `c` its count and `p` the count of the window before it.
+INCREMENT_WINDOW_HASH = """
+local window, amount = tonumber(ARGV[1]), tonumber(ARGV[2])
+local index = tonumber(redis.call('HGET', KEYS[1], 'i'))
+local count
+if index == window then
+    count = redis.call('HINCRBY', KEYS[1], 'c', amount)
+elseif index == window + 1 then
+    -- a late increment of the window that was just rotated out
+    count = redis.call('HINCRBY', KEYS[1], 'p', amount)
+elseif index and index > window then
+    return 0
+else
+    local previous = 0
+    if index == window - 1 then
+        previous = redis.call('HGET', KEYS[1], 'c')
+    end
+    redis.call('HSET', KEYS[1], 'i', window, 'c', amount, 'p', previous)
+    count = amount
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return count
+"""
+
+# Batched decisions. ARGV[1] is '1' for an all-or-nothing batch, followed by a fixed
+# number of arguments per request. Every script answers with a flat list holding, per
+# request, 1 or 0 for allowed and what is left of its limit as a string (Lua numbers are
+# truncated to integers on the way out).
+
+CONSUME_WINDOWS = """
+local atomic = ARGV[1] == '1'
+local results, pending = {}, {}
+local passed = true
+for i = 1, #KEYS / 2 do
+    local curr_key, prev_key = KEYS[2 * i - 1], KEYS[2 * i]
+    local at = 2 + (i - 1) * 4
+    local limit, cost = tonumber(ARGV[at + 1]), tonumber(ARGV[at + 2])
+    local count = tonumber(redis.call('GET', prev_key) or 0) * tonumber(ARGV[at])
+        + tonumber(redis.call('GET', curr_key) or 0) + (pending[curr_key] or 0)
+    local allowed = count + cost <= limit
+    if allowed then
+        count = count + cost
+        if atomic then
+            pending[curr_key] = (pending[curr_key] or 0) + cost
+        else
+            redis.call('INCRBY', curr_key, cost)
+            redis.call('EXPIRE', curr_key, ARGV[at + 3])
+        end
+    else
+        passed = false
+    end
+    results[2 * i - 1] = allowed and 1 or 0
+    results[2 * i] = limit - count
+end
+for i = 1, #KEYS / 2 do
+    local at = 2 + (i - 1) * 4
+    if atomic and not passed then
+        if results[2 * i - 1] == 1 then
+            results[2 * i - 1] = 0
+            results[2 * i] = results[2 * i] + tonumber(ARGV[at + 2])
+        end
+    elseif atomic then
+        redis.call('INCRBY', KEYS[2 * i - 1], ARGV[at + 2])
+        redis.call('EXPIRE', KEYS[2 * i - 1], ARGV[at + 3])
+    end
+    results[2 * i] = string.format('%.17g', results[2 * i])
+end
+return results
+"""
+
+# ARGV[2] makes the members written by this call unique, several requests of one key
+# land on the same timestamp when they are charged in a single call.
+CONSUME_LOGS = """
+local atomic = ARGV[1] == '1'
+local results, pending = {}, {}
+local passed = true
+local function charge(i, key, at)
+    for j = 1, tonumber(ARGV[at + 3]) do
+        redis.call('ZADD', key, ARGV[at + 1], ARGV[2] .. ':' .. i .. ':' .. j)
+    end
+    redis.call('EXPIRE', key, ARGV[at + 4])
+end
+for i, key in ipairs(KEYS) do
+    local at = 3 + (i - 1) * 5
+    local limit, cost = tonumber(ARGV[at + 2]), tonumber(ARGV[at + 3])
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', '(' .. ARGV[at])
+    local count = redis.call('ZCOUNT', key, ARGV[at], ARGV[at + 1]) + (pending[key] or 0)
+    local allowed = count + cost <= limit
+    if allowed then
+        count = count + cost
+        if atomic then
+            pending[key] = (pending[key] or 0) + cost
+        else
+            charge(i, key, at)
+        end
+    else
+        passed = false
+    end
+    results[2 * i - 1] = allowed and 1 or 0
+    results[2 * i] = limit - count
+end
+for i, key in ipairs(KEYS) do
+    local at = 3 + (i - 1) * 5
+    if atomic and not passed then
+        if results[2 * i - 1] == 1 then
+            results[2 * i - 1] = 0
+            results[2 * i] = results[2 * i] + tonumber(ARGV[at + 3])
+        end
+    elseif atomic then
+        charge(i, key, at)
+    end
+    results[2 * i] = string.format('%.17g', results[2 * i])
+end
+return results
+"""
+
+CONSUME_BUCKETS = MIGRATE_BUCKET + """
+local SCALE = 1000000
+local atomic = ARGV[1] == '1'
+local results, states, ttls, order = {}, {}, {}, {}
+local passed = true
+local function load(key, legacy, capacity, now)
+    local values = redis.call('HMGET', key, 't', 'r')
+    if not (values[1] and values[2]) then
+        values = migrate(key, legacy)
+    end
+    if values then
+        return {tonumber(values[1]) / SCALE, tonumber(values[2]) / SCALE}
+    end
+    return {capacity, now}
+end
+-- two keys per request: the bucket and its legacy key
+local size = #KEYS / 2
+for i = 1, size do
+    local key, legacy = KEYS[2 * i - 1], KEYS[2 * i]
+    local at = 2 + (i - 1) * 5
+    local capacity, rate = tonumber(ARGV[at]), tonumber(ARGV[at + 1])
+    local now, cost = tonumber(ARGV[at + 2]), tonumber(ARGV[at + 3])
+    local state = states[key]
+    if not state then
+        state = load(key, legacy, capacity, now)
+        states[key] = state
+        order[#order + 1] = key
+    end
+    state[1] = math.min(capacity, state[1] + math.max(0, now - state[2]) * rate)
+    state[2] = now
+    local allowed = state[1] >= cost
+    if allowed then
+        state[1] = state[1] - cost
+    else
+        passed = false
+    end
+    ttls[key] = ARGV[at + 4]
+    results[2 * i - 1] = allowed and 1 or 0
+    results[2 * i] = state[1]
+end
+if atomic and not passed then
+    for i = 1, size do
+        local at = 2 + (i - 1) * 5
+        if results[2 * i - 1] == 1 then
+            results[2 * i - 1] = 0
+            results[2 * i] = results[2 * i] + tonumber(ARGV[at + 3])
+        end
+    end
+else
+    for _, key in ipairs(order) do
+        redis.call('HSET', key, 't', string.format('%.0f', states[key][1] * SCALE),
+            'r', string.format('%.0f', states[key][2] * SCALE))
+        redis.call('EXPIRE', key, ttls[key])
+    end
+end
+for i = 1, size do
+    results[2 * i] = string.format('%.17g', results[2 * i])
+end
+return results
+"""
+
+# Sliding window counters kept in one hash per key and window length: 'i' is the index
+# of the current window, 'c' and 'p' the counts of the current and previous window. A
+# hash three fields small stays listpack encoded, and moving to the next window rewrites
+# the fields instead of creating a key. Requests from nodes whose clock is behind the
+# stored index never move it back. ARGV per request: the current window index, weight,
+# limit, cost and ttl.
+CONSUME_WINDOW_HASHES = """
+local atomic = ARGV[1] == '1'
+local results, states, order = {}, {}, {}
+local passed = true
+for i, key in ipairs(KEYS) do
+    local at = 2 + (i - 1) * 5
+    local window, weight = tonumber(ARGV[at]), tonumber(ARGV[at + 1])
+    local limit, cost = tonumber(ARGV[at + 2]), tonumber(ARGV[at + 3])
+    local state = states[key]
+    if not state then
+        -- stored index, current count, previous count, charged, ttl
+        local stored = redis.call('HMGET', key, 'i', 'c', 'p')
+        state = {tonumber(stored[1]), tonumber(stored[2]) or 0, tonumber(stored[3]) or 0}
+        state[4] = false
+        states[key] = state
+        order[#order + 1] = key
+    end
+    local index = state[1]
+    local count, field
+    if index and index > window + 1 then
+        -- far behind the stored windows (clock skew): decided against them, never
+        -- written, so the newer counts survive
+        count = state[3] * weight + state[2]
+    elseif index == window + 1 then
+        -- a node one window behind charges the stored previous window
+        count, field = state[3], 3
+    else
+        if index ~= window then
+            local previous = index == window - 1 and state[2] or 0
+            state[1], state[2], state[3] = window, 0, previous
+        end
+        count, field = state[3] * weight + state[2], 2
+    end
+    local allowed = count + cost <= limit
+    if allowed then
+        count = count + cost
+        if field then
+            state[field] = state[field] + cost
+            state[4], state[5] = true, ARGV[at + 4]
+        end
+    else
+        passed = false
+    end
+    results[2 * i - 1] = allowed and 1 or 0
+    results[2 * i] = limit - count
+end
+if atomic and not passed then
+    for i = 1, #KEYS do
+        local at = 2 + (i - 1) * 5
+        if results[2 * i - 1] == 1 then
+            results[2 * i - 1] = 0
+            results[2 * i] = results[2 * i] + tonumber(ARGV[at + 3])
+        end
+    end
+else
+    for _, key in ipairs(order) do
+        local state = states[key]
+        if state[4] then
+            redis.call('HSET', key, 'i', state[1], 'c', state[2], 'p', state[3])
+            redis.call('EXPIRE', key, state[5])
+        end
+    end
+end
+for i = 1, #KEYS do
+    results[2 * i] = string.format('%.17g', results[2 * i])
+end
+return results
+"""
+
+SCRIPTS = (
+    GET_BUCKET,
+    SET_BUCKET,
+    INCREMENT_WINDOW_HASH,
+    CONSUME_WINDOWS,
+    CONSUME_WINDOW_HASHES,
+    CONSUME_LOGS,
+    CONSUME_BUCKETS,
+)
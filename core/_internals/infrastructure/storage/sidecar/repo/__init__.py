@@ -0,0 +1 @@
+from .sidecar_impl import SidecarStorage
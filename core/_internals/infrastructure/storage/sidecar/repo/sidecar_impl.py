@@ -0,0 +1,44 @@
+from typing import Optional
+
+from .....domain.interfaces.consume_storage import ConsumeStorageInterface
+from .....domain.models import (
+    WindowConsume,
+    LogConsume,
+    BucketConsume,
+    ConsumeResult,
+)
+from ....sidecar import SidecarClient
+from ....sidecar.client import DEFAULT_TIMEOUT
+from ....sidecar.protocol import OP_WINDOWS, OP_LOGS, OP_BUCKETS
+
+
+class SidecarStorage(ConsumeStorageInterface):
+    """Storage living in a `throtty serve` process shared by every service on the host.
+
+    Only the consume operations, which are all the algorithms use, travel over the
+    wire, so it implements the consume interface alone and offers no primitives.
+    """
+
+    def __init__(self, address: str, timeout: Optional[float] = DEFAULT_TIMEOUT):
+        self.client = SidecarClient(address=address, timeout=timeout)
+
+    async def consume_windows(
+        self, requests: list[WindowConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        return await self.client.call(OP_WINDOWS, requests, atomic)
+
+    async def consume_logs(
+        self, requests: list[LogConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        return await self.client.call(OP_LOGS, requests, atomic)
+
+    async def consume_buckets(
+        self, requests: list[BucketConsume], atomic: bool = False
+    ) -> list[ConsumeResult]:
+        return await self.client.call(OP_BUCKETS, requests, atomic)
+
+    async def start(self) -> None:
+        await self.client.connect()
+
+    async def close(self) -> None:
+        await self.client.close()
@@ -1 +1,2 @@
 from .core import ThrottyCore
+from .sync_core import SyncThrottyCore
@@ -1,62 +1,217 @@
-from redis.asyncio import Redis, ConnectionPool
-from typing import Optional, Literal
+from typing import TYPE_CHECKING, Iterable, Optional, Literal, Sequence, Union
 
-from ...._internals.infrastructure.storage.redis import ThrottyRedis
-from ...._internals.infrastructure.storage.in_mem import InMemStorage
+from ...._internals.lazy import lazy_imports
+from ...._internals.domain.interfaces.transport import PeerTransport
+from ...._internals.infrastructure.clock import ClockOption, resolve_clock
 from ...._internals.domain.enums import StorageType
-from ...._internals.application.use_cases.rate_limit import CheckRateLimitUC
+from ...._internals.application.use_cases.rate_limit import CheckRateLimitUC, BatchItem
 from ...._internals.domain.exceptions.exception import (
     RedisError,
 )
 
+if TYPE_CHECKING:
+    from redis.asyncio import Redis, ConnectionPool, RedisCluster
+    from ...._internals.infrastructure.storage.breaker import CircuitBreakerStorage
+    from ...._internals.infrastructure.storage.redis import ThrottyRedis
+    from ...._internals.infrastructure.storage.redis.keys import RedisKeys
+
+# the redis client and the storages load when an engine selects them
+__getattr__ = _load = lazy_imports(
+    __name__,
+    {
+        "Redis": "redis.asyncio",
+        "RedisCluster": "redis.asyncio",
+        "ConnectionPool": "redis.asyncio",
+        "ThrottyRedis": "..storage.redis",
+        "RedisStorage": "..storage.redis",
+        "InMemStorage": "..storage.in_mem",
+        "HybridStorage": "..storage.hybrid",
+        "CircuitBreakerStorage": "..storage.breaker",
+        "PeerStorage": "..storage.peer",
+        "SidecarStorage": "..storage.sidecar",
+    },
+)
+
 
 class ThrottyCore:
     _storage: StorageType = None
     _storage_instance = None
+    _backend = None
+    breaker: Optional["CircuitBreakerStorage"] = None
 
     def __init__(
         self,
-        redis: Optional[Redis] = None,
-        redis_pool: Optional[ConnectionPool] = None,
-        redis_dsn: Optional[str] = None,
+        redis: Optional[Union["Redis", "RedisCluster"]] = None,
+        redis_pool: Optional["ConnectionPool"] = None,
+        redis_dsn: Optional[Union[str, Sequence[str]]] = None,
         max_connections: Optional[int] = 10,
         algorithm: Optional[
             Literal["slidingwindow_counter", "slidingwindow_log", "token_bucket"]
         ] = "slidingwindow_counter",
+        *,
+        redis_cluster: bool = False,
+        hybrid: bool = False,
+        flush_interval: float = 0.1,
+        max_staleness: float = 1.0,
+        circuit_breaker: bool = False,
+        call_timeout: float = 0.05,
+        error_threshold: float = 0.5,
+        reset_timeout: float = 5.0,
+        fallback_divisor: int = 1,
+        peer_transport: Optional[PeerTransport] = None,
+        sidecar: Optional[str] = None,
+        clock: Optional[ClockOption] = None,
+        redis_keys: Optional["RedisKeys"] = None,
+        stagger_windows: bool = False,
+        retry_jitter: int = 0,
     ):
         if redis and redis_dsn and redis_pool:
             raise RedisError(
                 message="Cannot initiate internal redis if external redis is also provided. Choose only 1 between dsn, pool, or redis"
             )
+        if circuit_breaker and (
+            hybrid
+            or sidecar is not None
+            or peer_transport is not None
+            or not (redis or redis_pool or redis_dsn)
+        ):
+            # only calls made to Redis on the request path are guarded
+            raise ValueError(
+                "circuit_breaker=True needs a Redis storage without hybrid, peer or sidecar"
+            )
+        if hybrid and redis_dsn and not isinstance(redis_dsn, str):
+            raise ValueError(
+                "Hybrid storage needs a single Redis server or a Redis Cluster"
+            )
         if redis_dsn:
             self._storage = StorageType.redis
-            self._storage_instance = ThrottyRedis(
-                dsn=redis_dsn, max_connections=max_connections
+            self._storage_instance = _load("ThrottyRedis")(
+                dsn=redis_dsn, max_connections=max_connections, cluster=redis_cluster
             )
         if redis:
-            if not isinstance(redis, Redis):
+            Redis, RedisCluster = _load("Redis"), _load("RedisCluster")
+            if not isinstance(redis, (Redis, RedisCluster)):
                 raise TypeError(f"Expected type of {type(Redis)}. Got {type(redis)}")
             self._storage = StorageType.redis
-            self._storage_instance = ThrottyRedis(
+            self._storage_instance = _load("ThrottyRedis")(
                 redis=redis, max_connections=max_connections
             )
         if redis_pool:
+            ConnectionPool = _load("ConnectionPool")
             if not isinstance(redis_pool, ConnectionPool):
                 raise TypeError(
                     f"Expected type of {type(ConnectionPool)}. Got {type(redis_pool)}"
                 )
             self._storage = StorageType.redis
-            self._storage_instance = ThrottyRedis(
+            self._storage_instance = _load("ThrottyRedis")(
                 pool=redis_pool, max_connections=max_connections
             )
-        if not self._storage and not self._storage_instance:
+        if sidecar is not None:
+            if self._storage or hybrid or peer_transport is not None:
+                raise ValueError("A sidecar cannot be combined with another storage")
+            self._storage = StorageType.sidecar
+            self._storage_instance = _load("SidecarStorage")(address=sidecar)
+            self._backend = self._storage_instance
+        elif peer_transport is not None:
+            if self._storage or hybrid:
+                raise ValueError(
+                    "Peer synchronized storage cannot be combined with redis storage"
+                )
+            self._storage = StorageType.peer
+            self._storage_instance = _load("PeerStorage")(
+                transport=peer_transport, sync_interval=flush_interval
+            )
+            self._backend = self._storage_instance
+        elif not self._storage and not self._storage_instance:
+            if hybrid:
+                raise RedisError(
+                    message="Hybrid storage requires a redis connection. Provide one of dsn, pool, or redis"
+                )
             self._storage = StorageType.in_mem
-            self._storage_instance = InMemStorage()
-        self.flow = CheckRateLimitUC(storage=self._storage_instance, algo=algorithm)
+            self._storage_instance = _load("InMemStorage")()
+            self._backend = self._storage_instance
+        elif hybrid:
+            self._storage = StorageType.hybrid
+            self._backend = _load("HybridStorage")(
+                redis=self._storage_instance,
+                flush_interval=flush_interval,
+                max_staleness=max_staleness,
+                keys=redis_keys,
+            )
+        else:
+            self._backend = _load("RedisStorage")(
+                redis=self._storage_instance, keys=redis_keys
+            )
+            if circuit_breaker:
+                self.breaker = _load("CircuitBreakerStorage")(
+                    storage=self._backend,
+                    timeout=call_timeout,
+                    error_threshold=error_threshold,
+                    reset_timeout=reset_timeout,
+                    fallback_divisor=fallback_divisor,
+                )
+                self._backend = self.breaker
+        redis_client = None
+        if clock == "redis" and self._storage in (
+            StorageType.redis,
+            StorageType.hybrid,
+        ):
+            redis_client = self._storage_instance.redis
+        self.clock = resolve_clock(clock, redis=redis_client)
+        self.flow = CheckRateLimitUC(
+            storage=self._backend,
+            algo=algorithm,
+            clock=self.clock,
+            stagger=stagger_windows,
+            retry_jitter=retry_jitter,
+        )
+        self.algorithm = algorithm
+        self.stagger_windows = stagger_windows
+        self._decisions = 0
+        self._rejected = 0
+
+    @property
+    def backend(self):
+        return self._backend
+
+    @property
+    def redis(self) -> Optional["ThrottyRedis"]:
+        if self._storage in (StorageType.redis, StorageType.hybrid):
+            return self._storage_instance
+        return None
+
+    async def execute(self, key: str, limit: int, window: int, cost: int = 1):
+        result = await self.flow.execute(key=key, limit=limit, window=window, cost=cost)
+        self._decisions += 1
+        if not result.allowed:
+            self._rejected += 1
+        return result
+
+    async def execute_many(self, requests: Iterable[BatchItem], atomic: bool = False):
+        results = await self.flow.execute_many(requests=requests, atomic=atomic)
+        self._decisions += len(results)
+        self._rejected += sum(not result.allowed for result in results)
+        return results
+
+    def metrics(self) -> dict:
+        metrics = {
+            "storage": self._storage.value,
+            "algorithm": self.algorithm,
+            "decisions": self._decisions,
+            "rejected": self._rejected,
+        }
+        if self.breaker is not None:
+            metrics["breaker"] = self.breaker.metrics()
+        return metrics
 
-    async def execute(self, key: str, limit: int, window: int):
-        return await self.flow.execute(key=key, limit=limit, window=window)
+    async def start(self, connections: Optional[int] = None) -> None:
+        if self._storage in (StorageType.redis, StorageType.hybrid):
+            await self._storage_instance.warm_up(connections)
+        await self._backend.start()
+        await self.clock.start()
 
     async def close(self) -> None:
-        if self._storage == StorageType.redis:
+        if self._storage in (StorageType.hybrid, StorageType.peer, StorageType.sidecar):
+            await self._backend.close()
+        if self._storage in (StorageType.redis, StorageType.hybrid):
             await self._storage_instance.close_redis()
@@ -0,0 +1,129 @@
+import threading
+from typing import TYPE_CHECKING, Iterable, Optional, Literal, Union
+
+from ...._internals.lazy import lazy_imports
+from ...._internals.domain.interfaces.sync_storage import SyncStorageInterface
+from ...._internals.domain.enums import StorageType
+from ...._internals.infrastructure.clock import ClockOption, resolve_clock
+from ...._internals.application.use_cases.rate_limit import (
+    CheckRateLimitSyncUC,
+    BatchItem,
+)
+from ...._internals.domain.exceptions.exception import (
+    RedisError,
+)
+
+if TYPE_CHECKING:
+    from redis import Redis, RedisCluster
+    from ...._internals.infrastructure.storage.redis.keys import RedisKeys
+
+__getattr__ = _load = lazy_imports(
+    __name__,
+    {
+        "Redis": "redis",
+        "RedisCluster": "redis",
+        "SyncRedisStorage": "..storage.redis",
+        "SyncInMemStorage": "..storage.in_mem",
+    },
+)
+
+
+class SyncThrottyCore:
+    _storage: StorageType = None
+    _backend: SyncStorageInterface = None
+
+    def __init__(
+        self,
+        redis: Optional[Union["Redis", "RedisCluster"]] = None,
+        redis_dsn: Optional[str] = None,
+        max_connections: Optional[int] = 10,
+        algorithm: Optional[
+            Literal["slidingwindow_counter", "slidingwindow_log", "token_bucket"]
+        ] = "slidingwindow_counter",
+        *,
+        redis_cluster: bool = False,
+        stripes: int = 16,
+        clock: Optional[ClockOption] = None,
+        redis_keys: Optional["RedisKeys"] = None,
+        stagger_windows: bool = False,
+        retry_jitter: int = 0,
+    ):
+        if redis is not None and redis_dsn:
+            raise RedisError(
+                message="Cannot initiate internal redis if external redis is also provided. Choose only 1 between dsn or redis"
+            )
+        if redis is not None:
+            Redis, RedisCluster = _load("Redis"), _load("RedisCluster")
+            if not isinstance(redis, (Redis, RedisCluster)):
+                raise TypeError(
+                    f"Expected a blocking redis client ({Redis}). Got {type(redis)}"
+                )
+            self._storage = StorageType.redis
+            self._backend = _load("SyncRedisStorage")(redis=redis, keys=redis_keys)
+        elif redis_dsn:
+            if not isinstance(redis_dsn, str):
+                raise ValueError(
+                    "Sharding over several Redis servers needs the asyncio engine"
+                )
+            client_class = _load("RedisCluster" if redis_cluster else "Redis")
+            client = client_class.from_url(
+                redis_dsn,
+                max_connections=max_connections,
+                socket_connect_timeout=5,
+                socket_keepalive=True,
+            )
+            self._storage = StorageType.redis
+            self._backend = _load("SyncRedisStorage")(
+                redis=client, owns_connection=True, keys=redis_keys
+            )
+        else:
+            self._storage = StorageType.in_mem
+            self._backend = _load("SyncInMemStorage")(stripes=stripes)
+        redis_client = None
+        if clock == "redis" and self._storage == StorageType.redis:
+            redis_client = self._backend.redis
+        self.clock = resolve_clock(clock, redis=redis_client)
+        self.flow = CheckRateLimitSyncUC(
+            storage=self._backend,
+            algo=algorithm,
+            clock=self.clock,
+            stagger=stagger_windows,
+            retry_jitter=retry_jitter,
+        )
+        self.algorithm = algorithm
+        self.stagger_windows = stagger_windows
+        self._decisions = 0
+        self._rejected = 0
+        # WSGI servers call in from many threads and `+=` is not atomic
+        self._metrics_lock = threading.Lock()
+
+    @property
+    def backend(self) -> SyncStorageInterface:
+        return self._backend
+
+    def execute(self, key: str, limit: int, window: int, cost: int = 1):
+        result = self.flow.execute(key=key, limit=limit, window=window, cost=cost)
+        with self._metrics_lock:
+            self._decisions += 1
+            if not result.allowed:
+                self._rejected += 1
+        return result
+
+    def execute_many(self, requests: Iterable[BatchItem], atomic: bool = False):
+        results = self.flow.execute_many(requests=requests, atomic=atomic)
+        rejected = sum(not result.allowed for result in results)
+        with self._metrics_lock:
+            self._decisions += len(results)
+            self._rejected += rejected
+        return results
+
+    def metrics(self) -> dict:
+        return {
+            "storage": self._storage.value,
+            "algorithm": self.algorithm,
+            "decisions": self._decisions,
+            "rejected": self._rejected,
+        }
+
+    def close(self) -> None:
+        self._backend.close()
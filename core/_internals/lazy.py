@@ -0,0 +1,25 @@
+import sys
+from importlib import import_module
+from typing import Any, Callable
+
+
+def lazy_imports(module_name: str, imports: dict[str, str]) -> Callable[[str], Any]:
+    """Build the `__getattr__` of a module importing `imports` (name -> module) on use.
+
+    Loaded values are stored in the module namespace, so later lookups are plain
+    attribute reads and patching them in tests works as with a regular import. The
+    module code itself gets them by calling the returned function.
+    """
+    module = sys.modules[module_name]
+
+    def load(name: str) -> Any:
+        namespace = vars(module)
+        if name in namespace:
+            return namespace[name]
+        if name not in imports:
+            raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+        value = getattr(import_module(imports[name], module.__package__), name)
+        setattr(module, name, value)
+        return value
+
+    return load
@@ -0,0 +1,151 @@
+import argparse
+import asyncio
+import json
+import logging
+import signal
+from typing import Optional, Sequence
+
+from .limiter import Throtty
+from ._internals.infrastructure.throtty import ThrottyCore
+from ._internals.infrastructure.sidecar import SidecarServer
+from ._internals.infrastructure.replay import read_access_log, ReplayReport
+
+logger = logging.getLogger("throtty")
+
+
+async def serve(args: argparse.Namespace) -> None:
+    engine = ThrottyCore(
+        redis_dsn=args.redis_dsn,
+        max_connections=args.max_connections,
+        redis_cluster=args.redis_cluster,
+        hybrid=args.hybrid,
+    )
+    address = f"tcp://{args.tcp}" if args.tcp else f"unix://{args.unix}"
+    server = SidecarServer(storage=engine.backend, address=address)
+    await server.start()
+    logger.info("throtty sidecar listening on %s", address)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    await stop.wait()
+
+    await server.close()
+    await engine.close()
+
+
+def simulate(args: argparse.Namespace) -> ReplayReport:
+    limiter = Throtty()
+    for spec in args.rule:
+        path, _, rule = spec.rpartition("=")
+        if not path:
+            raise SystemExit(f"invalid rule {spec!r}, expected PATH=LIMIT/WINDOW")
+        limiter.rule(path, rule, key_func=None)
+    records = read_access_log(
+        args.log,
+        format=args.format,
+        time_field=args.time_field,
+        path_field=args.path_field,
+        key_field=args.key_field,
+    )
+    report = limiter.simulate(
+        records, algorithm=args.algorithm, resolution=args.resolution
+    )
+    if args.json:
+        print(json.dumps(report_dict(report, args.top), indent=2))
+    else:
+        print_report(report, args.top)
+    return report
+
+
+def report_dict(report: ReplayReport, top: int) -> dict:
+    return {
+        "records": report.records,
+        "unmatched": report.unmatched,
+        "records_per_second": round(report.records_per_second),
+        "rules": [
+            {
+                "path": rule.path,
+                "limit": rule.limit,
+                "window": rule.window,
+                "requests": rule.requests,
+                "rejected": rule.rejected,
+                "rejection_rate": rule.rejection_rate,
+                "keys": len(rule.keys),
+                "key_percentiles": rule.key_percentiles(),
+                "top_keys": rule.top_keys(top),
+            }
+            for rule in report.rules
+        ],
+    }
+
+
+def print_report(report: ReplayReport, top: int) -> None:
+    print(
+        f"{report.records:,} records, {report.unmatched:,} unmatched, "
+        f"{report.records_per_second:,.0f} records/s"
+    )
+    for rule in report.rules:
+        print(
+            f"\n{rule.path} {rule.limit}/{rule.window}s: {rule.requests:,} requests, "
+            f"{rule.rejected:,} rejected ({rule.rejection_rate:.2%}), "
+            f"{len(rule.keys):,} keys"
+        )
+        for name, values in rule.key_percentiles().items():
+            row = "  ".join(f"p{p:g} {value:,}" for p, value in values.items())
+            print(f"  {name + ' per key':<20} {row}")
+        for key, requests, rejected in rule.top_keys(top):
+            print(f"  {key:<40} {rejected:,}/{requests:,} rejected")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="throtty")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser(
+        "serve", help="share one rate limiter between the processes of a host"
+    )
+    listen = serve_parser.add_mutually_exclusive_group()
+    listen.add_argument("--unix", default="/tmp/throtty.sock", help="socket path")
+    listen.add_argument("--tcp", help="host:port to listen on")
+    serve_parser.add_argument("--redis-dsn", help="keep counters in Redis")
+    serve_parser.add_argument("--redis-cluster", action="store_true")
+    serve_parser.add_argument("--hybrid", action="store_true")
+    serve_parser.add_argument("--max-connections", type=int, default=10)
+    serve_parser.add_argument("--log-level", default="INFO")
+
+    simulate_parser = commands.add_parser(
+        "simulate", help="replay an access log against rate limit rules, offline"
+    )
+    simulate_parser.add_argument("log", help="CSV or JSON lines log, may be gzipped")
+    simulate_parser.add_argument(
+        "--rule",
+        action="append",
+        required=True,
+        help="PATH=LIMIT/WINDOW, e.g. '/api/*=100/60', repeatable",
+    )
+    simulate_parser.add_argument(
+        "--algorithm",
+        default="slidingwindow_counter",
+        choices=["slidingwindow_counter", "slidingwindow_log", "token_bucket"],
+    )
+    simulate_parser.add_argument("--format", choices=["csv", "jsonl"])
+    simulate_parser.add_argument("--time-field", default="timestamp")
+    simulate_parser.add_argument("--path-field", default="path")
+    simulate_parser.add_argument("--key-field", default="ip")
+    simulate_parser.add_argument("--resolution", type=float, default=0.01)
+    simulate_parser.add_argument("--top", type=int, default=10)
+    simulate_parser.add_argument("--json", action="store_true")
+    simulate_parser.add_argument("--log-level", default="WARNING")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level)
+    if args.command == "serve":
+        asyncio.run(serve(args))
+    elif args.command == "simulate":
+        simulate(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# ruff: noqa
+
+import asyncio
+import pytest
+from redis.exceptions import ConnectionError
+
+from core._internals.infrastructure.storage.breaker import CircuitBreakerStorage
+from core._internals.infrastructure.storage.in_mem import InMemStorage
+from core._internals.domain.enums import CircuitState
+from core._internals.domain.models import WindowConsume, BucketConsume
+
+
+class MockRemoteStorage(InMemStorage):
+    def __init__(self):
+        super().__init__()
+        self.down = False
+        self.delay = 0.0
+        self.calls = 0
+
+    async def consume_windows(self, requests, atomic=False):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.down:
+            raise ConnectionError("redis is down")
+        return await super().consume_windows(requests, atomic)
+
+
+def window_request(limit=10):
+    return WindowConsume(
+        key="ip:1",
+        current_window=2,
+        previous_window=1,
+        weight=0.0,
+        limit=limit,
+        cost=1,
+        ttl=60,
+    )
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_on_error_rate_and_fails_open():
+    remote = MockRemoteStorage()
+    transitions = []
+    breaker = CircuitBreakerStorage(
+        storage=remote,
+        min_calls=4,
+        on_state_change=lambda old, new: transitions.append((old, new)),
+    )
+
+    for _ in range(2):
+        await breaker.consume_windows([window_request()])
+    remote.down = True
+    for _ in range(2):
+        [result] = await breaker.consume_windows([window_request()])
+        assert result.allowed
+
+    assert breaker.state == CircuitState.open
+    assert transitions == [(CircuitState.closed, CircuitState.open)]
+
+    calls = remote.calls
+    await breaker.consume_windows([window_request()])
+    assert remote.calls == calls
+    assert breaker.metrics()["transitions"] == {"closed->open": 1}
+    assert breaker.metrics()["failures"] == 2
+
+
+@pytest.mark.asyncio
+async def test_breaker_times_out_slow_calls():
+    remote = MockRemoteStorage()
+    remote.delay = 1.0
+    breaker = CircuitBreakerStorage(storage=remote, timeout=0.01, min_calls=1)
+
+    [result] = await breaker.consume_windows([window_request()])
+
+    assert result.allowed
+    assert breaker.state == CircuitState.open
+    assert breaker.metrics()["timeouts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_breaker_half_open_probe_closes_circuit():
+    remote = MockRemoteStorage()
+    remote.down = True
+    breaker = CircuitBreakerStorage(storage=remote, min_calls=1, reset_timeout=0.0)
+
+    await breaker.consume_windows([window_request()])
+    assert breaker.state == CircuitState.open
+
+    # the probe fails and opens the circuit again
+    await breaker.consume_windows([window_request()])
+    assert breaker.state == CircuitState.open
+
+    remote.down = False
+    await breaker.consume_windows([window_request()])
+    assert breaker.state == CircuitState.closed
+    assert breaker.metrics()["transitions"] == {
+        "closed->open": 1,
+        "open->half-open": 2,
+        "half-open->open": 1,
+        "half-open->closed": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_breaker_fallback_enforces_share_of_limit():
+    remote = MockRemoteStorage()
+    breaker = CircuitBreakerStorage(
+        storage=remote, min_calls=1, reset_timeout=60, fallback_divisor=4
+    )
+    breaker.state = CircuitState.open
+    breaker._opened_at = float("inf")
+
+    results = [
+        (await breaker.consume_windows([window_request(limit=10)]))[0].allowed
+        for _ in range(3)
+    ]
+    [bucket] = await breaker.consume_buckets(
+        [
+            BucketConsume(
+                key="ip:1", capacity=8, refill_rate=1.0, now=1.0, cost=3, ttl=60
+            )
+        ]
+    )
+
+    assert results == [True, True, False]
+    assert not bucket.allowed
+    assert remote.calls == 0
+
+
+def test_breaker_invalid_options():
+    with pytest.raises(ValueError):
+        CircuitBreakerStorage(storage=InMemStorage(), timeout=0)
+    with pytest.raises(ValueError):
+        CircuitBreakerStorage(storage=InMemStorage(), fallback_divisor=0)
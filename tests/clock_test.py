@@ -0,0 +1,126 @@
+# ruff: noqa
+
+import asyncio
+import pytest
+
+from core._internals.application.use_cases.rate_limit import (
+    CheckRateLimitUC,
+    CheckRateLimitSyncUC,
+)
+from core._internals.domain.services.clock import (
+    SystemClock,
+    MonotonicClock,
+    CoarseClock,
+    ManualClock,
+)
+from core._internals.infrastructure.clock import RedisClock, resolve_clock
+from core._internals.infrastructure.storage import InMemStorage, SyncInMemStorage
+from core._internals.infrastructure.throtty import ThrottyCore
+import core._internals.domain.services.clock as clock_mod
+import core._internals.infrastructure.clock.redis_clock as redis_clock_mod
+
+
+class CountingClock(ManualClock):
+    def __init__(self):
+        super().__init__(start=1000.0)
+        self.reads = 0
+
+    def now(self):
+        self.reads += 1
+        return super().now()
+
+
+class MockAsyncRedisTime:
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+
+    async def time(self):
+        self.calls += 1
+        return self.reply
+
+
+@pytest.mark.asyncio
+async def test_manual_clock_drives_token_bucket():
+    clock = ManualClock(start=1000.0)
+    uc = CheckRateLimitUC(storage=InMemStorage(), algo="token_bucket", clock=clock)
+
+    assert [(await uc.execute("k", 2, 10)).allowed for _ in range(3)] == [
+        True,
+        True,
+        False,
+    ]
+    clock.advance(5)
+    assert (await uc.execute("k", 2, 10)).allowed
+    assert not (await uc.execute("k", 2, 10)).allowed
+
+
+def test_manual_clock_drives_sync_window_counter():
+    clock = ManualClock(start=600.0)
+    uc = CheckRateLimitSyncUC(storage=SyncInMemStorage(), clock=clock)
+
+    assert uc.execute("k", 1, 60).allowed
+    assert not uc.execute("k", 1, 60).allowed
+    result = uc.execute("k", 1, 60)
+    assert result.reset_at == 660
+    clock.set(720.0)
+    assert uc.execute("k", 1, 60).allowed
+
+
+def test_monotonic_clock_ignores_wall_clock_steps(monkeypatch):
+    clock = MonotonicClock()
+    before = clock.now()
+    monkeypatch.setattr(clock_mod, "time", lambda: 0.0)
+
+    assert clock.now() >= before
+    assert abs(SystemClock().now()) < 1
+
+
+@pytest.mark.asyncio
+async def test_coarse_clock_reads_once_per_tick():
+    source = CountingClock()
+    clock = CoarseClock(source)
+
+    assert clock.now() == clock.now() == 1000.0
+    assert source.reads == 1
+    source.advance(1)
+    await asyncio.sleep(0)
+    assert clock.now() == 1001.0
+    assert source.reads == 2
+
+
+def test_coarse_clock_without_loop_reads_source():
+    source = CountingClock()
+    clock = CoarseClock(source)
+
+    clock.now()
+    clock.now()
+    assert source.reads == 2
+
+
+@pytest.mark.asyncio
+async def test_redis_clock_follows_server_time(monkeypatch):
+    monkeypatch.setattr(redis_clock_mod, "AsyncRedis", MockAsyncRedisTime)
+    monkeypatch.setattr(redis_clock_mod, "monotonic", lambda: 50.0)
+    redis = MockAsyncRedisTime(reply=(2_000_000_000, 250_000))
+    clock = RedisClock(redis, sync_interval=5.0)
+
+    clock.now()
+    await asyncio.sleep(0)
+
+    assert redis.calls == 1
+    assert clock.now() == 2_000_000_000.25
+    assert redis.calls == 1
+
+
+def test_resolve_clock():
+    assert isinstance(resolve_clock(None), SystemClock)
+    assert isinstance(resolve_clock("coarse"), CoarseClock)
+    manual = ManualClock()
+    assert resolve_clock(manual) is manual
+    with pytest.raises(ValueError):
+        resolve_clock("redis")
+    with pytest.raises(ValueError):
+        resolve_clock("sundial")
+    with pytest.raises(ValueError):
+        ThrottyCore(clock="redis")
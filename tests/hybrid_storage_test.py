@@ -0,0 +1,273 @@
+# ruff: noqa
+
+import asyncio
+import logging
+
+import pytest
+from contextlib import asynccontextmanager
+from redis.exceptions import ConnectionError
+
+from core._internals.infrastructure.storage.hybrid import HybridStorage
+from core._internals.infrastructure.storage.redis.keys import RedisKeys
+from core._internals.infrastructure.storage.redis.scripts import (
+    SET_BUCKET,
+    MERGE_BUCKET,
+)
+from core._internals.domain.models import BucketConsume, BucketState
+
+
+class MockPipeline:
+    def __init__(self, server):
+        self.server = server
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self):
+        if self.server.down:
+            raise ConnectionError("redis is down")
+        self.server.executed += 1
+        return [
+            getattr(self.server, name)(*args, **kwargs)
+            for name, args, kwargs in self.commands
+        ]
+
+
+class MockRedisServer:
+    def __init__(self):
+        self.data = {}
+        self.down = False
+        self.executed = 0
+
+    def incrby(self, key, amount):
+        self.data[key] = self.data.get(key, 0) + amount
+        return self.data[key]
+
+    def expire(self, key, ttl):
+        return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    def eval(self, script, numkeys, *keys_and_args):
+        key, args = keys_and_args[0], keys_and_args[numkeys:]
+        if script == SET_BUCKET:
+            self.data[key] = {"t": args[0], "r": args[1]}
+            return 1
+        state = self.data.get(key)
+        if script == MERGE_BUCKET:
+            capacity, rate, now, spent = (float(arg) for arg in args[:4])
+            tokens, refill = capacity, now
+            if state:
+                tokens, refill = state["t"] / 1e6, state["r"] / 1e6
+                tokens = min(capacity, tokens + max(0, now - refill) * rate)
+                refill = max(refill, now)
+            state = self.data[key] = {
+                "t": round(max(0, tokens - spent) * 1e6),
+                "r": round(refill * 1e6),
+            }
+        return [state["t"], state["r"]] if state else None
+
+    def zadd(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    def zremrangebyscore(self, key, low, high):
+        high = float(str(high).lstrip("("))
+        zset = self.data.get(key, {})
+        for member in [m for m, score in zset.items() if score < high]:
+            del zset[member]
+
+    def zrangebyscore(self, key, low, high, withscores=False):
+        return sorted(
+            (
+                (member.encode(), score)
+                for member, score in self.data.get(key, {}).items()
+            ),
+            key=lambda item: item[1],
+        )
+
+    def pipeline(self, transaction=True):
+        return MockPipeline(self)
+
+
+class MockThrottyRedis:
+    def __init__(self, server):
+        self.server = server
+
+    @asynccontextmanager
+    async def get_redis(self):
+        yield self.server
+
+
+@pytest.mark.asyncio
+async def test_hybrid_window_deltas_are_batched():
+    server = MockRedisServer()
+    storage = HybridStorage(
+        redis=MockThrottyRedis(server), flush_interval=60, max_staleness=60
+    )
+
+    for _ in range(5):
+        await storage.increment_windows(key="ip:1", window=10, ttl=120)
+
+    assert server.data == {}
+    await storage.flush()
+
+    assert server.executed == 1
+    assert server.data["{ip:1}:w:10"] == 5
+    data = await storage.get_window_counts(
+        key="ip:1", current_window=10, previous_window=9
+    )
+    assert data.current_count == 5
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_hybrid_nodes_converge_on_global_count():
+    server = MockRedisServer()
+    node_a = HybridStorage(
+        redis=MockThrottyRedis(server), flush_interval=60, max_staleness=60
+    )
+    node_b = HybridStorage(
+        redis=MockThrottyRedis(server), flush_interval=60, max_staleness=60
+    )
+
+    await node_a.increment_windows(key="ip:1", window=10, ttl=120)
+    await node_a.increment_windows(key="ip:1", window=10, ttl=120)
+    await node_b.increment_windows(key="ip:1", window=10, ttl=120)
+    await node_a.flush()
+    await node_b.flush()
+    await node_a.flush()
+
+    count_b = await node_b.increment_windows(key="ip:1", window=10, ttl=120)
+
+    assert server.data["{ip:1}:w:10"] == 3
+    assert count_b == 4
+    await node_a.close()
+    await node_b.close()
+
+
+@pytest.mark.asyncio
+async def test_hybrid_survives_redis_outage():
+    server = MockRedisServer()
+    storage = HybridStorage(
+        redis=MockThrottyRedis(server), flush_interval=60, max_staleness=60
+    )
+    server.down = True
+
+    await storage.increment_windows(key="ip:1", window=10, ttl=120)
+    with pytest.raises(ConnectionError):
+        await storage.flush()
+    count = await storage.increment_windows(key="ip:1", window=10, ttl=120)
+
+    assert count == 2
+    server.down = False
+    await storage.close()
+    assert server.data["{ip:1}:w:10"] == 2
+
+
+@pytest.mark.asyncio
+async def test_hybrid_timestamps_and_buckets_are_synced():
+    server = MockRedisServer()
+    storage = HybridStorage(
+        redis=MockThrottyRedis(server), flush_interval=60, max_staleness=60
+    )
+
+    await storage.add_timestamp(key="log", timestamp=100.0, ttl=60)
+    await storage.add_timestamp(key="log", timestamp=101.0, ttl=60)
+    await storage.update_bucket_state(
+        key="bucket", state=BucketState(latest_refill=100.0, tokens=3.0), ttl=60
+    )
+    await storage.flush()
+
+    assert await storage.count_in_range(key="log", start=99.0, end=102.0) == 2
+    assert len(server.data["{log}:log"]) == 2
+    assert server.data["{bucket}:bucket"] == {"t": 3_000_000, "r": 100_000_000}
+    state = await storage.get_bucket_state(key="bucket")
+    assert state.tokens == 3.0
+    await storage.close()
+
+
+def test_hybrid_invalid_intervals():
+    with pytest.raises(ValueError):
+        HybridStorage(redis=None, flush_interval=0)
+    with pytest.raises(ValueError):
+        HybridStorage(redis=None, flush_interval=1.0, max_staleness=0.5)
+
+
+def test_hybrid_rejects_hashed_windows():
+    with pytest.raises(ValueError):
+        HybridStorage(redis=None, keys=RedisKeys(hash_windows=True))
+
+
+@pytest.mark.asyncio
+async def test_hybrid_buckets_converge_across_nodes():
+    server = MockRedisServer()
+    node_a, node_b = (
+        HybridStorage(
+            redis=MockThrottyRedis(server), flush_interval=60, max_staleness=60
+        )
+        for _ in range(2)
+    )
+
+    def take(count):
+        return [
+            BucketConsume(
+                key="ip:1", capacity=10, refill_rate=0.0, now=100.0, cost=1, ttl=60
+            )
+        ] * count
+
+    assert all(r.allowed for r in await node_a.consume_buckets(take(6)))
+    await node_a.flush()
+    assert server.data["{ip:1}:bucket"]["t"] == 4_000_000
+    # b has not seen a's traffic yet and decides from a full bucket
+    assert all(r.allowed for r in await node_b.consume_buckets(take(6)))
+    await node_b.flush()
+    assert server.data["{ip:1}:bucket"]["t"] == 0
+    assert all(r.allowed for r in await node_a.consume_buckets(take(1)))
+    await node_a.flush()
+
+    # both took the other's spending in, instead of overwriting it
+    assert not (await node_a.consume_buckets(take(1)))[0].allowed
+    assert not (await node_b.consume_buckets(take(1)))[0].allowed
+    assert server.data["{ip:1}:bucket"]["t"] == 0
+    await node_a.close()
+    await node_b.close()
+
+
+@pytest.mark.asyncio
+async def test_hybrid_sync_task_survives_unexpected_errors(caplog):
+    server = MockRedisServer()
+    storage = HybridStorage(redis=MockThrottyRedis(server), flush_interval=0.01)
+    calls = []
+
+    async def flush():
+        calls.append(1)
+        if len(calls) == 1:
+            raise KeyError("bad merge")
+
+    storage.flush = flush
+    await storage.start()
+    with caplog.at_level(logging.ERROR):
+        for _ in range(100):
+            if len(calls) >= 3:
+                break
+            await asyncio.sleep(0.01)
+
+    assert len(calls) >= 3
+    assert not storage._task.done()
+    assert "failed unexpectedly" in caplog.text
+    storage._task.cancel()
@@ -0,0 +1,175 @@
+# ruff: noqa
+
+import pytest
+
+from core._internals.infrastructure.storage.in_mem import InMemStorage
+from core._internals.domain.models import (
+    BucketState,
+    RateLimitResult,
+    WindowConsume,
+    BucketConsume,
+)
+from core._internals.application.use_cases.rate_limit import CheckRateLimitUC
+from core._internals.domain.services.clock import ManualClock
+from core._internals.domain.exceptions import RateLimitExceeded
+
+
+@pytest.mark.asyncio
+async def test_window_rollover_keeps_previous_count():
+    storage = InMemStorage()
+
+    for _ in range(3):
+        await storage.increment_windows(key="ip:1", window=100, ttl=120)
+    await storage.increment_windows(key="ip:1", window=101, ttl=120)
+    data = await storage.get_window_counts(
+        key="ip:1", current_window=101, previous_window=100
+    )
+
+    assert data.current_count == 1
+    assert data.previous_count == 3
+
+
+@pytest.mark.asyncio
+async def test_window_gap_resets_previous_count():
+    storage = InMemStorage()
+
+    await storage.increment_windows(key="ip:1", window=100, ttl=120)
+    await storage.increment_windows(key="ip:1", window=105, ttl=120)
+    data = await storage.get_window_counts(
+        key="ip:1", current_window=105, previous_window=104
+    )
+
+    assert data.current_count == 1
+    assert data.previous_count == 0
+
+
+@pytest.mark.asyncio
+async def test_window_sizes_of_one_key_are_separate():
+    storage = InMemStorage()
+
+    await storage.increment_windows(key="ip:1", window=29_000_000, ttl=120)
+    await storage.increment_windows(key="ip:1", window=480_000, ttl=7200)
+    await storage.increment_windows(key="ip:1", window=480_000, ttl=7200)
+
+    minute = await storage.get_window_counts(
+        key="ip:1", current_window=29_000_000, previous_window=28_999_999
+    )
+    hour = await storage.get_window_counts(
+        key="ip:1", current_window=480_000, previous_window=479_999
+    )
+
+    assert minute.current_count == 1
+    assert hour.current_count == 2
+
+
+@pytest.mark.asyncio
+async def test_window_sizes_sharing_a_window_index_are_separate():
+    # at t=30 a 60s and a 3600s window both have index 0
+    uc = CheckRateLimitUC(storage=InMemStorage(), clock=ManualClock(start=30.0))
+
+    minute = [(await uc.execute("k", 100, 60)).allowed for _ in range(3)]
+    hour = [(await uc.execute("k", 3, 3600)).allowed for _ in range(4)]
+
+    assert minute == [True, True, True]
+    assert hour == [True, True, True, False]
+
+
+@pytest.mark.asyncio
+async def test_expired_slots_are_purged_and_reused():
+    storage = InMemStorage()
+
+    await storage.increment_windows(key="ip:1", window=1, ttl=0)
+    await storage.update_bucket_state(
+        key="ip:1", state=BucketState(latest_refill=1.0, tokens=1.0), ttl=0
+    )
+    await storage.add_timestamp(key="ip:1", timestamp=1.0, ttl=0)
+
+    assert await storage.get_bucket_state(key="ip:1") is None
+    assert storage.purge_expired() == 3
+    assert storage._window_slots == {}
+    assert storage._bucket_slots == {}
+
+    await storage.increment_windows(key="ip:2", window=1, ttl=60)
+    assert storage._window_slots == {"ip:2": 0}
+
+
+@pytest.mark.asyncio
+async def test_bucket_state_roundtrip():
+    storage = InMemStorage()
+
+    await storage.update_bucket_state(
+        key="ip:1", state=BucketState(latest_refill=10.5, tokens=4.25), ttl=60
+    )
+
+    assert await storage.get_bucket_state(key="ip:1") == BucketState(
+        latest_refill=10.5, tokens=4.25
+    )
+    assert await storage.get_bucket_state(key="ip:2") is None
+
+
+def test_rate_limit_result_is_slotted():
+    result = RateLimitResult(allowed=False, limit=10, remaining=0, reset_at=1.0)
+
+    assert not hasattr(result, "__dict__")
+    assert result.dump()["limit"] == b"10"
+    with pytest.raises(RateLimitExceeded):
+        result.check()
+
+
+@pytest.mark.asyncio
+async def test_consume_windows_charges_cost():
+    storage = InMemStorage()
+    request = WindowConsume(
+        key="ip:1",
+        current_window=101,
+        previous_window=100,
+        weight=0.5,
+        limit=10,
+        cost=4,
+        ttl=120,
+    )
+    await storage.increment_windows(key="ip:1", window=100, ttl=120, amount=6)
+
+    first, second = await storage.consume_windows([request, request])
+
+    assert first.allowed and first.remaining == 3
+    assert not second.allowed and second.remaining == 3
+
+
+@pytest.mark.asyncio
+async def test_atomic_batch_charges_nothing_when_one_request_fails():
+    storage = InMemStorage()
+    user = BucketConsume(
+        key="user:1", capacity=5, refill_rate=1.0, now=100.0, cost=1, ttl=10
+    )
+    org = BucketConsume(
+        key="org:1", capacity=5, refill_rate=1.0, now=100.0, cost=6, ttl=10
+    )
+
+    results = await storage.consume_buckets([user, org], atomic=True)
+
+    assert [result.allowed for result in results] == [False, False]
+    assert results[0].remaining == 5
+    assert await storage.get_bucket_state(key="user:1") is None
+
+    results = await storage.consume_buckets([user, org], atomic=False)
+
+    assert [result.allowed for result in results] == [True, False]
+    assert (await storage.get_bucket_state(key="user:1")).tokens == 4
+
+
+@pytest.mark.parametrize(
+    "algo", ["slidingwindow_counter", "slidingwindow_log", "token_bucket"]
+)
+@pytest.mark.asyncio
+async def test_execute_many_keeps_request_order(algo):
+    uc = CheckRateLimitUC(storage=InMemStorage(), algo=algo)
+
+    results = await uc.execute_many(
+        [("ip:1", 2, 60), ("ip:2", 5, 60, 5), ("ip:1", 2, 60), ("ip:1", 2, 60)]
+    )
+
+    assert [result.allowed for result in results] == [True, True, True, False]
+    assert [result.limit for result in results] == [2, 5, 2, 2]
+    assert await uc.execute_many([]) == []
+    assert (await uc.execute(key="ip:3", limit=1, window=60)).allowed
@@ -0,0 +1,138 @@
+# ruff: noqa
+
+import pytest
+from unittest.mock import AsyncMock
+
+from core import Key, Throtty
+from core._internals.domain.services.key import KeyExtractor
+
+
+@pytest.fixture
+def throtty():
+    Throtty._instance = None
+    Throtty._initialized = False
+    yield Throtty()
+    Throtty._instance = None
+    Throtty._initialized = False
+
+
+def scope(headers, client=("10.0.0.1", 1234)):
+    return {"type": "http", "path": "/", "client": client, "headers": headers}
+
+
+def test_header_alternatives_fall_back_to_ip():
+    extractor = (
+        Key.header("X-Api-Key", prefix="apikey") | Key.header("x-user")
+    ).compile()
+
+    assert extractor.from_scope(scope([(b"x-api-key", b"abc")])) == "apikey:abc"
+    assert extractor.from_scope(scope([(b"x-api-key", b""), (b"x-user", b"7")])) == (
+        "x-user:7"
+    )
+    assert extractor.from_scope(scope([(b"accept", b"*/*")])) == "ip:10.0.0.1"
+    assert extractor.from_scope({"headers": []}) == "ip:default"
+
+
+def test_keys_are_cached_per_raw_value():
+    extractor = Key.header("x-api-key").compile()
+
+    first = extractor.from_scope(scope([(b"x-api-key", b"ab" + b"c")]))
+    second = extractor.from_scope(scope([(b"x-api-key", b"abc")]))
+
+    assert first == "x-api-key:abc"
+    assert first is second
+
+
+def test_ip_behind_trusted_proxies():
+    extractor = Key.ip(trusted_proxies=["10.0.0.0/8", "192.168.1.1"]).compile()
+    forwarded = [
+        (b"x-forwarded-for", b"6.6.6.6, 1.2.3.4"),
+        (b"x-forwarded-for", b"10.2.0.1"),
+    ]
+
+    assert extractor.from_scope(scope(forwarded)) == "ip:1.2.3.4"
+    assert extractor.from_scope(scope(forwarded, ("8.8.8.8", 1))) == "ip:8.8.8.8"
+    assert extractor.from_scope(scope([(b"x-forwarded-for", b"10.1.1.1")])) == (
+        "ip:10.1.1.1"
+    )
+    assert extractor.from_scope(scope([])) == "ip:10.0.0.1"
+
+
+def test_combined_fields_and_constants():
+    extractor = (
+        Key.header("x-org", prefix="org") + Key.header("x-user", prefix="user")
+        | Key.const("anonymous")
+    ).compile()
+    headers = {"x-org": "acme", "x-user": "42"}
+
+    assert extractor("10.0.0.1", headers) == "org:acme:user:42"
+    assert extractor.from_scope(scope([(b"x-org", b"acme"), (b"x-user", b"42")])) == (
+        "org:acme:user:42"
+    )
+    assert extractor.from_environ({"HTTP_X_ORG": "acme", "HTTP_X_USER": "42"}) == (
+        "org:acme:user:42"
+    )
+    assert extractor("10.0.0.1", {"x-org": "acme"}) == "anonymous"
+
+
+@pytest.mark.asyncio
+async def test_rules_compile_key_specs(throtty):
+    throtty.add_rule("/api/*", limit=1, window=60, key_func=Key.header("x-api-key"))
+    throtty.set_key_extractor(Key.header("x-user", prefix="user"))
+    app = throtty.wrap(AsyncMock())
+
+    async def call(headers):
+        send = AsyncMock()
+        request = scope(headers)
+        request["path"] = "/api/x"
+        await app(request, AsyncMock(), send)
+        return send.call_count == 0
+
+    assert isinstance(throtty.rules[0]["key_func"], KeyExtractor)
+    assert isinstance(throtty.key_extractor, KeyExtractor)
+    assert await call([(b"x-api-key", b"a")])
+    assert not await call([(b"x-api-key", b"a")])
+    assert await call([(b"x-api-key", b"b")])
+    await throtty.engine.close()
+
+
+def test_ip_prefix_aggregation_and_packing():
+    text = Key.ip(ipv4_prefix=24, ipv6_prefix=64).compile()
+    packed = Key.ip(packed=True).compile()
+    both = Key.ip(ipv6_prefix=64, packed=True).compile()
+
+    assert text("203.0.113.77", {}) == "ip:203.0.113.0/24"
+    assert text("2001:db8::1", {}) == text("2001:db8::ffff:2", {}) == "ip:2001:db8::/64"
+    assert packed("203.0.113.77", {}) == packed("::ffff:203.0.113.77", {})
+    assert packed("203.0.113.77", {}) == "ip:4:ywBxTQ"
+    assert (
+        both("2001:db8::1", {}) == both("2001:db8::abcd", {}) == "ip:6/64:IAENuAAAAAA"
+    )
+    assert both("2001:db8:0:1::1", {}) != both("2001:db8::1", {})
+    assert both("testclient", {}) == "ip:testclient"
+    assert len(packed("2001:db8:85a3::8a2e:370:7334", {})) < len(
+        "ip:2001:db8:85a3::8a2e:370:7334"
+    )
+    with pytest.raises(ValueError):
+        Key.ip(ipv6_prefix=129)
+
+
+@pytest.mark.asyncio
+async def test_subnet_shares_one_counter(throtty):
+    throtty.add_rule(
+        "/api/*", limit=2, window=60, key_func=Key.ip(ipv6_prefix=64, packed=True)
+    )
+    app = throtty.wrap(AsyncMock())
+
+    async def call(client):
+        send = AsyncMock()
+        request = scope([], (client, 1))
+        request["path"] = "/api/x"
+        await app(request, AsyncMock(), send)
+        return send.call_count == 0
+
+    assert [
+        await call(client) for client in ("2001:db8::1", "2001:db8::2", "2001:db8::3")
+    ] == [True, True, False]
+    assert await call("2001:db8:0:1::1")
+    await throtty.engine.close()
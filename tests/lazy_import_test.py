@@ -0,0 +1,56 @@
+# ruff: noqa
+
+import subprocess
+import sys
+
+import pytest
+
+import core
+from core._internals.infrastructure import storage
+
+
+def loaded_modules(statement):
+    script = f"{statement}\n" "import sys\n" "print(' '.join(sorted(sys.modules)))\n"
+    output = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    ).stdout
+    return set(output.split())
+
+
+def test_import_leaves_optional_dependencies_unloaded():
+    modules = loaded_modules("import core")
+
+    assert not {name for name in modules if name.split(".")[0] == "redis"}
+    assert "sortedcontainers" not in modules
+    assert not {name for name in modules if ".algorithm." in name}
+    assert "core._internals.infrastructure.replay" not in modules
+
+
+def test_engines_load_only_what_they_select():
+    modules = loaded_modules("import core; core.ThrottyCore(); core.SyncThrottyCore()")
+
+    assert "core._internals.domain.services.algorithm.sliding_window_counter" in modules
+    assert "core._internals.domain.services.algorithm.token_bucket" not in modules
+    assert "redis" not in modules
+    assert "sortedcontainers" not in modules
+
+    modules = loaded_modules(
+        "import asyncio, core\n"
+        "engine = core.ThrottyCore(algorithm='slidingwindow_log')\n"
+        "asyncio.run(engine.execute(key='k', limit=1, window=1))"
+    )
+    assert "sortedcontainers" in modules
+    assert "redis" not in modules
+
+
+def test_lazy_names_resolve():
+    from core._internals.infrastructure.storage.peer import UdpTransport
+    from core._internals.infrastructure.storage.redis import RedisStorage
+
+    assert core.UdpTransport is UdpTransport
+    assert storage.RedisStorage is RedisStorage
+    assert "RedisStorage" in vars(storage)
+    with pytest.raises(AttributeError):
+        core.NotAThing
+    with pytest.raises(ImportError):
+        from core import NotAThing
@@ -0,0 +1,217 @@
+# ruff: noqa
+
+import asyncio
+import json
+import os
+from datetime import timedelta
+from unittest.mock import AsyncMock
+
+import pytest
+from redis.asyncio import Redis
+
+from core.limiter import Throtty
+from core._internals.domain.interfaces.limit_source import LimitSource
+from core._internals.domain.models import Limit
+from core._internals.domain.services.limits import LimitResolver
+from core._internals.infrastructure.limits import (
+    CallableLimitSource,
+    FileLimitSource,
+    RedisLimitSource,
+)
+
+REDIS_URL = os.environ.get("THROTTY_REDIS_URL")
+
+
+class MockLimitSource(LimitSource):
+    is_async = True
+
+    def __init__(self, limits):
+        self.limits = limits
+        self.calls = []
+        self.fail = False
+
+    async def get(self, keys):
+        self.calls.append(sorted(keys))
+        if self.fail:
+            raise ConnectionError("down")
+        return {
+            key: Limit.parse(self.limits[key]) for key in keys if key in self.limits
+        }
+
+
+@pytest.fixture
+def throtty():
+    Throtty._instance = None
+    Throtty._initialized = False
+    yield
+    Throtty._instance = None
+    Throtty._initialized = False
+
+
+def test_limit_parse():
+    expected = Limit(limit=100, window=timedelta(seconds=60))
+
+    for value in ("100/60", b"100/60", (100, 60), ["100", "60"]):
+        assert Limit.parse(value) == expected
+    assert Limit.parse({"limit": 100, "window": 60}) == expected
+    assert Limit.parse(expected) is expected
+    for value in ("100", "100/0", "-1/60", "a/60"):
+        with pytest.raises(ValueError):
+            Limit.parse(value)
+
+
+@pytest.mark.asyncio
+async def test_resolver_batches_lookups_and_caches_misses():
+    source = MockLimitSource({"apikey:gold": "1000/60"})
+    resolver = LimitResolver(source)
+
+    gold, free, again = await asyncio.gather(
+        resolver.resolve("apikey:gold"),
+        resolver.resolve("apikey:free"),
+        resolver.resolve("apikey:gold"),
+    )
+
+    assert gold == again == Limit.parse("1000/60")
+    assert free is None
+    assert source.calls == [["apikey:free", "apikey:gold"]]
+    assert await resolver.resolve("apikey:free") is None
+    assert len(source.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_resolver_refreshes_stale_limits_in_background():
+    source = MockLimitSource({"apikey:1": "10/60"})
+    resolver = LimitResolver(source, ttl=60)
+    await resolver.resolve("apikey:1")
+
+    source.limits["apikey:1"] = "20/60"
+    resolver.invalidate()
+    # the stale limit answers while the refresh runs
+    assert await resolver.resolve("apikey:1") == Limit.parse("10/60")
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert await resolver.resolve("apikey:1") == Limit.parse("20/60")
+    assert len(source.calls) == 2
+
+    source.fail = True
+    resolver.invalidate(["apikey:1"])
+    await resolver.resolve("apikey:1")
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    # a failing source keeps the last known limit
+    assert await resolver.resolve("apikey:1") == Limit.parse("20/60")
+    assert await resolver.resolve("apikey:2") is None
+
+
+def test_resolver_sync_and_bounded():
+    calls = []
+
+    def plans(key):
+        calls.append(key)
+        return "5/60" if key.startswith("gold:") else None
+
+    resolver = LimitResolver(CallableLimitSource(plans), max_size=2)
+
+    assert resolver.resolve_sync("gold:1") == Limit.parse("5/60")
+    assert resolver.resolve_sync("free:1") is None
+    assert resolver.resolve_sync("gold:1") == Limit.parse("5/60")
+    assert calls == ["gold:1", "free:1"]
+    resolver.resolve_sync("gold:2")
+    # the oldest entry made room
+    resolver.resolve_sync("gold:1")
+    assert calls == ["gold:1", "free:1", "gold:2", "gold:1"]
+    with pytest.raises(ValueError):
+        LimitResolver(CallableLimitSource(plans), ttl=0)
+
+
+def test_file_limit_source_reloads(tmp_path):
+    plans = tmp_path / "plans.json"
+    plans.write_text(json.dumps({"apikey:1": "10/60", "apikey:2": [20, 3600]}))
+    source = FileLimitSource(plans, check_interval=0)
+    invalidated = []
+    asyncio.run(source.start(invalidated.append))
+
+    assert source.get(["apikey:1", "apikey:3"]) == {"apikey:1": Limit.parse("10/60")}
+
+    plans.write_text(json.dumps({"apikey:1": "30/60"}))
+    os.utime(plans, ns=(0, 1))
+    assert source.get(["apikey:1", "apikey:2"]) == {"apikey:1": Limit.parse("30/60")}
+    assert invalidated == [None]
+
+    table = tmp_path / "plans.csv"
+    table.write_text("key,limit,window\napikey:1,5,60\n")
+    assert FileLimitSource(table).get(["apikey:1"]) == {"apikey:1": Limit.parse("5/60")}
+
+
+@pytest.mark.asyncio
+async def test_redis_limit_source_reads_one_hash():
+    client = Redis()
+    client.hmget = AsyncMock(return_value=[b"100/60", None, b"oops"])
+    source = RedisLimitSource(client, hash_key="plans")
+
+    limits = await source.get(["apikey:1", "apikey:2", "apikey:3"])
+
+    assert limits == {"apikey:1": Limit.parse("100/60")}
+    client.hmget.assert_awaited_once_with("plans", ["apikey:1", "apikey:2", "apikey:3"])
+    with pytest.raises(ValueError):
+        RedisLimitSource(Redis(protocol=3), track=True)
+    await client.aclose()
+
+
+@pytest.mark.skipif(not REDIS_URL, reason="THROTTY_REDIS_URL not set")
+@pytest.mark.asyncio
+async def test_redis_limit_source_tracks_changes():
+    client = Redis.from_url(REDIS_URL)
+    hash_key = f"test:limits:{os.getpid()}"
+    await client.hset(hash_key, "apikey:1", "10/60")
+    resolver = LimitResolver(RedisLimitSource(client, hash_key=hash_key, track=True))
+    await resolver.start()
+    await asyncio.sleep(0.2)
+
+    assert await resolver.resolve("apikey:1") == Limit.parse("10/60")
+    await client.hset(hash_key, "apikey:1", "20/60")
+    await asyncio.sleep(0.2)
+    await resolver.resolve("apikey:1")
+    await asyncio.sleep(0.2)
+
+    assert await resolver.resolve("apikey:1") == Limit.parse("20/60")
+    await resolver.close()
+    await client.delete(hash_key)
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_rule_overrides_limits_per_key(throtty):
+    limiter = Throtty()
+    limiter.add_rule(
+        "/api/*",
+        limit=3,
+        window=60,
+        key_func=lambda host, headers: headers["x-api-key"],
+        overrides=lambda key: "1/60" if key == "trial" else None,
+    )
+    app = limiter.wrap(AsyncMock())
+
+    async def call(api_key):
+        send = AsyncMock()
+        scope = {
+            "type": "http",
+            "path": "/api/x",
+            "client": ("10.0.0.1", 1),
+            "headers": [(b"x-api-key", api_key.encode())],
+        }
+        await app(scope, AsyncMock(), send)
+        return send.call_count == 0
+
+    assert [await call("trial") for _ in range(2)] == [True, False]
+    assert [await call("paid") for _ in range(4)] == [True, True, True, False]
+
+
+def test_sync_rule_needs_blocking_source(throtty):
+    limiter = Throtty(sync=True)
+
+    async def plans(key):
+        return None
+
+    with pytest.raises(ValueError):
+        limiter.add_rule("/api/*", limit=1, window=60, overrides=plans)
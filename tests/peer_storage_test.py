@@ -0,0 +1,172 @@
+# ruff: noqa
+
+import asyncio
+import json
+from time import time
+import pytest
+
+from core._internals.infrastructure.storage.peer import (
+    PeerStorage,
+    UdpTransport,
+    UnixTransport,
+)
+from core._internals.domain.interfaces.transport import PeerTransport
+from core._internals.domain.models import BucketConsume
+
+
+class MockTransport(PeerTransport):
+    def __init__(self):
+        self.sent = []
+        self.started = False
+
+    async def start(self, on_message):
+        self.started = True
+
+    def send(self, data):
+        self.sent.append(json.loads(data))
+
+    async def close(self):
+        self.started = False
+
+
+async def wait_for(predicate):
+    for _ in range(100):
+        if await predicate():
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+@pytest.mark.asyncio
+async def test_peers_converge_over_udp():
+    first = UdpTransport(bind=("127.0.0.1", 0), peers=[])
+    second = UdpTransport(bind=("127.0.0.1", 0), peers=[])
+    a = PeerStorage(transport=first, sync_interval=0.01)
+    b = PeerStorage(transport=second, sync_interval=0.01)
+    await a.start()
+    await b.start()
+    first.peers.append(second.address)
+    second.peers.append(first.address)
+
+    for _ in range(3):
+        await a.increment_windows(key="ip:1", window=10, ttl=60)
+    for _ in range(2):
+        await b.increment_windows(key="ip:1", window=10, ttl=60)
+
+    async def converged():
+        counts = [
+            await storage.get_window_counts(
+                "ip:1", current_window=10, previous_window=9
+            )
+            for storage in (a, b)
+        ]
+        return [data.current_count for data in counts] == [5, 5]
+
+    assert await wait_for(converged)
+    assert a.live_nodes() == b.live_nodes() == 2
+    await a.close()
+    await b.close()
+
+
+@pytest.mark.asyncio
+async def test_peers_converge_over_unix_sockets(tmp_path):
+    paths = [str(tmp_path / "a.sock"), str(tmp_path / "b.sock")]
+    a = PeerStorage(transport=UnixTransport(paths[0], [paths[1]]), sync_interval=0.01)
+    b = PeerStorage(transport=UnixTransport(paths[1], [paths[0]]), sync_interval=0.01)
+    await a.start()
+    await b.start()
+
+    now = time()
+    await a.add_timestamp(key="user:1", timestamp=now, ttl=60)
+
+    async def converged():
+        return await b.count_in_range("user:1", start=now - 60, end=now + 1) == 1
+
+    assert await wait_for(converged)
+    await a.close()
+    await b.close()
+
+
+class SlowStartTransport(MockTransport):
+    def __init__(self):
+        super().__init__()
+        self.starts = 0
+
+    async def start(self, on_message):
+        self.starts += 1
+        await asyncio.sleep(0.01)
+        await super().start(on_message)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_first_requests_start_once():
+    transport = SlowStartTransport()
+    storage = PeerStorage(transport=transport)
+
+    counts = await asyncio.gather(
+        *(storage.increment_windows(key="ip:1", window=10, ttl=60) for _ in range(5))
+    )
+
+    assert transport.starts == 1
+    assert sorted(counts) == [1, 2, 3, 4, 5]
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_stale_datagrams_do_not_lower_counts():
+    storage = PeerStorage(transport=MockTransport())
+
+    def datagram(count):
+        return json.dumps({"n": "peer", "e": [["w", "ip:1", 10, 60, count]]}).encode()
+
+    storage._receive(datagram(7))
+    storage._receive(datagram(4))
+    storage._receive(datagram(7))
+    data = await storage.get_window_counts("ip:1", current_window=10, previous_window=9)
+
+    assert data.current_count == 7
+
+
+@pytest.mark.asyncio
+async def test_summaries_send_changes_then_snapshots():
+    transport = MockTransport()
+    storage = PeerStorage(
+        transport=transport, node_id="a", sync_interval=1, snapshot_interval=60
+    )
+    await storage.increment_windows(key="ip:1", window=10, ttl=60)
+    await storage.increment_windows(key="ip:2", window=10, ttl=60)
+
+    storage.sync()
+    await storage.increment_windows(key="ip:1", window=10, ttl=60)
+    storage.sync()
+    storage.sync()
+
+    assert transport.sent[0]["n"] == "a"
+    assert len(transport.sent[0]["e"]) == 2
+    assert transport.sent[1]["e"] == [["w", "ip:1", 10, 60, 2]]
+    assert transport.sent[2]["e"] == []
+
+
+@pytest.mark.asyncio
+async def test_buckets_enforce_share_of_live_nodes():
+    storage = PeerStorage(transport=MockTransport())
+    storage._receive(json.dumps({"n": "peer", "e": []}).encode())
+    request = BucketConsume(
+        key="ip:1", capacity=4, refill_rate=1.0, now=1.0, cost=1, ttl=60
+    )
+
+    results = await storage.consume_buckets([request] * 3)
+
+    assert storage.live_nodes() == 2
+    assert [result.allowed for result in results] == [True, True, False]
+
+
+def test_summaries_are_split_into_datagrams():
+    transport = MockTransport()
+    storage = PeerStorage(transport=transport, max_datagram=100)
+
+    datagrams = storage._pack([["w", f"ip:{i}", 10, 60, 1] for i in range(20)])
+
+    assert len(datagrams) > 1
+    assert all(len(datagram) < 200 for datagram in datagrams)
+    assert sum(len(json.loads(d)["e"]) for d in datagrams) == 20
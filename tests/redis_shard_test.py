@@ -0,0 +1,137 @@
+# ruff: noqa
+
+from collections import Counter
+from contextlib import asynccontextmanager
+
+import pytest
+from redis.crc import REDIS_CLUSTER_HASH_SLOTS
+
+from core._internals.infrastructure.storage.redis import RedisStorage, ThrottyRedis
+from core._internals.infrastructure.storage.redis.keys import RedisKeys
+from core._internals.infrastructure.storage.redis.ring import HashRing
+from core._internals.infrastructure.storage.redis.batch import group_requests
+from core._internals.infrastructure.throtty import ThrottyCore
+from core._internals.domain.models import LogConsume
+from core._internals.domain.exceptions import RedisError
+
+NODES = [f"redis://redis-{name}:6379/0" for name in "abcd"]
+
+
+def owners(ring):
+    return [ring.slot_owner(slot) for slot in range(REDIS_CLUSTER_HASH_SLOTS)]
+
+
+def test_ring_spreads_slots_and_moves_few_on_changes():
+    ring = HashRing(NODES)
+    before = owners(ring)
+
+    shares = Counter(before)
+    assert set(shares) == set(NODES)
+    assert max(shares.values()) < 1.25 * REDIS_CLUSTER_HASH_SLOTS / len(NODES)
+
+    ring.add("redis://redis-e:6379/0")
+    after = owners(ring)
+    moved = [slot for slot in range(len(before)) if before[slot] != after[slot]]
+    # only the slots taken over by the new server move
+    assert {after[slot] for slot in moved} == {"redis://redis-e:6379/0"}
+    assert len(moved) < 1.25 * REDIS_CLUSTER_HASH_SLOTS / 5
+
+    ring.remove("redis://redis-e:6379/0")
+    assert owners(ring) == before
+    assert owners(HashRing(reversed(NODES))) == before
+    with pytest.raises(ValueError):
+        ring.add(NODES[0])
+    with pytest.raises(ValueError):
+        HashRing(NODES, vnodes=0)
+
+
+def test_sharded_groups_follow_hash_tags():
+    keys = RedisKeys()
+    ring = HashRing(NODES)
+    requests = [
+        LogConsume(key=f"user:{{acme}}:{i}", start=0.0, now=1.0, limit=1, cost=1, ttl=1)
+        for i in range(20)
+    ]
+    requests.append(
+        LogConsume(key="org:{acme}", start=0.0, now=1.0, limit=1, cost=1, ttl=1)
+    )
+
+    assert group_requests(requests, True, False, keys, ring) == [list(range(21))]
+
+    spread = [
+        LogConsume(key=f"ip:{i}", start=0.0, now=1.0, limit=1, cost=1, ttl=1)
+        for i in range(100)
+    ]
+    groups = group_requests(spread, False, False, keys, ring)
+    assert len(groups) == len(NODES)
+    for group in groups:
+        assert len({ring.node(keys.tag(spread[idx].key)) for idx in group}) == 1
+    with pytest.raises(RedisError):
+        group_requests(spread, True, False, keys, ring)
+
+
+class MockShard:
+    def __init__(self, name):
+        self.name = name
+
+    @asynccontextmanager
+    async def get_redis(self):
+        yield self.name
+
+
+class MockShardedRedis:
+    is_cluster = False
+
+    def __init__(self, nodes):
+        self.ring = HashRing(nodes)
+        self.calls = []
+
+    def node(self, key):
+        return MockShard(self.ring.node(key))
+
+    def script(self, source):
+        async def run(keys, args, client):
+            self.calls.append((client, keys))
+            return [1, 0] * len(keys)
+
+        return run
+
+
+@pytest.mark.asyncio
+async def test_sharded_storage_sends_one_call_per_server():
+    redis = MockShardedRedis(NODES)
+    storage = RedisStorage(redis=redis)
+    requests = [
+        LogConsume(key=f"ip:{i}", start=0.0, now=1.0, limit=5, cost=1, ttl=60)
+        for i in range(50)
+    ]
+
+    results = await storage.consume_logs(requests)
+
+    assert all(result.allowed for result in results)
+    assert sorted(client for client, _ in redis.calls) == sorted(NODES)
+    for client, batch_keys in redis.calls:
+        assert {redis.ring.node(key) for key in batch_keys} == {client}
+
+
+@pytest.mark.asyncio
+async def test_throtty_redis_keeps_a_pool_per_server():
+    redis = ThrottyRedis(dsn=NODES[:2], max_connections=4)
+
+    pools = {id(shard.redis.connection_pool) for shard in redis.shards.values()}
+    assert len(pools) == 2
+    assert redis.node("{ip:1}") is redis.shards[redis.ring.node("{ip:1}")]
+
+    redis.add_node(NODES[2])
+    assert set(redis.shards) == set(NODES[:3])
+    await redis.remove_node(NODES[0])
+    assert set(redis.shards) == set(NODES[1:3])
+    assert redis.redis is redis.shards[NODES[1]].redis
+    await redis.remove_node(NODES[1])
+    with pytest.raises(ValueError):
+        await redis.remove_node(NODES[2])
+    with pytest.raises(ValueError):
+        ThrottyRedis(dsn=NODES, cluster=True)
+    with pytest.raises(ValueError):
+        ThrottyCore(redis_dsn=NODES, hybrid=True)
+    await redis.close_redis()
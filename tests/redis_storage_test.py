@@ -0,0 +1,415 @@
+# ruff: noqa
+
+import os
+import json
+import pytest
+from redis.asyncio import Redis
+from redis.crc import key_slot
+
+from core._internals.infrastructure.storage.redis import RedisStorage, ThrottyRedis
+from core._internals.infrastructure.storage.redis.keys import (
+    hash_tag,
+    window_key,
+    log_key,
+    bucket_key,
+    RedisKeys,
+)
+from core._internals.infrastructure.storage.redis.batch import (
+    group_requests,
+    build_call,
+    consumers,
+)
+from core._internals.infrastructure.storage.redis.scripts import (
+    SCRIPTS,
+    CONSUME_WINDOWS,
+    CONSUME_WINDOW_HASHES,
+)
+from core._internals.infrastructure.storage.redis.codec import (
+    encode_bucket,
+    decode_bucket,
+)
+from core._internals.domain.models import (
+    BucketConsume,
+    BucketState,
+    LogConsume,
+    WindowConsume,
+)
+from core._internals.domain.exceptions import RedisError
+
+# Start a local cluster (e.g. `create-cluster start && create-cluster create` from the
+# redis utils) and point this at any node to run the cluster tests.
+CLUSTER_URL = os.environ.get("THROTTY_REDIS_CLUSTER_URL")
+REDIS_URL = os.environ.get("THROTTY_REDIS_URL")
+
+
+def test_hash_tag_wraps_plain_keys():
+    assert hash_tag("ip:127.0.0.1") == "{ip:127.0.0.1}"
+    assert window_key("ip:127.0.0.1", 42) == "{ip:127.0.0.1}:w:42"
+    assert log_key("user:1") == "{user:1}:log"
+    assert bucket_key("user:1") == "{user:1}:bucket"
+
+
+def test_hash_tag_keeps_existing_tag():
+    assert hash_tag("org:{acme}:user:1") == "org:{acme}:user:1"
+    assert hash_tag("empty:{}:tag") == "{empty:{}:tag}"
+
+
+def test_decision_keys_share_one_slot():
+    key = "apikey:5f1d3c0e9b7a4c2e8d6f0a1b3c5e7f9d"
+    slots = {
+        key_slot(window_key(key, 100).encode()),
+        key_slot(window_key(key, 99).encode()),
+        key_slot(window_key(key, 1).encode()),
+        key_slot(log_key(key).encode()),
+        key_slot(bucket_key(key).encode()),
+    }
+
+    assert len(slots) == 1
+
+
+def test_explicit_tags_co_locate_different_clients():
+    user = window_key("user:{acme}:1", 10)
+    org = window_key("org:{acme}", 10)
+
+    assert key_slot(user.encode()) == key_slot(org.encode())
+
+
+def test_default_redis_keys_match_layout():
+    keys = RedisKeys()
+
+    assert keys.window("user:1", 42) == window_key("user:1", 42)
+    assert keys.log("user:{acme}:1") == log_key("user:{acme}:1")
+    assert keys.bucket("user:1") == bucket_key("user:1")
+
+
+def test_redis_keys_namespace_hashing_and_compact_suffixes():
+    keys = RedisKeys(namespace="rl:", hash_over=32, compact=True)
+    api_key = "apikey:" + "f" * 64
+
+    assert keys.window("ip:1.2.3.4", 0x1C7D32A) == "rl:{ip:1.2.3.4}:w1c7d32a"
+    assert keys.log("ip:1.2.3.4") == "rl:{ip:1.2.3.4}:l"
+    hashed = keys.bucket(api_key)
+    assert hashed.startswith("rl:{") and hashed.endswith("}:b")
+    assert len(hashed) == len("rl:{}:b") + 16
+    assert keys.bucket(api_key) == hashed
+    assert keys.bucket(api_key + "0") != hashed
+    # an explicit tag survives hashing, so co-located keys keep sharing a slot
+    tagged = keys.tag("user:{acme}:" + "1" * 40)
+    assert tagged.startswith("{acme}")
+    assert key_slot(tagged.encode()) == key_slot(keys.tag("org:{acme}").encode())
+    with pytest.raises(ValueError):
+        RedisKeys(hash_over=8)
+
+
+def test_legacy_buckets_share_the_slot_of_their_bucket():
+    keys = RedisKeys(namespace="rl:", hash_over=16)
+
+    for key in ("ip:1", "user:{acme}:1"):
+        assert keys.legacy_bucket(key) == key
+        assert key_slot(key.encode()) == key_slot(keys.bucket(key).encode())
+    # a hashed key moved to another slot, there is nothing to migrate from
+    long_key = "apikey:" + "x" * 40
+    assert keys.legacy_bucket(long_key) == keys.bucket(long_key)
+
+
+def test_hashed_windows_share_one_key_per_window_length():
+    keys = RedisKeys(hash_windows=True)
+    requests = [
+        WindowConsume(
+            key="ip:1",
+            current_window=window,
+            previous_window=window - 1,
+            weight=0.25,
+            limit=10,
+            cost=1,
+            ttl=120,
+        )
+        for window in (7, 8)
+    ]
+    source, request_keys, request_args, nonce = consumers(keys)[WindowConsume]
+
+    batch_keys, batch_args = build_call(
+        requests, [0, 1], False, keys, request_keys, request_args, nonce
+    )
+
+    assert source is CONSUME_WINDOW_HASHES
+    assert consumers(RedisKeys())[WindowConsume][0] is CONSUME_WINDOWS
+    assert batch_keys == ["{ip:1}:wh:120", "{ip:1}:wh:120"]
+    assert batch_args == ["0", 7, 0.25, 10, 1, 120, 8, 0.25, 10, 1, 120]
+    assert RedisKeys(compact=True, hash_windows=True).window_hash("ip:1", 120) == (
+        "{ip:1}:h78"
+    )
+
+
+@pytest.mark.asyncio
+async def test_hashed_window_counts_need_the_ttl():
+    storage = RedisStorage(redis=MockClusterRedis(), keys=RedisKeys(hash_windows=True))
+
+    with pytest.raises(ValueError):
+        await storage.get_window_counts(key="ip:1", current_window=1, previous_window=0)
+
+
+def test_cluster_groups_follow_hashed_tags():
+    keys = RedisKeys(hash_over=16)
+    requests = [
+        LogConsume(key=key, start=0.0, now=1.0, limit=1, cost=1, ttl=1)
+        for key in ("user:{acme}:" + "1" * 40, "org:{acme}", "user:" + "2" * 40)
+    ]
+
+    groups = group_requests(requests, False, True, keys)
+
+    assert sorted(map(len, groups)) == [1, 2]
+    with pytest.raises(RedisError):
+        group_requests(requests, True, True, keys)
+
+
+def test_bucket_codec_roundtrip():
+    state = BucketState(latest_refill=1763251200.123456, tokens=7.25)
+
+    tokens, latest_refill = encode_bucket(state)
+
+    assert (tokens, latest_refill) == (7_250_000, 1_763_251_200_123_456)
+    assert decode_bucket([str(tokens).encode(), str(latest_refill).encode()]) == state
+    assert decode_bucket(None) is None
+    assert decode_bucket([None, None]) is None
+
+
+class MockClusterRedis:
+    is_cluster = True
+    ring = None
+
+
+@pytest.mark.asyncio
+async def test_cluster_atomic_batch_needs_one_slot():
+    storage = RedisStorage(redis=MockClusterRedis())
+    requests = [
+        LogConsume(key=key, start=0.0, now=1.0, limit=1, cost=1, ttl=1)
+        for key in ("user:1", "org:1")
+    ]
+
+    with pytest.raises(RedisError):
+        await storage.consume_logs(requests, atomic=True)
+
+
+@pytest.mark.skipif(not REDIS_URL, reason="THROTTY_REDIS_URL not set")
+@pytest.mark.asyncio
+async def test_bucket_state_migrates_legacy_json():
+    client = Redis.from_url(REDIS_URL)
+    storage = RedisStorage(redis=ThrottyRedis(redis=client))
+    key = f"test:{os.getpid()}"
+    # older versions kept a bucket as JSON under the client key itself
+    legacy = json.dumps({"tokens": 3.5, "latest_refill": 1763251200.5})
+    await client.set(key, legacy, ex=60)
+
+    state = await storage.get_bucket_state(key=key)
+
+    assert state == BucketState(latest_refill=1763251200.5, tokens=3.5)
+    assert not await client.exists(key)
+    assert await client.type(bucket_key(key)) == b"hash"
+    assert 0 < await client.ttl(bucket_key(key)) <= 60
+    await client.delete(bucket_key(key))
+    await client.aclose()
+
+
+@pytest.mark.skipif(not REDIS_URL, reason="THROTTY_REDIS_URL not set")
+@pytest.mark.asyncio
+async def test_consumed_buckets_continue_from_legacy_json():
+    client = Redis.from_url(REDIS_URL)
+    storage = RedisStorage(redis=ThrottyRedis(redis=client))
+    key, log = f"test:{os.getpid()}", f"test:{os.getpid()}:zset"
+    await client.set(key, json.dumps({"tokens": 1.0, "latest_refill": 100.0}), ex=60)
+    # the log algorithm kept a sorted set under the client key, it is left alone
+    await client.zadd(log, {"100.0": 100.0})
+    request = BucketConsume(
+        key=key, capacity=10, refill_rate=0.0, now=100.0, cost=1, ttl=60
+    )
+
+    results = await storage.consume_buckets([request, request])
+    [fresh] = await storage.consume_buckets(
+        [
+            BucketConsume(
+                key=log, capacity=10, refill_rate=0.0, now=100.0, cost=1, ttl=60
+            )
+        ]
+    )
+
+    assert [result.allowed for result in results] == [True, False]
+    assert not await client.exists(key)
+    assert fresh.allowed and fresh.remaining == 9
+    assert await client.zcard(log) == 1
+    await client.delete(bucket_key(key), bucket_key(log), log)
+    await client.aclose()
+
+
+@pytest.mark.skipif(not REDIS_URL, reason="THROTTY_REDIS_URL not set")
+@pytest.mark.asyncio
+async def test_hashed_windows_rotate_in_place():
+    client = Redis.from_url(REDIS_URL)
+    keys = RedisKeys(hash_windows=True)
+    storage = RedisStorage(redis=ThrottyRedis(redis=client), keys=keys)
+    key = f"test:{os.getpid()}"
+
+    def request(window):
+        return WindowConsume(
+            key=key,
+            current_window=window,
+            previous_window=window - 1,
+            weight=0.5,
+            limit=3,
+            cost=1,
+            ttl=60,
+        )
+
+    results = await storage.consume_windows([request(10)] * 4)
+    assert [result.allowed for result in results] == [True, True, True, False]
+    [result] = await storage.consume_windows([request(11)])
+    assert (result.allowed, result.remaining) == (True, 0.5)
+    assert await client.hgetall(keys.window_hash(key, 60)) == {
+        b"i": b"11",
+        b"c": b"1",
+        b"p": b"3",
+    }
+    assert await client.object("encoding", keys.window_hash(key, 60)) == b"listpack"
+    await client.delete(keys.window_hash(key, 60))
+    await client.aclose()
+
+
+@pytest.mark.skipif(not CLUSTER_URL, reason="THROTTY_REDIS_CLUSTER_URL not set")
+@pytest.mark.asyncio
+async def test_cluster_window_counts_single_slot():
+    redis = ThrottyRedis(dsn=CLUSTER_URL, cluster=True)
+    storage = RedisStorage(redis=redis)
+    key = f"test:{os.getpid()}"
+
+    assert await storage.increment_windows(key=key, window=2, ttl=10) == 1
+    assert await storage.increment_windows(key=key, window=1, ttl=10) == 1
+    data = await storage.get_window_counts(key=key, current_window=2, previous_window=1)
+
+    assert data.current_count == 1
+    assert data.previous_count == 1
+    await redis.close_redis()
+
+
+class MockPool:
+    max_connections = 4
+
+    def __init__(self):
+        self.opened = 0
+        self.released = []
+
+    async def get_connection(self):
+        self.opened += 1
+        return self.opened
+
+    async def release(self, connection):
+        self.released.append(connection)
+
+
+class MockScriptRedis:
+    def __init__(self, pool=None):
+        self.connection_pool = pool
+        self.loaded = []
+
+    def register_script(self, source):
+        return source
+
+    async def script_load(self, source):
+        self.loaded.append(source)
+
+
+@pytest.mark.asyncio
+async def test_warm_up_opens_pooled_connections():
+    pool = MockPool()
+    redis = ThrottyRedis(redis=MockScriptRedis(pool), max_connections=8)
+
+    await redis.warm_up()
+    assert (pool.opened, sorted(pool.released)) == (4, [1, 2, 3, 4])
+    await redis.warm_up(connections=2)
+    assert pool.opened == 6
+
+
+@pytest.mark.asyncio
+async def test_start_preloads_scripts():
+    client = MockScriptRedis()
+    redis = ThrottyRedis(redis=client)
+
+    await RedisStorage(redis=redis).start()
+
+    assert client.loaded == list(SCRIPTS)
+    assert set(redis._scripts) == set(SCRIPTS)
+
+
+@pytest.mark.skipif(not REDIS_URL, reason="THROTTY_REDIS_URL not set")
+@pytest.mark.asyncio
+async def test_hashed_windows_keep_newer_counts_from_lagging_nodes():
+    client = Redis.from_url(REDIS_URL)
+    keys = RedisKeys(hash_windows=True)
+    storage = RedisStorage(redis=ThrottyRedis(redis=client), keys=keys)
+    key = f"test:{os.getpid()}"
+
+    def request(window, cost=1):
+        return WindowConsume(
+            key=key,
+            current_window=window,
+            previous_window=window - 1,
+            weight=0.5,
+            limit=60,
+            cost=cost,
+            ttl=60,
+        )
+
+    await storage.consume_windows([request(11, cost=50)])
+    # a node one window behind charges the previous window, not the current one
+    [result] = await storage.consume_windows([request(10)])
+    assert result.allowed
+    assert await client.hgetall(keys.window_hash(key, 60)) == {
+        b"i": b"11",
+        b"c": b"50",
+        b"p": b"1",
+    }
+    # further behind, it is decided against the stored windows and writes nothing
+    [result] = await storage.consume_windows([request(5, cost=20)])
+    assert not result.allowed
+    [result] = await storage.consume_windows([request(5)])
+    assert result.allowed
+    assert await client.hgetall(keys.window_hash(key, 60)) == {
+        b"i": b"11",
+        b"c": b"50",
+        b"p": b"1",
+    }
+    # the current window keeps counting from where it was
+    [result] = await storage.consume_windows([request(11)])
+    assert result.remaining == 60 - 51 - 0.5
+    await client.delete(keys.window_hash(key, 60))
+    await client.aclose()
+
+
+@pytest.mark.skipif(not REDIS_URL, reason="THROTTY_REDIS_URL not set")
+@pytest.mark.asyncio
+async def test_hashed_window_primitives_rotate_in_place():
+    client = Redis.from_url(REDIS_URL)
+    keys = RedisKeys(hash_windows=True)
+    storage = RedisStorage(redis=ThrottyRedis(redis=client), keys=keys)
+    key = f"test:{os.getpid()}"
+
+    for _ in range(3):
+        await storage.increment_windows(key=key, window=10, ttl=60)
+    assert await storage.increment_windows(key=key, window=11, ttl=60, amount=2) == 2
+    # a late increment of the rotated out window still lands on it
+    assert await storage.increment_windows(key=key, window=10, ttl=60) == 4
+
+    data = await storage.get_window_counts(
+        key=key, current_window=11, previous_window=10, ttl=60
+    )
+    assert (data.current_count, data.previous_count) == (2, 4)
+    data = await storage.get_window_counts(
+        key=key, current_window=12, previous_window=11, ttl=60
+    )
+    assert (data.current_count, data.previous_count) == (0, 2)
+    assert await client.hgetall(keys.window_hash(key, 60)) == {
+        b"i": b"11",
+        b"c": b"2",
+        b"p": b"4",
+    }
+    await client.delete(keys.window_hash(key, 60))
+    await client.aclose()
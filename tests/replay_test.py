@@ -0,0 +1,207 @@
+# ruff: noqa
+
+import gzip
+import json
+import random
+
+import pytest
+
+from core import cli
+from core.limiter import Throtty
+from core._internals.domain.services.clock import ManualClock
+from core._internals.infrastructure.replay import read_access_log, ReplaySimulator
+from core._internals.infrastructure.throtty import SyncThrottyCore
+
+
+def make_rule(path, limit, window):
+    return {
+        "path": path,
+        "pattern": Throtty._compile_path(path),
+        "limit": limit,
+        "window": window,
+    }
+
+
+@pytest.fixture
+def throtty():
+    Throtty._instance = None
+    Throtty._initialized = False
+    yield Throtty()
+    Throtty._instance = None
+    Throtty._initialized = False
+
+
+def test_read_access_log_formats(tmp_path):
+    rows = [
+        {"timestamp": 100.5, "path": "/a", "ip": "10.0.0.1"},
+        {"timestamp": "1970-01-01T00:01:41+00:00", "path": "/b", "ip": "10.0.0.2"},
+    ]
+    jsonl = tmp_path / "access.jsonl"
+    jsonl.write_text("\n".join(json.dumps(row) for row in rows) + "\n\n")
+    gz = tmp_path / "access.ndjson.gz"
+    with gzip.open(gz, "wt") as f:
+        f.write(jsonl.read_text())
+    csv = tmp_path / "access.csv"
+    csv.write_text(
+        "timestamp,path,ip\n100.5,/a,10.0.0.1\n1970-01-01T00:01:41+00:00,/b,10.0.0.2\n"
+    )
+
+    expected = [(100.5, "/a", "ip:10.0.0.1"), (101.0, "/b", "ip:10.0.0.2")]
+    for source in (jsonl, gz, csv):
+        assert list(read_access_log(source)) == expected
+
+    user = tmp_path / "users.log"
+    user.write_text('{"ts": 1, "url": "/a", "user": 42}\n')
+    records = read_access_log(
+        user, format="jsonl", time_field="ts", path_field="url", key_field="user"
+    )
+    assert list(records) == [(1.0, "/a", "user:42")]
+
+
+def test_read_access_log_errors(tmp_path):
+    with pytest.raises(ValueError):
+        read_access_log(tmp_path / "access.txt")
+    bad = tmp_path / "access.jsonl"
+    bad.write_text('{"timestamp": 1, "path": "/a", "ip": "x"}\n{"path": "/a"}\n')
+    records = read_access_log(bad)
+    assert next(records) == (1.0, "/a", "ip:x")
+    with pytest.raises(ValueError, match="bad record 2"):
+        next(records)
+
+
+@pytest.mark.parametrize(
+    "algorithm", ["slidingwindow_counter", "slidingwindow_log", "token_bucket"]
+)
+def test_replay_matches_live_decisions(algorithm):
+    rng = random.Random(7)
+    records, now = [], 1000.0
+    for _ in range(2000):
+        now += rng.choice([0.0, 0.0, 0.05, 0.5, 3.0])
+        records.append(
+            (now, rng.choice(["/api/a", "/api/b"]), f"ip:{rng.randint(1, 5)}")
+        )
+
+    report = ReplaySimulator(
+        [make_rule("/api/*", 5, 10)], algorithm=algorithm, resolution=0
+    ).run(records)
+
+    clock = ManualClock()
+    engine = SyncThrottyCore(algorithm=algorithm, clock=clock)
+    rejected = {}
+    for timestamp, _, key in records:
+        clock.set(timestamp)
+        if not engine.execute(key=key, limit=5, window=10).allowed:
+            rejected[key] = rejected.get(key, 0) + 1
+
+    [rule] = report.rules
+    assert rule.requests == 2000
+    assert rule.rejected == sum(rejected.values()) > 0
+    assert {
+        key: counts[1] for key, counts in rule.keys.items() if counts[1]
+    } == rejected
+
+
+def test_replay_routes_and_reports():
+    records = [(float(i), "/login", "ip:a") for i in range(10)]
+    records += [(float(i), "/login", "ip:b") for i in range(2)]
+    records += [(10.0, "/api/x", "ip:a"), (11.0, "/static/app.js", "ip:a")]
+    simulator = ReplaySimulator(
+        [make_rule("/login", 3, 60), make_rule("/api/*", 100, 60)]
+    )
+
+    report = simulator.run(records)
+
+    assert report.records == 14
+    assert report.unmatched == 1
+    login, api = report.rules
+    assert (login.requests, login.rejected) == (12, 7)
+    assert login.rejection_rate == pytest.approx(7 / 12)
+    assert login.top_keys() == [("ip:a", 10, 7)]
+    assert login.key_percentiles((50, 100)) == {
+        "requests": {50: 2, 100: 10},
+        "rejected": {50: 0, 100: 7},
+    }
+    assert (api.requests, api.rejected, api.top_keys()) == (1, 0, [])
+
+
+def test_replay_validation():
+    with pytest.raises(ValueError):
+        ReplaySimulator([])
+    with pytest.raises(ValueError):
+        ReplaySimulator([make_rule("/a", 1, 1)], resolution=-1)
+    with pytest.raises(ValueError):
+        ReplaySimulator([make_rule("/a", 1, 1)], algorithm="fixed_window").run([])
+
+
+@pytest.mark.asyncio
+async def test_throtty_simulate_leaves_live_counters_alone(throtty):
+    throtty.add_rule("/api/*", limit=2, window=60)
+
+    report = throtty.simulate((float(i), "/api/x", "ip:a") for i in range(5))
+
+    assert (report.rules[0].requests, report.rules[0].rejected) == (5, 3)
+    result = await throtty.engine.execute(key="ip:a", limit=2, window=60)
+    assert result.allowed
+
+
+def test_replay_decides_rules_on_their_engines(throtty):
+    throtty.add_engine("buckets", algorithm="token_bucket")
+    throtty.add_rule("/a", limit=5, window=10)
+    throtty.add_rule("/b", limit=5, window=10, engine="buckets")
+    rng = random.Random(3)
+    records, now = [], 1000.0
+    for _ in range(2000):
+        now += rng.choice([0.0, 0.0, 0.05, 0.5, 3.0])
+        records.append((now, rng.choice(["/a", "/b"]), f"ip:{rng.randint(1, 2)}"))
+
+    report = throtty.simulate(records, resolution=0)
+
+    clock = ManualClock()
+    live = {
+        "/a": SyncThrottyCore(algorithm="slidingwindow_counter", clock=clock),
+        "/b": SyncThrottyCore(algorithm="token_bucket", clock=clock),
+    }
+    rejected = {"/a": 0, "/b": 0}
+    for timestamp, path, key in records:
+        clock.set(timestamp)
+        if not live[path].execute(key=key, limit=5, window=10).allowed:
+            rejected[path] += 1
+    assert [rule.rejected for rule in report.rules] == [rejected["/a"], rejected["/b"]]
+    assert rejected["/a"] > 0 and rejected["/b"] > 0
+
+
+def test_replay_charges_quota_levels_as_one_chain(throtty, caplog):
+    throtty.add_hierarchical_rule("/r", levels=[(None, 2, 60), ("global", 3, 60)])
+    records = [(float(i), "/r", key) for i, key in enumerate("aaabb")]
+
+    report = throtty.simulate(((t, path, f"ip:{k}") for t, path, k in records))
+
+    [rule] = report.rules
+    # the third request of a fills its own level and is refused without touching the
+    # shared one, so b still gets one request in before the global level runs out
+    assert (rule.requests, rule.rejected) == (5, 2)
+    assert rule.keys == {"ip:a": [3, 1], "ip:b": [2, 1]}
+    assert not caplog.records
+
+    throtty.add_hierarchical_rule(
+        "/s", levels=[(lambda *_: "user", 2, 60), (lambda *_: "org", 3, 60)]
+    )
+    throtty.simulate([])
+    assert "record key" in caplog.text
+
+
+def test_cli_simulate(tmp_path, capsys, throtty):
+    log = tmp_path / "access.jsonl"
+    log.write_text(
+        "".join(
+            json.dumps({"timestamp": i, "path": "/login", "ip": "1.2.3.4"}) + "\n"
+            for i in range(4)
+        )
+    )
+
+    cli.main(["simulate", str(log), "--rule", "/login=1/60", "--json"])
+
+    output = json.loads(capsys.readouterr().out)
+    assert output["records"] == 4
+    assert output["rules"][0]["rejected"] == 3
+    assert output["rules"][0]["top_keys"] == [["ip:1.2.3.4", 4, 3]]
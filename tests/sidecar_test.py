@@ -0,0 +1,125 @@
+# ruff: noqa
+
+import asyncio
+import pytest
+
+from core._internals.infrastructure.sidecar import SidecarServer
+from core._internals.infrastructure.sidecar.protocol import (
+    OP_WINDOWS,
+    OP_BUCKETS,
+    decode_request,
+    decode_response,
+    encode_request,
+    encode_response,
+    parse_address,
+    split_frames,
+)
+from core._internals.infrastructure.storage import InMemStorage, SidecarStorage
+from core._internals.application.use_cases.rate_limit import CheckRateLimitUC
+from core._internals.domain.exceptions import SidecarError
+from core._internals.domain.interfaces.consume_storage import ConsumeStorageInterface
+from core._internals.domain.interfaces.storage import StorageInterface
+from core._internals.domain.models import (
+    WindowConsume,
+    BucketConsume,
+    ConsumeResult,
+)
+
+
+class FailingStorage(InMemStorage):
+    async def consume_buckets(self, requests, atomic=False):
+        raise RuntimeError("boom")
+
+
+def test_protocol_roundtrip():
+    requests = [
+        WindowConsume("ip:1", 10, 9, 0.25, 100, 1, 120),
+        WindowConsume("user:ü", 10, 9, 1.0, 5, 3, 120),
+    ]
+    buffer = bytearray(encode_request(7, OP_WINDOWS, requests, atomic=True))
+    buffer += encode_response(8, [ConsumeResult(True, 2.5)])[:5]
+
+    [frame] = split_frames(buffer)
+
+    assert decode_request(frame) == (7, OP_WINDOWS, True, requests)
+    assert len(buffer) == 5
+
+
+def test_response_roundtrip_and_addresses():
+    [frame] = split_frames(bytearray(encode_response(3, [ConsumeResult(False, 0.5)])))
+
+    assert decode_response(frame) == (3, [ConsumeResult(False, 0.5)])
+    assert parse_address("unix:///run/t.sock") == ("unix", "/run/t.sock")
+    assert parse_address("tcp://127.0.0.1:7000") == ("tcp", ("127.0.0.1", 7000))
+    with pytest.raises(ValueError):
+        parse_address("redis://localhost")
+
+
+@pytest.mark.asyncio
+async def test_processes_share_sidecar_state(tmp_path):
+    address = f"unix://{tmp_path / 'throtty.sock'}"
+    server = SidecarServer(storage=InMemStorage(), address=address)
+    await server.start()
+    first = CheckRateLimitUC(storage=SidecarStorage(address), algo="token_bucket")
+    second = CheckRateLimitUC(storage=SidecarStorage(address), algo="token_bucket")
+
+    # pipelined on one connection, then a second client sees the same buckets
+    results = await asyncio.gather(
+        *(first.execute(key="ip:1", limit=50, window=60) for _ in range(40))
+    )
+    batch = await second.execute_many([("ip:1", 50, 60)] * 15)
+
+    assert all(result.allowed for result in results)
+    assert [result.allowed for result in batch] == [True] * 10 + [False] * 5
+    await first.flow._storage.close()
+    await second.flow._storage.close()
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_sidecar_errors_reach_the_caller():
+    server = SidecarServer(storage=FailingStorage(), address="tcp://127.0.0.1:0")
+    await server.start()
+    port = server.sockets[0].getsockname()[1]
+    storage = SidecarStorage(f"tcp://127.0.0.1:{port}")
+    request = BucketConsume("ip:1", 10, 1.0, 1.0, 1, 60)
+
+    with pytest.raises(SidecarError):
+        await storage.consume_buckets([request])
+    [result] = await storage.consume_windows(
+        [WindowConsume("ip:1", 10, 9, 1.0, 5, 1, 120)]
+    )
+    assert result.allowed
+
+    await server.close()
+    with pytest.raises(ConnectionError):
+        await storage.consume_buckets([request])
+    await storage.close()
+
+
+def test_sidecar_storage_only_offers_consume_operations():
+    storage = SidecarStorage(address="tcp://:7000")
+
+    assert isinstance(storage, ConsumeStorageInterface)
+    assert not isinstance(storage, StorageInterface)
+    assert not hasattr(storage, "increment_windows")
+
+
+@pytest.mark.asyncio
+async def test_stalled_sidecar_times_out():
+    # accepts connections and reads requests, never answers
+    async def stall(reader, writer):
+        await reader.read()
+
+    server = await asyncio.start_server(stall, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    storage = SidecarStorage(f"tcp://127.0.0.1:{port}", timeout=0.05)
+    request = BucketConsume("ip:1", 10, 1.0, 1.0, 1, 60)
+
+    with pytest.raises(TimeoutError):
+        await storage.consume_buckets([request])
+    assert not storage.client._pending
+    assert SidecarStorage(address="tcp://:7000").client.timeout == 5.0
+    await storage.close()
+    server.close()
+    await server.wait_closed()
@@ -0,0 +1,118 @@
+# ruff: noqa
+
+import os
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+from redis import Redis
+
+from core._internals.infrastructure.throtty import SyncThrottyCore
+from core._internals.infrastructure.storage import (
+    InMemStorage,
+    SyncInMemStorage,
+    SyncRedisStorage,
+    RedisStorage,
+    ThrottyRedis,
+)
+from core._internals.domain.models import WindowConsume
+from core._internals.domain.exceptions import RedisError
+
+REDIS_URL = os.environ.get("THROTTY_REDIS_URL")
+
+
+@pytest.mark.parametrize(
+    "algorithm", ["slidingwindow_counter", "slidingwindow_log", "token_bucket"]
+)
+def test_sync_engine_is_thread_safe(algorithm):
+    core = SyncThrottyCore(algorithm=algorithm, stripes=4)
+
+    def check(i):
+        return core.execute(key=f"ip:{i % 4}", limit=100, window=3600).allowed
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        allowed = list(pool.map(check, range(2000)))
+
+    assert sum(allowed) == 400
+    core.close()
+
+
+def test_sync_metrics_count_every_thread():
+    core = SyncThrottyCore(stripes=4)
+
+    def check(i):
+        core.execute(key=f"ip:{i % 4}", limit=100, window=3600)
+        core.execute_many([(f"ip:{i % 4}", 100, 3600)] * 2)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(check, range(2000)))
+
+    metrics = core.metrics()
+    assert metrics["decisions"] == 6000
+    assert metrics["rejected"] == 6000 - 400
+    core.close()
+
+
+def test_sync_atomic_batch_spans_stripes():
+    core = SyncThrottyCore(stripes=8)
+    keys = [f"user:{i}" for i in range(16)]
+
+    assert core.execute(key="user:3", limit=1, window=60).allowed
+    results = core.execute_many([(key, 1, 60) for key in keys], atomic=True)
+    assert not any(result.allowed for result in results)
+
+    results = core.execute_many([(key, 1, 60) for key in keys if key != "user:3"])
+    assert all(result.allowed for result in results)
+
+
+def test_sync_in_mem_matches_async_decisions():
+    import asyncio
+
+    requests = [
+        WindowConsume(
+            key=f"k{i % 3}",
+            current_window=10,
+            previous_window=9,
+            weight=0.5,
+            limit=4,
+            cost=1 + i % 2,
+            ttl=20,
+        )
+        for i in range(12)
+    ]
+    expected = asyncio.run(InMemStorage().consume_windows(requests))
+
+    assert SyncInMemStorage(stripes=2).consume_windows(requests) == expected
+    assert SyncInMemStorage(stripes=1).consume_windows([]) == []
+
+
+def test_sync_core_validation():
+    with pytest.raises(TypeError):
+        SyncThrottyCore(redis="not-a-client")
+    with pytest.raises(RedisError):
+        SyncThrottyCore(redis=Redis(), redis_dsn="redis://localhost:6379/0")
+    with pytest.raises(ValueError):
+        SyncInMemStorage(stripes=0)
+
+
+@pytest.mark.skipif(not REDIS_URL, reason="THROTTY_REDIS_URL not set")
+@pytest.mark.asyncio
+async def test_sync_redis_shares_counters_with_async():
+    key = f"test:sync:{os.getpid()}"
+    request = WindowConsume(
+        key=key,
+        current_window=2,
+        previous_window=1,
+        weight=0.0,
+        limit=2,
+        cost=1,
+        ttl=10,
+    )
+    sync_storage = SyncRedisStorage(redis=Redis.from_url(REDIS_URL))
+    redis = ThrottyRedis(dsn=REDIS_URL)
+
+    assert sync_storage.consume_windows([request])[0].allowed
+    [consumed] = await RedisStorage(redis=redis).consume_windows([request])
+    assert consumed.allowed and consumed.remaining == 0
+    assert not sync_storage.consume_windows([request])[0].allowed
+    sync_storage.redis.delete(f"{{{key}}}:w:2")
+    await redis.close_redis()
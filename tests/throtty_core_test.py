@@ -7,13 +7,26 @@ from core._internals.infrastructure.throtty.core import ThrottyCore
 from core._internals.domain.exceptions import RedisError
 from core._internals.domain.enums import StorageType
 from core._internals.domain.models.rate_limit_result import RateLimitResult
+from core._internals.infrastructure.storage import (
+    RedisStorage,
+    HybridStorage,
+    CircuitBreakerStorage,
+    PeerStorage,
+    SidecarStorage,
+)
 import core._internals.infrastructure.throtty.core as throtty_core_mod
 
 
 class MockThrottyRedis:
-    def __init__(self, *, redis=None, pool=None, dsn=None, max_connections=10):
+    def __init__(
+        self, *, redis=None, pool=None, dsn=None, max_connections=10, cluster=False
+    ):
         self.init_args = dict(
-            redis=redis, pool=pool, dsn=dsn, max_connections=max_connections
+            redis=redis,
+            pool=pool,
+            dsn=dsn,
+            max_connections=max_connections,
+            cluster=cluster,
         )
         self.is_closed = False
 
@@ -22,15 +35,30 @@ class MockThrottyRedis:
 
 
 class MockUCTrue:
-    def __init__(self, storage, algo):
-        self.input_args = dict(storage=storage, algo=algo)
+    def __init__(self, storage, algo, clock=None, stagger=False, retry_jitter=0):
+        self.input_args = dict(
+            storage=storage,
+            algo=algo,
+            clock=clock,
+            stagger=stagger,
+            retry_jitter=retry_jitter,
+        )
 
-    async def execute(self, key, limit, window):
-        self.execute_args = dict(key=key, limit=limit, window=window)
+    async def execute(self, key, limit, window, cost=1):
+        self.execute_args = dict(key=key, limit=limit, window=window, cost=cost)
         return RateLimitResult(
             allowed=True, limit=limit, remaining=float(10), reset_at=float(10)
         )
 
+    async def execute_many(self, requests, atomic=False):
+        self.execute_many_args = dict(requests=requests, atomic=atomic)
+        return [
+            RateLimitResult(
+                allowed=True, limit=request[1], remaining=float(10), reset_at=float(10)
+            )
+            for request in requests
+        ]
+
 
 class MockInMem:
     def __init__(self):
@@ -94,7 +122,8 @@ async def test_core_redis_instance_init(monkeypatch):
     assert core._storage_instance.is_closed == True
     assert isinstance(core.flow, MockUCTrue)
     assert core.flow.input_args.get("algo") == "slidingwindow_counter"
-    assert isinstance(core.flow.input_args.get("storage"), MockThrottyRedis)
+    assert isinstance(core.flow.input_args.get("storage"), RedisStorage)
+    assert isinstance(core.flow.input_args.get("storage").storage, MockThrottyRedis)
     assert res is not None
     assert res.allowed == True
     assert res.limit == mock_limit
@@ -116,7 +145,8 @@ async def test_core_redis_dsn_init(monkeypatch):
     assert core._storage_instance.is_closed == True
     assert isinstance(core.flow, MockUCTrue)
     assert core.flow.input_args.get("algo") == "slidingwindow_counter"
-    assert isinstance(core.flow.input_args.get("storage"), MockThrottyRedis)
+    assert isinstance(core.flow.input_args.get("storage"), RedisStorage)
+    assert isinstance(core.flow.input_args.get("storage").storage, MockThrottyRedis)
     assert res is not None
     assert res.allowed == True
     assert res.limit == mock_limit
@@ -139,12 +169,26 @@ async def test_core_redis_pool_init(monkeypatch):
     assert core._storage_instance.is_closed == True
     assert isinstance(core.flow, MockUCTrue)
     assert core.flow.input_args.get("algo") == "slidingwindow_counter"
-    assert isinstance(core.flow.input_args.get("storage"), MockThrottyRedis)
+    assert isinstance(core.flow.input_args.get("storage"), RedisStorage)
+    assert isinstance(core.flow.input_args.get("storage").storage, MockThrottyRedis)
     assert res is not None
     assert res.allowed == True
     assert res.limit == mock_limit
 
 
+@pytest.mark.asyncio
+async def test_core_redis_cluster_dsn_init(monkeypatch):
+    monkeypatch.setattr(throtty_core_mod, "ThrottyRedis", MockThrottyRedis)
+    monkeypatch.setattr(throtty_core_mod, "CheckRateLimitUC", MockUCTrue)
+
+    core = ThrottyCore(redis_dsn="redis://localhost:7000", redis_cluster=True)
+    await core.close()
+
+    assert core._storage == StorageType.redis
+    assert core._storage_instance.init_args.get("cluster") == True
+    assert isinstance(core.flow.input_args.get("storage"), RedisStorage)
+
+
 def test_core_init_all_types_redis(monkeypatch):
     monkeypatch.setattr(throtty_core_mod, "Redis", MockRedis)
     monkeypatch.setattr(throtty_core_mod, "ThrottyRedis", MockThrottyRedis)
@@ -177,3 +221,99 @@ def test_core_redis_dsn_not_a_dsn():
 
     with pytest.raises(ValueError):
         _core = ThrottyCore(redis_dsn=mock_dsn)
+
+
+@pytest.mark.asyncio
+async def test_core_hybrid_init(monkeypatch):
+    monkeypatch.setattr(throtty_core_mod, "ThrottyRedis", MockThrottyRedis)
+    monkeypatch.setattr(throtty_core_mod, "CheckRateLimitUC", MockUCTrue)
+
+    core = ThrottyCore(
+        redis_dsn="redis://localhost:6379", hybrid=True, flush_interval=0.05
+    )
+    await core.close()
+
+    assert core._storage == StorageType.hybrid
+    assert isinstance(core._storage_instance, MockThrottyRedis)
+    assert core._storage_instance.is_closed == True
+    assert isinstance(core.flow.input_args.get("storage"), HybridStorage)
+    assert core.flow.input_args.get("storage").flush_interval == 0.05
+
+
+def test_core_hybrid_without_redis():
+    with pytest.raises(RedisError):
+        _core = ThrottyCore(hybrid=True)
+
+
+@pytest.mark.asyncio
+async def test_core_execute_many(monkeypatch):
+    monkeypatch.setattr(throtty_core_mod, "CheckRateLimitUC", MockUCTrue)
+    requests = [(mock_key, mock_limit, mock_window), ("org:1", 100, 3600, 2)]
+
+    core = ThrottyCore()
+    res = await core.execute_many(requests, atomic=True)
+
+    assert core.flow.execute_many_args == dict(requests=requests, atomic=True)
+    assert [r.limit for r in res] == [mock_limit, 100]
+
+
+def test_core_circuit_breaker_wraps_redis(monkeypatch):
+    monkeypatch.setattr(throtty_core_mod, "ThrottyRedis", MockThrottyRedis)
+
+    core = ThrottyCore(redis_dsn="redis://localhost:6379/0", circuit_breaker=True)
+
+    assert isinstance(core.flow.flow._storage, CircuitBreakerStorage)
+    assert isinstance(core.breaker.storage, RedisStorage)
+    assert core.breaker.fallback_divisor == 1
+
+
+def test_core_circuit_breaker_needs_plain_redis(monkeypatch):
+    monkeypatch.setattr(throtty_core_mod, "ThrottyRedis", MockThrottyRedis)
+
+    for options in (
+        dict(),
+        dict(redis_dsn="redis://localhost:6379/0", hybrid=True),
+        dict(sidecar="tcp://:7000"),
+        dict(peer_transport=MockTransport()),
+    ):
+        with pytest.raises(ValueError):
+            ThrottyCore(circuit_breaker=True, **options)
+
+
+class MockTransport:
+    async def close(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_core_peer_init(monkeypatch):
+    monkeypatch.setattr(throtty_core_mod, "ThrottyRedis", MockThrottyRedis)
+    transport = MockTransport()
+
+    core = ThrottyCore(peer_transport=transport, flush_interval=0.5)
+
+    assert core._storage == StorageType.peer
+    assert isinstance(core.flow.flow._storage, PeerStorage)
+    assert core._storage_instance.sync_interval == 0.5
+    with pytest.raises(ValueError):
+        ThrottyCore(redis_dsn="redis://localhost:6379/0", peer_transport=transport)
+
+
+@pytest.mark.asyncio
+async def test_core_sidecar_init():
+    core = ThrottyCore(sidecar="unix:///tmp/throtty-test.sock")
+
+    assert core._storage == StorageType.sidecar
+    assert isinstance(core.backend, SidecarStorage)
+    await core.close()
+    with pytest.raises(ValueError):
+        ThrottyCore(redis_dsn="redis://localhost:6379/0", sidecar="tcp://:7000")
+
+
+def test_core_keeps_positional_arguments():
+    # options added over time are keyword-only and can't shift the original ones
+    core = ThrottyCore(None, None, None, 10, "token_bucket")
+
+    assert core.algorithm == "token_bucket"
+    with pytest.raises(TypeError):
+        ThrottyCore(None, None, None, 10, "token_bucket", True)
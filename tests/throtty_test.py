@@ -4,8 +4,17 @@ import pytest
 from unittest.mock import MagicMock, AsyncMock
 import json
 
-from core.limiter import Throtty, ThrottyMiddleware, rule
+from core.limiter import (
+    Throtty,
+    ThrottyMiddleware,
+    ThrottyASGI,
+    MessageLimiter,
+    RuleChecker,
+    rule,
+)
+from core import Key
 from core._internals.domain.models.rate_limit_result import RateLimitResult
+from core._internals.domain.services.bandwidth import BandwidthLimiter
 import core.limiter as throtty_mod
 
 
@@ -336,7 +345,7 @@ async def test_middleware_non_http(monkeypatch):
     mock_app = MockApp()
     middleware = ThrottyMiddleware(mock_app, throtty)
 
-    scope = {"type": "websocket"}
+    scope = {"type": "lifespan"}
     receive = AsyncMock()
     send = AsyncMock()
 
@@ -410,6 +419,91 @@ async def test_middleware_global_key_extractor(monkeypatch):
     assert mock_app.called == True
 
 
+def test_add_hierarchical_rule(monkeypatch):
+    """Test adding a rule with nested quota levels"""
+    monkeypatch.setattr(throtty_mod, "ThrottyCore", MockThrottyCore)
+
+    Throtty._instance = None
+    Throtty._initialized = False
+
+    def by_user(host, headers):
+        return f"user:{headers.get('x-user-id')}"
+
+    throtty = Throtty()
+    throtty.add_hierarchical_rule(
+        "/api/*", levels=[(by_user, 10, 60), ("global:/api", 100, 60)]
+    )
+
+    levels = throtty.rules[0]["levels"]
+    assert throtty.rules[0]["pattern"].match("/api/users")
+    assert [level["key_func"] for level in levels] == [by_user, "global:/api"]
+    assert levels[1]["window"].total_seconds() == 60
+    with pytest.raises(ValueError):
+        throtty.add_hierarchical_rule("/api/*", levels=[])
+
+
+@pytest.mark.asyncio
+async def test_middleware_hierarchical_rule():
+    """Test that a chain of quotas is charged together and reports the exhausted level"""
+    Throtty._instance = None
+    Throtty._initialized = False
+
+    def by_user(host, headers):
+        return f"user:{headers['x-user-id']}"
+
+    throtty = Throtty()
+    throtty.add_hierarchical_rule(
+        "/api/reports", levels=[(by_user, 2, 60), ("org:acme", 3, 60)]
+    )
+    middleware = ThrottyMiddleware(MockApp(), throtty)
+
+    async def call(user):
+        send = AsyncMock()
+        scope = {
+            "type": "http",
+            "path": "/api/reports",
+            "client": ("127.0.0.1", 8000),
+            "headers": [(b"x-user-id", user.encode())],
+        }
+        await middleware(scope, AsyncMock(), send)
+        if not send.call_count:
+            return None
+        return dict(send.call_args_list[0][0][0]["headers"])[b"X-RateLimit-Limit"]
+
+    # the refused third request of user 1 must not eat into the organization quota
+    assert [await call(user) for user in ("1", "1", "1", "2", "2")] == [
+        None,
+        None,
+        b"2",
+        None,
+        b"3",
+    ]
+    await throtty.engine.close()
+
+
+def test_rule_checker_reads_scopes_and_environs_alike():
+    Throtty._instance = None
+    Throtty._initialized = False
+    throtty = Throtty()
+    asgi, wsgi = RuleChecker.for_asgi(throtty), RuleChecker.for_wsgi(throtty)
+    scope = {
+        "client": ("10.0.0.1", 1),
+        "headers": [(b"x-api-key", b"abc"), (b"content-type", b"text/plain")],
+    }
+    environ = {
+        "REMOTE_ADDR": "10.0.0.1",
+        "HTTP_X_API_KEY": "abc",
+        "CONTENT_TYPE": "text/plain",
+    }
+    by_header = lambda host, headers: f"{host}:{headers['x-api-key']}"
+
+    for key_func in ("fixed", None, by_header, Key.header("x-api-key").compile()):
+        assert asgi.key(key_func, scope) == wsgi.key(key_func, environ)
+    assert asgi.key(lambda host, headers: headers, scope) == wsgi.key(
+        lambda host, headers: headers, environ
+    )
+
+
 def test_install_with_middleware_support(monkeypatch):
     """Test installing middleware on supported app"""
     monkeypatch.setattr(throtty_mod, "ThrottyCore", MockThrottyCore)
@@ -447,3 +541,487 @@ def test_install_without_middleware_support(monkeypatch):
 
     with pytest.raises(NotImplementedError):
         throtty.install(app)
+
+
+@pytest.mark.asyncio
+async def test_wrap_allowed_request(monkeypatch):
+    """Test wrapped app with allowed request and cached route"""
+    monkeypatch.setattr(throtty_mod, "ThrottyCore", MockThrottyCore)
+
+    Throtty._instance = None
+    Throtty._initialized = False
+
+    throtty = Throtty()
+    throtty.add_rule("/api/users", limit=10, window=60)
+
+    mock_app = MockApp()
+    app = throtty.wrap(mock_app)
+    scope = {"type": "http", "path": "/api/users", "headers": []}
+
+    await app(scope, AsyncMock(), AsyncMock())
+
+    assert isinstance(app, ThrottyASGI)
+    assert mock_app.called == True
+    assert throtty.engine.execute_args["key"] == "ip:default"
+    assert app._routes["/api/users"] == (throtty.rules[0], [])
+
+    throtty.add_rule("/api/orders", limit=5, window=60)
+    await app(scope, AsyncMock(), AsyncMock())
+    assert list(app._routes) == ["/api/users"]
+
+
+@pytest.mark.asyncio
+async def test_wrap_blocked_request(monkeypatch):
+    """Test wrapped app with blocked HTTP request"""
+    monkeypatch.setattr(throtty_mod, "ThrottyCore", MockThrottyCoreBlocked)
+
+    Throtty._instance = None
+    Throtty._initialized = False
+
+    throtty = Throtty()
+    throtty.add_rule("/api/*", limit=10, window=60, key_func=lambda host, h: h["x"])
+
+    mock_app = MockApp()
+    send = AsyncMock()
+    scope = {
+        "type": "http",
+        "path": "/api/users",
+        "client": ("127.0.0.1", 8000),
+        "headers": [(b"x", b"tenant")],
+    }
+
+    await throtty.wrap(mock_app)(scope, AsyncMock(), send)
+
+    assert mock_app.called == False
+    start, body = [c[0][0] for c in send.call_args_list]
+    assert start["status"] == 429
+    assert dict(start["headers"])[b"retry-after"] == b"60"
+    assert json.loads(body["body"]) == "Rate limit exceeded"
+
+
+@pytest.mark.asyncio
+async def test_wrap_blocked_websocket(monkeypatch):
+    """Test wrapped app refusing websocket handshakes"""
+    monkeypatch.setattr(throtty_mod, "ThrottyCore", MockThrottyCoreBlocked)
+
+    Throtty._instance = None
+    Throtty._initialized = False
+
+    throtty = Throtty()
+    throtty.add_rule("/ws", limit=10, window=60)
+
+    mock_app = MockApp()
+    app = throtty.wrap(mock_app)
+    scope = {"type": "websocket", "path": "/ws", "client": ("127.0.0.1", 8000)}
+    receive = AsyncMock(return_value={"type": "websocket.connect"})
+
+    send = AsyncMock()
+    await app(scope, receive, send)
+    assert send.call_args_list[0][0][0] == {"type": "websocket.close", "code": 1008}
+
+    send = AsyncMock()
+    scope["extensions"] = {"websocket.http.response": {}}
+    await app(scope, receive, send)
+    start, body = [c[0][0] for c in send.call_args_list]
+    assert start["type"] == "websocket.http.response.start"
+    assert start["status"] == 429
+    assert body["type"] == "websocket.http.response.body"
+    assert mock_app.called == False
+
+
+@pytest.mark.asyncio
+async def test_wrap_passes_through_lifespan(monkeypatch):
+    """Test wrapped app forwarding non-connection scopes"""
+    monkeypatch.setattr(throtty_mod, "ThrottyCore", MockThrottyCoreBlocked)
+
+    Throtty._instance = None
+    Throtty._initialized = False
+
+    throtty = Throtty()
+    throtty.add_rule("/*", limit=10, window=60)
+
+    mock_app = MockApp()
+    await throtty.wrap(mock_app)({"type": "lifespan"}, AsyncMock(), AsyncMock())
+
+    assert mock_app.called == True
+
+
+@pytest.mark.asyncio
+async def test_middleware_blocked_websocket(monkeypatch):
+    """Test middleware refusing a websocket handshake"""
+    monkeypatch.setattr(throtty_mod, "ThrottyCore", MockThrottyCoreBlocked)
+
+    Throtty._instance = None
+    Throtty._initialized = False
+
+    throtty = Throtty()
+    throtty.add_rule("/ws", limit=10, window=60)
+
+    mock_app = MockApp()
+    middleware = ThrottyMiddleware(mock_app, throtty)
+    scope = {
+        "type": "websocket",
+        "path": "/ws",
+        "client": ("127.0.0.1", 8000),
+        "headers": [],
+    }
+    receive = AsyncMock(return_value={"type": "websocket.connect"})
+    send = AsyncMock()
+
+    await middleware(scope, receive, send)
+
+    assert mock_app.called == False
+    assert send.call_args_list[0][0][0] == {"type": "websocket.close", "code": 1008}
+
+
+@pytest.mark.asyncio
+async def test_websocket_message_limit(monkeypatch):
+    """Test inbound websocket messages limited per connection"""
+    monkeypatch.setattr(throtty_mod, "ThrottyCore", MockThrottyCore)
+
+    Throtty._instance = None
+    Throtty._initialized = False
+
+    throtty = Throtty()
+    throtty.add_rule("/ws", limit=10, window=60, message_limit=2, message_window=60)
+    messages = [
+        {"type": "websocket.connect"},
+        {"type": "websocket.receive", "text": "a"},
+        {"type": "websocket.receive", "bytes": b"b"},
+        {"type": "websocket.receive", "text": "c"},
+    ]
+    received = []
+
+    async def app(scope, receive, send):
+        for _ in messages:
+            received.append((await receive())["type"])
+
+    for wrapped in (ThrottyMiddleware(app, throtty), throtty.wrap(app)):
+        received.clear()
+        send = AsyncMock()
+        scope = {"type": "websocket", "path": "/ws", "headers": []}
+
+        await wrapped(scope, AsyncMock(side_effect=messages), send)
+
+        assert received == [
+            "websocket.connect",
+            "websocket.receive",
+            "websocket.receive",
+            "websocket.disconnect",
+        ]
+        assert send.call_args_list[0][0][0] == {"type": "websocket.close", "code": 1008}
+
+
+@pytest.mark.asyncio
+async def test_websocket_message_bytes_limit():
+    """Test message limit counting bytes"""
+    messages = [
+        {"type": "websocket.receive", "text": "héllo"},
+        {"type": "websocket.receive", "bytes": b"12345"},
+    ]
+    send = AsyncMock()
+    limiter = MessageLimiter(
+        AsyncMock(side_effect=messages),
+        send,
+        {"limit": 10, "window": 60, "by_bytes": True},
+    )
+
+    assert (await limiter())["text"] == "héllo"
+    assert (await limiter())["type"] == "websocket.disconnect"
+    assert (await limiter())["type"] == "websocket.disconnect"
+    assert send.call_count == 1
+
+
+def test_add_rule_invalid_message_limit(monkeypatch):
+    """Test message limit validation"""
+    monkeypatch.setattr(throtty_mod, "ThrottyCore", MockThrottyCore)
+
+    Throtty._instance = None
+    Throtty._initialized = False
+
+    throtty = Throtty()
+    with pytest.raises(ValueError):
+        throtty.add_rule("/ws", limit=10, window=60, message_limit=0)
+
+
+@pytest.mark.asyncio
+async def test_bandwidth_rule_paces_bodies(monkeypatch):
+    """Test bandwidth rules pacing request and response bodies"""
+    monkeypatch.setattr(throtty_mod, "ThrottyCore", MockThrottyCore)
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(round(delay, 2))
+
+    monkeypatch.setattr(throtty_mod.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(throtty_mod, "monotonic", lambda: 100.0)
+
+    Throtty._instance = None
+    Throtty._initialized = False
+
+    throtty = Throtty()
+    throtty.add_bandwidth_rule("/files/*", rate=100, direction="upload")
+    throtty.add_bandwidth_rule("/files/*", rate=1000, burst=100, key_func="route")
+    chunks = [
+        {"type": "http.request", "body": b"x" * 100, "more_body": True},
+        {"type": "http.request", "body": b"x" * 50, "more_body": False},
+    ]
+
+    async def app(scope, receive, send):
+        await receive()
+        await receive()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"y" * 200})
+
+    send = AsyncMock()
+    scope = {"type": "http", "path": "/files/a", "headers": []}
+    await ThrottyMiddleware(app, throtty)(scope, AsyncMock(side_effect=chunks), send)
+
+    # first chunk fits both bursts, the second owes 50 bytes at 100 B/s, the response
+    # owes 250 bytes to the route at 1000 B/s
+    assert sleeps == [0.5, 0.25]
+    assert send.call_count == 2
+
+    sleeps.clear()
+    scope["client"] = ("10.0.0.2", 1)
+    await throtty.wrap(app)(scope, AsyncMock(side_effect=chunks), AsyncMock())
+    # a new client has its own upload bucket but queues behind the route bucket
+    assert sleeps == [0.35, 0.5, 0.6]
+    assert len(throtty.bandwidth_rules[0]["limiter"]) == 2
+
+
+def test_bandwidth_limiter_sweeps_full_buckets():
+    limiter = BandwidthLimiter(rate=10, burst=10)
+
+    assert limiter.reserve("a", 5, now=0.0) == 0.0
+    assert limiter.reserve("a", 10, now=0.0) == 0.5
+    assert limiter.reserve("a", 5, now=1.0) == 0.0
+    for i in range(1023):
+        limiter.reserve(f"k{i}", 1, now=1.0)
+    limiter.reserve("late", 1, now=1.5)
+
+    # the idle keys refilled by then, "a" is still short
+    assert len(limiter) == 2
+
+
+def test_add_bandwidth_rule_invalid(monkeypatch):
+    monkeypatch.setattr(throtty_mod, "ThrottyCore", MockThrottyCore)
+
+    Throtty._instance = None
+    Throtty._initialized = False
+
+    throtty = Throtty()
+    with pytest.raises(ValueError):
+        throtty.add_bandwidth_rule("/files/*", rate=0)
+    with pytest.raises(ValueError):
+        throtty.add_bandwidth_rule("/files/*", rate=10, direction="sideways")
+
+
+def test_wrap_wsgi(monkeypatch):
+    """Test WSGI middleware on a sync Throtty"""
+    Throtty._instance = None
+    Throtty._initialized = False
+
+    throtty = Throtty(sync=True)
+    throtty.add_rule(
+        "/api/*", limit=1, window=60, key_func=lambda host, h: h["x-api-key"]
+    )
+    calls = []
+
+    def app(environ, start_response):
+        start_response("200 OK", [])
+        return [b"ok"]
+
+    def start_response(status, headers):
+        calls.append((status, dict(headers)))
+
+    wrapped = throtty.wrap_wsgi(app)
+    environ = {"PATH_INFO": "/api/users", "HTTP_X_API_KEY": "k1"}
+
+    assert wrapped(environ, start_response) == [b"ok"]
+    assert json.loads(wrapped(environ, start_response)[0]) == "Rate limit exceeded"
+    assert wrapped({"PATH_INFO": "/health"}, start_response) == [b"ok"]
+    assert [status for status, _ in calls] == [
+        "200 OK",
+        "429 Too Many Requests",
+        "200 OK",
+    ]
+    assert calls[1][1]["X-RateLimit-Limit"] == "1"
+    with pytest.raises(ValueError):
+        throtty.wrap(app)
+
+
+def test_wrap_wsgi_requires_sync(monkeypatch):
+    """Test WSGI and sync mode misconfiguration"""
+    monkeypatch.setattr(throtty_mod, "ThrottyCore", MockThrottyCore)
+
+    Throtty._instance = None
+    Throtty._initialized = False
+
+    with pytest.raises(ValueError):
+        Throtty(sync=True, hybrid=True)
+
+    throtty = Throtty()
+    with pytest.raises(ValueError):
+        throtty.wrap_wsgi(MockApp())
+
+
+@pytest.mark.asyncio
+async def test_rules_routed_to_named_engines():
+    """Test rules decided by their own engine, each with its own counters"""
+    Throtty._instance = None
+    Throtty._initialized = False
+
+    throtty = Throtty(algorithm="token_bucket")
+    strict = throtty.add_engine("strict", algorithm="slidingwindow_log")
+    throtty.add_rule("/api/*", limit=10, window=60)
+    throtty.add_rule("/login", limit=1, window=60, engine="strict")
+    app = throtty.wrap(MockApp())
+
+    async def call(path):
+        send = AsyncMock()
+        scope = {"type": "http", "path": path, "client": ("10.0.0.1", 1), "headers": []}
+        await app(scope, AsyncMock(), send)
+        return send.call_count == 0
+
+    assert [await call("/login") for _ in range(2)] == [True, False]
+    assert await call("/api/users")
+    assert throtty.rules[1]["engine"] is strict
+    metrics = throtty.metrics()
+    assert metrics["default"]["algorithm"] == "token_bucket"
+    assert (metrics["default"]["decisions"], metrics["default"]["rejected"]) == (1, 0)
+    assert metrics["strict"]["algorithm"] == "slidingwindow_log"
+    assert (metrics["strict"]["decisions"], metrics["strict"]["rejected"]) == (2, 1)
+    for engine in throtty.engines.values():
+        await engine.close()
+
+
+def test_add_engine_invalid(monkeypatch):
+    """Test engine registration and routing errors"""
+    monkeypatch.setattr(throtty_mod, "ThrottyCore", MockThrottyCore)
+
+    Throtty._instance = None
+    Throtty._initialized = False
+
+    throtty = Throtty()
+    engine = throtty.add_engine("billing", redis_dsn="redis://localhost:6379/0")
+    assert engine.init_args["redis_dsn"] == "redis://localhost:6379/0"
+    with pytest.raises(ValueError):
+        throtty.add_engine("billing")
+    with pytest.raises(ValueError):
+        throtty.add_engine("other", MockThrottyCore(), algorithm="token_bucket")
+    with pytest.raises(ValueError):
+        throtty.add_engine("blocking", throtty_mod.SyncThrottyCore())
+    with pytest.raises(ValueError):
+        throtty.add_rule("/api", limit=1, window=1, engine="missing")
+    with pytest.raises(ValueError):
+        throtty.add_hierarchical_rule("/api", [(None, 1, 1)], engine="missing")
+    assert throtty.rules == []
+
+    throtty.add_hierarchical_rule("/api", [(None, 1, 1)], engine="billing")
+    assert throtty.rules[0]["engine"] is engine
+
+
+def test_add_engine_sync():
+    """Test blocking engines registered on a sync Throtty"""
+    Throtty._instance = None
+    Throtty._initialized = False
+
+    throtty = Throtty(sync=True)
+    engine = throtty.add_engine("strict", algorithm="token_bucket")
+    throtty.add_rule("/api/*", limit=1, window=60, engine="strict")
+    app = throtty.wrap_wsgi(lambda environ, start_response: [b"ok"])
+    statuses = []
+
+    def start_response(status, headers):
+        statuses.append(status)
+
+    for _ in range(2):
+        app({"PATH_INFO": "/api/x", "REMOTE_ADDR": "10.0.0.1"}, start_response)
+
+    assert isinstance(engine, throtty_mod.SyncThrottyCore)
+    assert statuses == ["429 Too Many Requests"]
+    assert throtty.metrics()["strict"]["rejected"] == 1
+    assert throtty.metrics()["default"]["decisions"] == 0
+    Throtty._instance = None
+    Throtty._initialized = False
+
+
+class MockThrottyCoreLifecycle(MockThrottyCore):
+    events = []
+
+    async def start(self, connections=None):
+        self.events.append(("start", connections))
+
+    async def close(self):
+        self.events.append(("close", None))
+
+
+@pytest.mark.asyncio
+async def test_wrap_lifespan_starts_and_drains_engines(monkeypatch):
+    """Test engines started before the app's startup and closed after its shutdown"""
+    monkeypatch.setattr(throtty_mod, "ThrottyCore", MockThrottyCoreLifecycle)
+    events = MockThrottyCoreLifecycle.events = []
+
+    Throtty._instance = None
+    Throtty._initialized = False
+
+    throtty = Throtty()
+    throtty.add_rule("/login", limit=10, window=60)
+    throtty.add_rule("/api/*", limit=10, window=60)
+
+    async def lifespan_app(scope, receive, send):
+        for phase in ("startup", "shutdown"):
+            assert (await receive())["type"] == f"lifespan.{phase}"
+            events.append(("app", phase))
+            await send({"type": f"lifespan.{phase}.complete"})
+
+    messages = iter([{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}])
+    sent = []
+
+    async def receive():
+        return next(messages)
+
+    async def send(message):
+        sent.append(message["type"])
+
+    app = throtty.wrap(lifespan_app)
+    await app({"type": "lifespan"}, receive, send)
+
+    assert events == [
+        ("start", None),
+        ("app", "startup"),
+        ("app", "shutdown"),
+        ("close", None),
+    ]
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+    assert list(app._routes) == ["/login"]
+
+
+@pytest.mark.asyncio
+async def test_middleware_lifespan_without_app_support(monkeypatch):
+    """Test lifespan answered for an app that rejects the lifespan scope"""
+    monkeypatch.setattr(throtty_mod, "ThrottyCore", MockThrottyCoreLifecycle)
+    events = MockThrottyCoreLifecycle.events = []
+
+    Throtty._instance = None
+    Throtty._initialized = False
+
+    throtty = Throtty()
+
+    async def http_only_app(scope, receive, send):
+        assert scope["type"] == "http"
+
+    messages = iter([{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}])
+    send = AsyncMock()
+
+    async def receive():
+        return next(messages)
+
+    await ThrottyMiddleware(http_only_app, throtty)({"type": "lifespan"}, receive, send)
+
+    assert events == [("start", None), ("close", None)]
+    assert [call.args[0]["type"] for call in send.call_args_list] == [
+        "lifespan.startup.complete",
+        "lifespan.shutdown.complete",
+    ]
@@ -0,0 +1,115 @@
+# ruff: noqa
+
+from collections import Counter
+
+import pytest
+
+from core.limiter import Throtty
+from core._internals.application.use_cases.rate_limit import (
+    CheckRateLimitUC,
+    CheckRateLimitSyncUC,
+)
+from core._internals.domain.services.algorithm.phase import window_phase
+from core._internals.domain.services.clock import ManualClock
+from core._internals.infrastructure.storage import InMemStorage, SyncInMemStorage
+
+
+@pytest.fixture
+def throtty():
+    Throtty._instance = None
+    Throtty._initialized = False
+    yield
+    Throtty._instance = None
+    Throtty._initialized = False
+
+
+def test_window_phase_spreads_keys_over_the_window():
+    phases = [window_phase(f"ip:10.0.{i // 256}.{i % 256}", 60) for i in range(6000)]
+
+    assert all(0 <= phase < 60 for phase in phases)
+    assert window_phase("ip:10.0.0.1", 60) == window_phase("ip:10.0.0.1", 60)
+    per_second = Counter(int(phase) for phase in phases)
+    assert len(per_second) == 60
+    assert max(per_second.values()) < 2 * 6000 / 60
+
+
+def test_staggered_windows_reset_at_the_key_phase():
+    clock = ManualClock(start=6000.0)
+    uc = CheckRateLimitSyncUC(storage=SyncInMemStorage(), clock=clock, stagger=True)
+    # another node with its own storage agrees on the boundaries
+    other = CheckRateLimitSyncUC(storage=SyncInMemStorage(), clock=clock, stagger=True)
+
+    resets = set()
+    for key in ("a", "b", "c", "d"):
+        phase = window_phase(key, 60)
+        assert uc.execute(key, 1, 60).allowed
+        result = uc.execute(key, 1, 60)
+        assert not result.allowed
+        assert 6000 < result.reset_at <= 6060
+        assert (result.reset_at - phase) % 60 == pytest.approx(0, abs=1e-6)
+        assert other.execute(key, 1, 60).reset_at == result.reset_at
+        resets.add(result.reset_at)
+    assert len(resets) == 4
+
+
+@pytest.mark.parametrize("algo", ["slidingwindow_log", "token_bucket"])
+def test_stagger_leaves_algorithms_without_boundaries_alone(algo):
+    clock = ManualClock(start=6000.0)
+    uc = CheckRateLimitSyncUC(
+        storage=SyncInMemStorage(), algo=algo, clock=clock, stagger=True
+    )
+    plain = CheckRateLimitSyncUC(storage=SyncInMemStorage(), algo=algo, clock=clock)
+
+    assert not hasattr(uc.flow, "_stagger")
+    for key in ("a", "b", "c", "d"):
+        uc.execute(key, 1, 60)
+        plain.execute(key, 1, 60)
+        assert uc.execute(key, 1, 60).reset_at == plain.execute(key, 1, 60).reset_at
+
+
+def test_staggered_counter_rolls_over_at_the_phase():
+    clock = ManualClock(start=6000.0)
+    uc = CheckRateLimitSyncUC(storage=SyncInMemStorage(), clock=clock, stagger=True)
+    boundary = 6000 + window_phase("k", 60)
+    if boundary <= 6001:
+        boundary += 60
+
+    clock.set(boundary - 1)
+    assert uc.execute("k", 1, 60).allowed
+    # the previous window still weighs in right after the boundary
+    clock.set(boundary + 1)
+    assert not uc.execute("k", 1, 60).allowed
+    clock.set(boundary + 60)
+    assert uc.execute("k", 1, 60).allowed
+
+
+@pytest.mark.asyncio
+async def test_retry_jitter_is_bounded_and_spread():
+    clock = ManualClock(start=600.0)
+    uc = CheckRateLimitUC(
+        storage=InMemStorage(), algo="token_bucket", clock=clock, retry_jitter=5
+    )
+    plain = CheckRateLimitUC(storage=InMemStorage(), algo="token_bucket", clock=clock)
+
+    assert (await uc.execute("k", 1, 10)).retry_after == 0
+    await plain.execute("k", 1, 10)
+    base = (await plain.execute("k", 1, 10)).retry_after
+    waits = [(await uc.execute("k", 1, 10)).retry_after for _ in range(200)]
+    waits += [
+        result.retry_after
+        for result in await uc.execute_many([("k", 1, 10)] * 200)
+        if not result.allowed
+    ]
+
+    assert len(waits) == 400
+    assert all(base <= wait <= base + 5 for wait in waits)
+    assert set(waits) == set(range(base, base + 6))
+    with pytest.raises(ValueError):
+        CheckRateLimitUC(storage=InMemStorage(), retry_jitter=-1)
+
+
+def test_throtty_passes_stagger_and_jitter_to_the_engine(throtty):
+    limiter = Throtty(sync=True, stagger_windows=True, retry_jitter=3)
+
+    assert limiter.engine.flow.retry_jitter == 3
+    assert limiter.engine.flow.flow._stagger